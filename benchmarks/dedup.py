@@ -0,0 +1,112 @@
+"""Near-duplicate clustering (MinHash + LSH) vs. pairwise comparison, as corpora grow.
+
+A corpus of `--sizes` prompts is made of families: a random prompt of 8 to
+20 words from the vocabulary of `data/non_adversarial_prompts.csv`, and
+variants of it with one word replaced, added or dropped. Each size is
+clustered with `BELLS_leaderboard_mock_up.dedup.cluster`, and compared to the
+families:
+
+- recall: share of the variant pairs whose shingle Jaccard similarity is at
+  least the threshold that end up in the same cluster
+- merged: share of clustered pairs below half the threshold
+
+Pairwise exact Jaccard is timed on the first `--pairwise` prompts and
+extrapolated quadratically.
+
+    python benchmarks/dedup.py --sizes 10000 100000 1000000
+"""
+import argparse
+import itertools
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR
+from BELLS_leaderboard_mock_up.dedup import cluster, normalize
+
+
+def corpus(size, variants=4, seed=0):
+    """`size` prompts and the family of each"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(' '.join(pd.read_csv(DATA_DIR / 'non_adversarial_prompts.csv')['question']).split())
+    prompts, families = [], []
+    family = 0
+    while len(prompts) < size:
+        words = list(rng.choice(vocabulary, size=rng.integers(8, 21)))
+        prompts.append(' '.join(words))
+        families.append(family)
+        for _ in range(rng.integers(0, variants + 1)):
+            variant = list(words)
+            position = rng.integers(len(variant))
+            edit = rng.integers(3)
+            if edit == 0:
+                variant[position] = rng.choice(vocabulary)
+            elif edit == 1:
+                variant.insert(position, rng.choice(vocabulary))
+            else:
+                del variant[position]
+            prompts.append(' '.join(variant))
+            families.append(family)
+        family += 1
+    return prompts[:size], np.array(families[:size])
+
+
+def shingles(text, shingle=5):
+    return {text.ljust(shingle)[i:i + shingle] for i in range(max(len(text) - shingle + 1, 1))}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def quality(prompts, families, clusters, threshold, sample=20000):
+    """Recall of the similar variant pairs and share of dissimilar merged pairs, over the first `sample` prompts"""
+    sets = [shingles(text) for text in normalize(prompts[:sample]).to_pylist()]
+    similar = found = merged = clustered = 0
+    for members in pd.Series(np.arange(len(sets))).groupby(families[:sample]):
+        for i, j in itertools.combinations(members[1], 2):
+            if jaccard(sets[i], sets[j]) >= threshold:
+                similar += 1
+                found += clusters[i] == clusters[j]
+    for members in pd.Series(np.arange(len(sets))).groupby(clusters[:sample]):
+        for i, j in itertools.combinations(members[1], 2):
+            clustered += 1
+            merged += jaccard(sets[i], sets[j]) < threshold / 2
+    return found / max(similar, 1), merged / max(clustered, 1)
+
+
+def pairwise_seconds(prompts, size, threshold):
+    """Time of the exact pairwise comparison of `prompts`, extrapolated to `size` prompts"""
+    sets = [shingles(text) for text in normalize(prompts).to_pylist()]
+    start = time.perf_counter()
+    pairs = sum(jaccard(a, b) >= threshold for a, b in itertools.combinations(sets, 2))
+    elapsed = time.perf_counter() - start
+    return elapsed * (size * (size - 1)) / (len(sets) * (len(sets) - 1)), pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Corpus sizes')
+    parser.add_argument('--threshold', type=float, default=0.8, help='Jaccard similarity of near-duplicates')
+    parser.add_argument('--pairwise', type=int, default=2000, help='Prompts compared pairwise')
+    args = parser.parse_args()
+
+    print(f"{'prompts':>9} {'clusters':>9} {'minhash s':>10} {'pairwise s':>11} {'recall':>7} {'merged':>7}")
+    for size in args.sizes:
+        prompts, families = corpus(size)
+        start = time.perf_counter()
+        clusters = cluster(prompts, args.threshold)
+        elapsed = time.perf_counter() - start
+        pairwise, _ = pairwise_seconds(prompts[:args.pairwise], size, args.threshold)
+        recall, merged = quality(prompts, families, clusters, args.threshold)
+        print(f"{size:>9} {len(np.unique(clusters)):>9} {elapsed:>10.2f} {pairwise:>11.0f} "
+              f"{recall:>7.3f} {merged:>7.4f}")
+
+
+if __name__ == '__main__':
+    main()
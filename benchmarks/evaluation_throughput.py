@@ -0,0 +1,57 @@
+"""Throughput of the evaluation runner as the safeguard concurrency grows.
+
+The stub safeguards answer after a simulated API latency, so the run time is
+dominated by waiting: with C calls in flight per safeguard, throughput
+should grow about C-fold until the event loop or the rate limit saturates.
+
+    python benchmarks/evaluation_throughput.py --prompts 4000 --latency 0.05 --concurrency 1 2 4 8 16 32
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from BELLS_leaderboard_mock_up.evaluation import evaluate_corpus, load_prompts
+from BELLS_leaderboard_mock_up.safeguards import stub_safeguards
+
+
+def prompt_table(size):
+    prompts = load_prompts()
+    tables = [prompts] * (size // prompts.num_rows + 1)
+    return pa.concat_tables(tables).slice(0, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=4000, help='Prompts to evaluate')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated seconds per safeguard call')
+    parser.add_argument('--batch-size', type=int, default=32, help='Prompts per safeguard call')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32],
+                        help='Calls in flight per safeguard')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Calls per second per safeguard')
+    args = parser.parse_args()
+
+    prompts = prompt_table(args.prompts)
+    print(f"{'concurrency':>11} {'seconds':>8} {'prompts/s':>10} {'speedup':>8}")
+    base = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for concurrency in args.concurrency:
+            safeguards = stub_safeguards(latency=args.latency, max_concurrency=concurrency,
+                                         batch_size=args.batch_size)
+            for safeguard in safeguards:
+                safeguard.rate_limit = args.rate_limit
+            start = time.perf_counter()
+            evaluate_corpus(prompts, Path(tmp) / 'verdicts.parquet', safeguards)
+            seconds = time.perf_counter() - start
+            throughput = prompts.num_rows / seconds
+            base = base or throughput
+            print(f"{concurrency:>11} {seconds:8.2f} {throughput:10.0f} {throughput / base:8.1f}x", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Import-time benchmark for the app entry points.
+
+Each entry point is imported in a fresh interpreter with ``-X importtime``.
+The script prints the slowest imports and exits non-zero if an entry point
+goes over its startup budget, or if it loads a module that should only be
+imported lazily (e.g. the LLM clients used by the Recommendation page).
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget 1.5 --top 15 --json results.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).parent.parent / 'src' / 'BELLS_leaderboard_mock_up'
+
+# (name, directory the app is launched from, module, modules that must stay lazy)
+ENTRY_POINTS = [
+    # Streamlit itself imports plotly.graph_objects for its theme, but not plotly.express
+    ('streamlit', PACKAGE_DIR / 'streamlit_version', 'app',
+     ['anthropic', 'openai', 'dotenv', 'plotly.express']),
+    # Panel imports pandas and (through bokeh) numpy, but neither plotly nor the analysis engines
+    ('panel', PACKAGE_DIR / 'panel_version', 'app',
+     ['anthropic', 'openai', 'dotenv', 'plotly',
+      'BELLS_leaderboard_mock_up.bootstrap', 'BELLS_leaderboard_mock_up.cube',
+      'BELLS_leaderboard_mock_up.formulas', 'BELLS_leaderboard_mock_up.online',
+      'BELLS_leaderboard_mock_up.ranks', 'BELLS_leaderboard_mock_up.significance']),
+    ('html', PACKAGE_DIR / 'html_version', 'server',
+     ['pandas', 'anthropic', 'openai', 'dotenv']),
+]
+
+DEFAULT_BUDGET = 3.0  # seconds of cumulative import time per entry point
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into a list of (self_us, cumulative_us, depth, module)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def measure(directory, module):
+    """Import `module` from `directory` in a fresh interpreter and return the parsed timings"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [str(directory), str(PACKAGE_DIR.parent), env.get('PYTHONPATH')])
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=directory, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} from {directory} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(rows, forbidden, top):
+    """Total import time, slowest modules and forbidden modules found"""
+    loaded = {name for _, _, _, name in rows}
+    slowest = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        'total_s': sum(row[0] for row in rows) / 1e6,
+        'modules': len(rows),
+        'slowest': [
+            {'module': name, 'self_ms': self_us / 1e3, 'cumulative_ms': cumulative_us / 1e3}
+            for self_us, cumulative_us, _, name in slowest
+        ],
+        # A forbidden package counts as loaded if any of its submodules is
+        'forbidden_loaded': sorted(
+            m for m in forbidden if any(name == m or name.startswith(m + '.') for name in loaded)
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float,
+                        default=float(os.getenv('BELLS_IMPORT_BUDGET', DEFAULT_BUDGET)),
+                        help='Maximum cumulative import time per entry point, in seconds')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per entry point, the fastest one is reported')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show')
+    parser.add_argument('--only', choices=[name for name, *_ in ENTRY_POINTS], action='append',
+                        help='Only measure the given entry point(s)')
+    parser.add_argument('--json', type=Path, help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for name, directory, module, forbidden in ENTRY_POINTS:
+        if args.only and name not in args.only:
+            continue
+
+        runs = [summarize(measure(directory, module), forbidden, args.top) for _ in range(args.repeat)]
+        summary = min(runs, key=lambda run: run['total_s'])
+        summary['budget_s'] = args.budget
+        results[name] = summary
+
+        print(f"\n== {name} ({directory.name}/{module}.py) ==")
+        print(f"{'cumulative [ms]':>16} {'self [ms]':>10}  module")
+        for row in summary['slowest']:
+            print(f"{row['cumulative_ms']:16.1f} {row['self_ms']:10.1f}  {row['module']}")
+        print(f"Total: {summary['total_s']:.3f}s over {summary['modules']} modules "
+              f"(budget {args.budget:.3f}s)")
+
+        if summary['total_s'] > args.budget:
+            print(f"FAIL: {name} exceeds its import-time budget")
+            failed = True
+        if summary['forbidden_loaded']:
+            print(f"FAIL: {name} eagerly imports {', '.join(summary['forbidden_loaded'])}")
+            failed = True
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Memory and disk size of a jailbreak dataset, rendered vs. factorized.
+
+The dataset is the cross product of `--templates` synthetic narrative
+templates (filler words around a `{goal}` placeholder, `--template-words`
+long) and the goals of the three `*_non-adversarial.csv` files, plus the
+syntactic transforms of every goal, with random verdicts. It is factorized
+(see BELLS_leaderboard_mock_up.jailbreak_store), checked to render back
+identically, then compared: memory and CSV size of both forms, and the
+time of the playground operations on the store.
+
+    python benchmarks/jailbreak_store.py --templates 80 --template-words 300
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR
+from BELLS_leaderboard_mock_up.jailbreak_store import GOAL, factorize, load_store
+from BELLS_leaderboard_mock_up.jailbreaks import TRANSFORMS
+
+SAFEGUARDS = ['lakera_guard', 'prompt_guard', 'langkit', 'nemo', 'llm_guard']
+
+
+def goals():
+    frames = []
+    for harm_level in ['harmful', 'borderline', 'benign']:
+        frame = pd.read_csv(DATA_DIR / f"{harm_level}_non-adversarial.csv")
+        frames.append(pd.DataFrame({'question': frame['Goal'], 'harm_level': harm_level,
+                                    'category': frame['Category'].str.strip(),
+                                    'source': frame['Source'] if 'Source' in frame else 'BELLS'}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def rendered_dataset(templates, words, seed=0):
+    rng = np.random.default_rng(seed)
+    vocabulary = ' '.join(pd.read_csv(DATA_DIR / 'non_adversarial_prompts.csv')['question']).split()
+    goal_table = goals()
+    frames = []
+    for index in range(templates):
+        filler = rng.choice(vocabulary, size=words)
+        cut = rng.integers(words)
+        template = ' '.join([*filler[:cut], GOAL, *filler[cut:]])
+        frames.append(goal_table.assign(
+            jailbreak_prompt=[template.replace(GOAL, goal) for goal in goal_table['question']],
+            jailbreak_source=f"template_{index // 20}", jailbreak_type='narrative'))
+    for name, transform in TRANSFORMS.items():
+        frames.append(goal_table.assign(jailbreak_prompt=transform(pa.array(goal_table['question'])).to_pylist(),
+                                        jailbreak_source=name, jailbreak_type='syntactic'))
+    frame = pd.concat(frames, ignore_index=True)
+    for safeguard in SAFEGUARDS:
+        frame[safeguard] = (rng.random(len(frame)) < 0.5).astype('int8')
+    return frame
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--templates', type=int, default=80, help='Narrative templates')
+    parser.add_argument('--template-words', type=int, default=300, help='Words per template')
+    args = parser.parse_args()
+
+    frame = rendered_dataset(args.templates, args.template_words)
+    store, factorize_seconds = timed(factorize, frame, SAFEGUARDS)
+    assert store.render(np.arange(len(store))) == frame['jailbreak_prompt'].tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        frame.to_csv(tmp / 'adversarial_prompts.csv', index=False)
+        store.save(tmp / 'jailbreaks')
+        rendered_disk = (tmp / 'adversarial_prompts.csv').stat().st_size
+        factorized_disk = sum(path.stat().st_size for path in (tmp / 'jailbreaks').iterdir())
+        loaded, load_seconds = timed(load_store, 'jailbreaks', tmp)
+        view, view_seconds = timed(loaded.view)
+        hits, search_seconds = timed(loaded.search, 'bomb')
+        _, render_seconds = timed(loaded.render, np.flatnonzero(hits)[:40])
+
+    rendered_memory = frame.memory_usage(deep=True).sum()
+    factorized_memory = loaded.nbytes() + view.memory_usage(deep=True).sum()
+    print(f"{len(frame)} prompts: {len(store.templates)} templates x {len(store.goals)} goals, "
+          f"factorized in {factorize_seconds:.2f}s")
+    print(f"{'':>12} {'rendered':>10} {'factorized':>11} {'ratio':>6}")
+    print(f"{'memory MB':>12} {rendered_memory / 1e6:>10.1f} {factorized_memory / 1e6:>11.1f} "
+          f"{rendered_memory / factorized_memory:>5.0f}x")
+    print(f"{'disk MB':>12} {rendered_disk / 1e6:>10.1f} {factorized_disk / 1e6:>11.1f} "
+          f"{rendered_disk / factorized_disk:>5.0f}x")
+    print(f"load {load_seconds * 1e3:.0f} ms, view {view_seconds * 1e3:.0f} ms, "
+          f"search {search_seconds * 1e3:.0f} ms ({hits.sum()} hits), render 40 hits {render_seconds * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Throughput of the vectorized syntactic jailbreak transforms vs. per-string Python.
+
+The base prompts are repeated up to `--prompts` texts; each transform of
+`BELLS_leaderboard_mock_up.jailbreaks` is timed on the whole array and
+compared with a plain Python implementation, whose output it must match.
+
+    python benchmarks/jailbreak_transforms.py --prompts 1000000
+"""
+import argparse
+import base64
+import codecs
+import re
+import sys
+import time
+import urllib.parse
+from pathlib import Path
+
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from BELLS_leaderboard_mock_up.jailbreaks import LEET, TRANSFORMS, base_prompts
+
+LEET_TABLE = str.maketrans({**LEET, **{source.upper(): target for source, target in LEET.items()}})
+
+REFERENCE = {
+    'url_encoded': lambda text: urllib.parse.quote(text, safe=''),
+    'uppercase': str.upper,
+    'reverse': lambda text: text[::-1],
+    'disemvowel': lambda text: re.sub('[aeiouAEIOU]', '', text),
+    'base64': lambda text: base64.b64encode(text.encode()).decode(),
+    'rot13': lambda text: codecs.encode(text, 'rot13'),
+    'binary': lambda text: ' '.join(f"{b:08b}" for b in text.encode()),
+    'hex': lambda text: text.encode().hex(),
+    'ascii': lambda text: ' '.join(str(b) for b in text.encode()),
+    'leet': lambda text: text.translate(LEET_TABLE),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--prompts', type=int, default=200_000, help='Texts to transform')
+    args = parser.parse_args()
+
+    questions = base_prompts().column('question').cast(pa.string()).combine_chunks()
+    texts = pa.concat_arrays([questions] * (args.prompts // len(questions) + 1))[:args.prompts]
+    python_texts = texts.to_pylist()
+
+    print(f"{'transform':>12} {'vectorized':>11} {'python':>9} {'speedup':>8} {'MB/s':>7}  match")
+    for name, transform in TRANSFORMS.items():
+        start = time.perf_counter()
+        result = transform(texts)
+        vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [REFERENCE[name](text) for text in python_texts]
+        python = time.perf_counter() - start
+
+        mismatches = sum(a != b for a, b in zip(result.to_pylist(), expected))
+        megabytes = pa.compute.sum(pa.compute.binary_length(result)).as_py() / 1e6
+        print(f"{name:>12} {vectorized:>10.3f}s {python:>8.3f}s {python / vectorized:>7.1f}x "
+              f"{megabytes / vectorized:>7.0f}  {'yes' if not mismatches else f'{mismatches} differ'}")
+
+
+if __name__ == '__main__':
+    main()
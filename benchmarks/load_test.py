@@ -0,0 +1,519 @@
+"""Concurrent load test of the Streamlit, Panel and HTML front ends.
+
+Each front end is launched locally on a free port, then N simulated user
+sessions are run against it with a given concurrency. A session goes
+through realistic flows:
+
+- leaderboard: open the app and render the leaderboard page
+- playground: switch to the playground, change the filters, search
+- recommendation: open the recommender and request a recommendation
+
+The LLM behind the recommenders is replaced by a local stub of the
+Anthropic Messages API (ANTHROPIC_BASE_URL), so no API key or network
+access is needed. Streamlit sessions speak its websocket protocol, Panel
+sessions use a Bokeh client session, HTML sessions fetch the page assets.
+
+Results (throughput, p50/p95/p99 latency per step, errors, server RSS)
+are printed and written as JSON for comparison between runs.
+
+    python benchmarks/load_test.py --sessions 50 --concurrency 10 --output load.json
+    python benchmarks/load_test.py --frontend html --sessions 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PACKAGE_DIR = PROJECT_ROOT / 'src' / 'BELLS_leaderboard_mock_up'
+
+FRONTENDS = ['html', 'panel', 'streamlit']
+
+STUB_RECOMMENDATION = "### Recommendation\n\nStub recommendation generated by the load test."
+
+
+# Local LLM stub
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers Anthropic Messages API calls with a canned recommendation"""
+    latency = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        body = json.dumps({
+            'id': 'msg_stub',
+            'type': 'message',
+            'role': 'assistant',
+            'model': 'stub',
+            'content': [{'type': 'text', 'text': STUB_RECOMMENDATION}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': 0, 'output_tokens': 0}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_llm_stub(latency):
+    StubLLMHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# Launching the front ends
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def launch(frontend, port, llm_url):
+    """Start a front end in a subprocess, returns (process, base URL, health URL)"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(PACKAGE_DIR.parent), env.get('PYTHONPATH')]))
+    env['ANTHROPIC_BASE_URL'] = llm_url
+    env['ANTHROPIC_API_KEY'] = 'stub'
+
+    base_url = f"http://127.0.0.1:{port}"
+    if frontend == 'html':
+        cmd = [sys.executable, 'server.py', str(port)]
+        cwd = PACKAGE_DIR / 'html_version'
+        health = f"{base_url}/src/BELLS_leaderboard_mock_up/html_version/index.html"
+    elif frontend == 'panel':
+        cmd = [sys.executable, 'serve.py', '--port', str(port)]
+        cwd = PACKAGE_DIR / 'panel_version'
+        health = f"{base_url}/"
+    else:
+        cmd = [sys.executable, '-m', 'streamlit', 'run', 'app.py', '--server.port', str(port),
+               '--server.headless', 'true', '--browser.gatherUsageStats', 'false']
+        cwd = PACKAGE_DIR / 'streamlit_version'
+        health = f"{base_url}/_stcore/health"
+
+    process = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return process, base_url, health
+
+
+def wait_ready(process, health, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited:\n{process.stderr.read().decode()[-2000:]}")
+        try:
+            with urllib.request.urlopen(health, timeout=5) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"Server not ready after {timeout}s")
+
+
+def rss_bytes(pid):
+    """Resident memory of a process and its children, from /proc (Linux only)"""
+    total = 0
+    pids = [pid]
+    children = Path(f'/proc/{pid}/task/{pid}/children')
+    if children.exists():
+        pids += [int(child) for child in children.read_text().split()]
+    for p in pids:
+        try:
+            for line in Path(f'/proc/{p}/status').read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class RssSampler(threading.Thread):
+    """Samples the server RSS in the background while the load runs"""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.samples.append(rss_bytes(self.pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# Session flows, each returns a list of (step, seconds, ok)
+
+def timed(steps, name, action):
+    start = time.perf_counter()
+    try:
+        ok = action() is not False
+    except Exception:
+        ok = False
+    steps.append((name, time.perf_counter() - start, ok))
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        response.read()
+        return response.status == 200
+
+
+def html_session(base_url):
+    """Pages and the files their scripts load; filtering and scoring run in the browser"""
+    pages = '/src/BELLS_leaderboard_mock_up/html_version'
+    flows = {
+        'leaderboard': [f'{pages}/leaderboard.html', f'{pages}/styles.css', f'{pages}/leaderboard.js',
+                        '/data/safeguard_evaluation_results.csv'],
+        'playground': [f'{pages}/playground.html', f'{pages}/playground.js',
+                       '/data/non_adversarial_prompts.csv'],
+        'recommendation': [f'{pages}/recommendation.html', f'{pages}/recommendation.js',
+                           '/data/safeguard_evaluation_results.csv'],
+    }
+    steps = []
+    for flow, paths in flows.items():
+        timed(steps, flow, lambda: all(fetch(base_url + path) for path in paths))
+    return steps
+
+
+def prepare_panel_client():
+    """Make bokeh.client behave enough like a browser for the Panel sessions"""
+    import importlib
+    import pkgutil
+    import panel.models
+    from bokeh.client.states import CONNECTED_AFTER_ACK, DISCONNECTED, ErrorReason, WAITING_FOR_REPLY
+
+    # The client needs all Panel models to deserialize the document
+    for module in pkgutil.iter_modules(panel.models.__path__):
+        try:
+            importlib.import_module(f'panel.models.{module.name}')
+        except ImportError:
+            # Models of optional dependencies that are not installed
+            pass
+
+    # Server-side changes (e.g. the contents of a newly built tab) are pushed
+    # as PATCH-DOC messages, which bokeh.client drops while it waits for the
+    # reply to a request. Apply them instead, like a browser does.
+    async def run(self, connection):
+        message = await connection._pop_message()
+        if message is None:
+            await connection._transition_to_disconnected(DISCONNECTED(ErrorReason.NETWORK_ERROR))
+        elif message.header.get('reqid') == self.reqid:
+            self._reply = message
+            await connection._transition(CONNECTED_AFTER_ACK())
+        else:
+            if message.msgtype == 'PATCH-DOC':
+                connection._session._handle_patch(message)
+            await connection._next()
+
+    WAITING_FOR_REPLY.run = run
+
+
+def panel_session(base_url):
+    from bokeh.client import pull_session
+    from bokeh.events import ButtonClick, DocumentReady
+    from bokeh.document.events import MessageSentEvent
+
+    steps = []
+    session = None
+
+    def send_event(event):
+        message = MessageSentEvent(session.document, 'bokeh_event', event)
+        session._connection._send_patch_document(session.id, message)
+
+    def open_app():
+        nonlocal session
+        session = pull_session(url=base_url)
+        # Like a browser once the page is rendered: Panel runs onload
+        # callbacks and starts pushing server-side changes after this
+        send_event(DocumentReady())
+        session.force_roundtrip()
+
+    def find(type_name, **attrs):
+        for m in list(session.document.models):
+            if type(m).__name__ == type_name and all(getattr(m, k, None) == v for k, v in attrs.items()):
+                return m
+        return None
+
+    def wait_until(predicate, description, timeout=60):
+        # Server-side changes may arrive after the round trip, poll until they show up
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            session.force_roundtrip()
+            result = predicate()
+            if result:
+                return result
+            time.sleep(0.01)
+        raise TimeoutError(f"Timed out waiting for {description}")
+
+    def wait_for(type_name, **attrs):
+        return wait_until(lambda: find(type_name, **attrs), f"{type_name} with {attrs}")
+
+    def update(type_name, attrs, **values):
+        # Client-side changes are sent to the server, the round trip
+        # returns once the server has processed them
+        target = wait_for(type_name, **attrs)
+        for name, value in values.items():
+            setattr(target, name, value)
+        session.force_roundtrip()
+
+    def open_tab(index, type_name, **attrs):
+        update('Tabs', {}, active=index)
+        wait_for(type_name, **attrs)
+
+    def click(label):
+        send_event(ButtonClick(wait_for('Button', label=label)))
+        wait_until(lambda: any(STUB_RECOMMENDATION.splitlines()[-1] in (getattr(m, 'text', None) or '')
+                               for m in list(session.document.models)), "the recommendation")
+
+    timed(steps, 'leaderboard', open_app)
+    if session is None:
+        return steps
+    try:
+        timed(steps, 'playground', lambda: open_tab(2, 'TextInput', title='🔍 Search prompts...'))
+        timed(steps, 'playground_filter', lambda: update(
+            'RadioButtonGroup', {'labels': ['Harmful', 'Borderline', 'Benign']}, active=0))
+        timed(steps, 'playground_search', lambda: update('TextInput', {'title': '🔍 Search prompts...'},
+                                                         value='hack'))
+        timed(steps, 'recommendation', lambda: open_tab(1, 'Button', label='Get Recommendation'))
+        timed(steps, 'recommendation_request', lambda: click('Get Recommendation'))
+    finally:
+        session.close()
+    return steps
+
+
+class StreamlitClient:
+    """Minimal Streamlit browser: reruns the script with widget states over the websocket"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}  # label -> element proto
+        self.states = {}  # widget id -> WidgetState
+        self.page_script_hash = ''
+        self.exceptions = 0
+
+    @classmethod
+    async def connect(cls, base_url):
+        from tornado.websocket import websocket_connect
+        ws = await websocket_connect(base_url.replace('http', 'ws') + '/_stcore/stream',
+                                     subprotocols=['streamlit'], max_message_size=512 * 1024 * 1024)
+        return cls(ws)
+
+    async def rerun(self):
+        """Rerun the script and wait until it has finished, returns False on script errors"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = self.page_script_hash
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+
+        exceptions = self.exceptions
+        while True:
+            data = await self.ws.read_message()
+            if data is None:
+                raise ConnectionError("Websocket closed")
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = forward.new_session.page_script_hash
+            elif kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    self.exceptions += 1
+                elif element_type in ('radio', 'selectbox', 'text_input', 'button'):
+                    self.widgets[getattr(element, element_type).label] = (element_type, getattr(element, element_type))
+            elif kind == 'script_finished':
+                return self.exceptions == exceptions
+
+    def set(self, label, value):
+        """Set a widget value like the browser would, keyed by the widget label"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        element_type, element = self.widgets[label]
+        state = WidgetState(id=element.id)
+        if element_type == 'button':
+            state.trigger_value = True
+        elif element_type == 'text_input':
+            state.string_value = value
+        elif 'raw_value' in type(element).DESCRIPTOR.fields_by_name:
+            # Newer Streamlit versions send radio/selectbox values as option strings
+            state.string_value = value
+        else:
+            state.int_value = list(element.options).index(value)
+        self.states[element.id] = state
+
+
+def streamlit_session(base_url):
+    async def run():
+        steps = []
+        client = await StreamlitClient.connect(base_url)
+        try:
+            for name, changes in [
+                ('leaderboard', []),
+                ('playground', [('Navigation', 'Data Playground')]),
+                ('playground_filter', [('Harm Level', 'borderline')]),
+                ('playground_search', [('🔍 Search prompts...', 'hack')]),
+                ('recommendation', [('Navigation', 'Recommendation')]),
+                ('recommendation_request', [('Get Recommendation', True)]),
+            ]:
+                start = time.perf_counter()
+                try:
+                    for label, value in changes:
+                        client.set(label, value)
+                    ok = await client.rerun()
+                except Exception:
+                    ok = False
+                steps.append((name, time.perf_counter() - start, ok))
+                # Button triggers only fire for one run
+                client.states = {k: v for k, v in client.states.items()
+                                 if v.WhichOneof('value') != 'trigger_value'}
+        finally:
+            client.ws.close()
+        return steps
+
+    return asyncio.run(run())
+
+
+SESSIONS = {
+    'html': html_session,
+    'panel': panel_session,
+    'streamlit': streamlit_session,
+}
+
+
+# Running and reporting
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(durations, errors):
+    durations = sorted(durations)
+    return {
+        'count': len(durations),
+        'errors': errors,
+        'p50_ms': percentile(durations, 50) * 1e3 if durations else None,
+        'p95_ms': percentile(durations, 95) * 1e3 if durations else None,
+        'p99_ms': percentile(durations, 99) * 1e3 if durations else None,
+    }
+
+
+def run_frontend(frontend, sessions, concurrency, llm_url, startup_timeout):
+    port = free_port()
+    process, base_url, health = launch(frontend, port, llm_url)
+    try:
+        wait_ready(process, health, startup_timeout)
+        if frontend == 'panel':
+            prepare_panel_client()
+        # One session to warm up caches and lazy imports
+        SESSIONS[frontend](base_url)
+        rss_idle = rss_bytes(process.pid)
+
+        sampler = RssSampler(process.pid)
+        sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda _: SESSIONS[frontend](base_url), range(sessions)))
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    steps = {}
+    for session_steps in results:
+        for name, seconds, ok in session_steps:
+            durations, errors = steps.setdefault(name, ([], [0]))
+            durations.append(seconds)
+            errors[0] += not ok
+    session_durations = [sum(seconds for _, seconds, _ in s) for s in results]
+    failed_sessions = sum(not all(ok for _, _, ok in s) for s in results)
+
+    return {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'elapsed_s': elapsed,
+        'sessions_per_s': sessions / elapsed,
+        'steps_per_s': sum(len(s) for s in results) / elapsed,
+        'session': summarize(session_durations, failed_sessions),
+        'steps': {name: summarize(durations, errors[0]) for name, (durations, errors) in steps.items()},
+        'rss_idle_mb': rss_idle / 1e6,
+        'rss_peak_mb': max(sampler.samples, default=0) / 1e6,
+    }
+
+
+def print_report(frontend, result):
+    print(f"\n== {frontend}: {result['sessions']} sessions, concurrency {result['concurrency']} ==")
+    print(f"Throughput: {result['sessions_per_s']:.2f} sessions/s, {result['steps_per_s']:.2f} steps/s")
+    print(f"Server RSS: {result['rss_idle_mb']:.0f} MB idle, {result['rss_peak_mb']:.0f} MB peak")
+    print(f"{'step':>24} {'count':>6} {'errors':>6} {'p50 [ms]':>9} {'p95 [ms]':>9} {'p99 [ms]':>9}")
+    for name, s in [('session', result['session'])] + list(result['steps'].items()):
+        if s['count']:
+            print(f"{name:>24} {s['count']:6d} {s['errors']:6d} "
+                  f"{s['p50_ms']:9.1f} {s['p95_ms']:9.1f} {s['p99_ms']:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frontend', choices=FRONTENDS, action='append',
+                        help='Front end(s) to test, all by default')
+    parser.add_argument('--sessions', type=int, default=20, help='Simulated sessions per front end')
+    parser.add_argument('--concurrency', type=int, default=5, help='Sessions running at the same time')
+    parser.add_argument('--llm-latency', type=float, default=0.5,
+                        help='Simulated LLM response time of the stub, in seconds')
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--output', type=Path, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    stub, llm_url = start_llm_stub(args.llm_latency)
+    results = {}
+    try:
+        for frontend in args.frontend or FRONTENDS:
+            try:
+                results[frontend] = run_frontend(frontend, args.sessions, args.concurrency,
+                                                 llm_url, args.startup_timeout)
+            except (RuntimeError, TimeoutError) as e:
+                results[frontend] = {'error': str(e)}
+                print(f"\n== {frontend}: failed to start ==\n{e}")
+                continue
+            print_report(frontend, results[frontend])
+    finally:
+        stub.shutdown()
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Session throughput and memory of the Panel app, cold vs. warm shared state.
+
+Each simulated session builds the full leaderboard template into a new Bokeh
+document, as `panel serve` does when a browser opens the page. In `cold`
+mode the caches are cleared before every session (each session reads the
+CSVs itself); in `warm` mode they are filled once beforehand, as
+`panel_version/serve.py` does at server start.
+
+    python benchmarks/panel_sessions.py --sessions 10 --memory-sessions 3
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).parent.parent / 'src' / 'BELLS_leaderboard_mock_up'
+sys.path[:0] = [str(PACKAGE_DIR / 'panel_version'), str(PACKAGE_DIR.parent)]
+
+import panel as pn
+import pyarrow as pa
+from bokeh.document import Document
+from panel.io.state import set_curdoc
+
+from BELLS_leaderboard_mock_up import datastore
+from app import create_leaderboard
+from serve import warm
+
+
+def allocated():
+    """Bytes held by Python/NumPy (tracemalloc) and by the Arrow memory pool"""
+    return tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+
+
+def open_session():
+    """Build the app into a fresh document, returns it with its Bokeh model count.
+
+    Without a live server, onload callbacks (background tab prewarming) run
+    immediately, so the timings include them.
+    """
+    doc = Document()
+    with set_curdoc(doc):
+        create_leaderboard().server_doc(doc)
+    return doc, len(doc.models)
+
+
+def reset(mode):
+    """Clear the shared caches, then fill them again in warm mode"""
+    pn.state.clear_caches()
+    datastore.clear()
+    if mode == 'warm':
+        warm()
+
+
+def run(mode, sessions, memory_sessions):
+    reset(mode)
+    # The first session also pays for one-off imports, keep it out of the timings
+    open_session()
+
+    durations = []
+    for _ in range(sessions):
+        if mode == 'cold':
+            reset(mode)
+        start = time.perf_counter()
+        doc, models = open_session()
+        durations.append(time.perf_counter() - start)
+        del doc
+
+    # Memory is measured in a separate, shorter pass: tracing slows everything down
+    reset(mode)
+    tracemalloc.start()
+    gc.collect()
+    before = allocated()
+    docs = []
+    for _ in range(memory_sessions):
+        if mode == 'cold':
+            reset(mode)
+        docs.append(open_session())
+    gc.collect()
+    retained = allocated() - before
+    tracemalloc.stop()
+
+    durations.sort()
+    return {
+        'sessions_per_s': sessions / sum(durations),
+        'p50_ms': durations[len(durations) // 2] * 1e3,
+        'max_ms': durations[-1] * 1e3,
+        'memory_per_session_mb': retained / memory_sessions / 1e6,
+        'models_per_session': models,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10, help='Number of sessions to time per mode')
+    parser.add_argument('--memory-sessions', type=int, default=3,
+                        help='Number of sessions kept open to measure memory per mode')
+    args = parser.parse_args()
+
+    results = {mode: run(mode, args.sessions, args.memory_sessions) for mode in ('cold', 'warm')}
+
+    print(f"{'mode':>6} {'sessions/s':>11} {'p50 [ms]':>9} {'max [ms]':>9} {'MB/session':>11} {'models':>7}")
+    for mode in ('cold', 'warm'):
+        r = results[mode]
+        print(f"{mode:>6} {r['sessions_per_s']:11.2f} {r['p50_ms']:9.1f} {r['max_ms']:9.1f} "
+              f"{r['memory_per_session_mb']:11.2f} {r['models_per_session']:7d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Memory per Streamlit session: `st.cache_data` copies vs. the shared datastore.
+
+`st.cache_data` keeps a pickled DataFrame and unpickles a fresh copy for every
+caller, so each concurrent session holds its own copy of the datasets. The
+shared datastore hands every session the same read-only Arrow-backed frame.
+This script simulates N sessions loading the datasets used by the Streamlit
+app and reports the memory they retain.
+
+    python benchmarks/session_memory.py --sessions 50 --scale 20
+"""
+import argparse
+import gc
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+from BELLS_leaderboard_mock_up import datastore
+
+# Datasets read by the Streamlit leaderboard, playground and recommender
+DATASETS = [
+    'safeguard_evaluation_results.csv',
+    'non_adversarial_prompts.csv',
+    'borderline_non-adversarial.csv',
+]
+
+
+def scaled_data_dir(scale, tmp):
+    """Copy of the datasets with every file repeated `scale` times"""
+    for name in DATASETS:
+        df = pd.read_csv(datastore.DATA_DIR / name)
+        pd.concat([df] * scale, ignore_index=True).to_csv(Path(tmp) / name, index=False)
+    return Path(tmp)
+
+
+def allocated():
+    """Bytes held by Python/NumPy (tracemalloc) and by the Arrow memory pool"""
+    return tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes()
+
+
+def run_sessions(mode, sessions, data_dir):
+    """Retain the datasets of `sessions` simulated sessions, returns (bytes, seconds) per session"""
+    if mode == 'cache_data':
+        # What st.cache_data stores: one pickled copy of what the loader returned
+        pickled = {name: pickle.dumps(pd.read_csv(data_dir / name)) for name in DATASETS}
+        load = lambda name: pickle.loads(pickled[name])
+    else:
+        datastore.clear()
+        for name in DATASETS:
+            datastore.load_dataset(name, data_dir)
+        load = lambda name: datastore.load_dataset(name, data_dir)
+
+    gc.collect()
+    before = allocated()
+    start = time.perf_counter()
+    held = [[load(name) for name in DATASETS] for _ in range(sessions)]
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = allocated() - before
+
+    del held
+    return retained / sessions, elapsed / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50, help='Number of simulated sessions')
+    parser.add_argument('--scale', type=int, default=10, help='Repeat every dataset this many times')
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = scaled_data_dir(args.scale, tmp)
+        size = sum((data_dir / name).stat().st_size for name in DATASETS)
+        print(f"{len(DATASETS)} datasets, {size / 1e6:.1f} MB of CSV, {args.sessions} sessions")
+
+        results = {mode: run_sessions(mode, args.sessions, data_dir) for mode in ('cache_data', 'shared')}
+
+    for mode, (per_session, seconds) in results.items():
+        print(f"{mode:>12}: {per_session / 1024:10.1f} KB/session, {seconds * 1e3:8.3f} ms/session")
+    saved = results['cache_data'][0] - results['shared'][0]
+    print(f"Shared datastore saves {saved / 1e6:.2f} MB per session "
+          f"({saved * args.sessions / 1e6:.1f} MB for {args.sessions} sessions)")
+
+
+if __name__ == '__main__':
+    main()
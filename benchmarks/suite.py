@@ -0,0 +1,377 @@
+"""Benchmark suite for the data, metrics, search, sampling and recommendation paths.
+
+Each case times one code path of the apps on a synthetic corpus of N
+per-prompt verdicts from S safeguards (see BELLS_leaderboard_mock_up.synthetic):
+
+- load_data: cold read of the verdict CSV through the shared datastore
+- load_data_cached: datastore hit (file signature check only)
+- metrics: per-dataset detection rates, BELLS and prevention scores
+- playground_index: lower-cased search text of the playground datasets
+- playground_filter: category filter and literal search of the playground
+- sampling: simulated detections of the Panel playground for all safeguards, on one
+  playground-sized dataset (at most `SAMPLED_PROMPTS` prompts, whatever N)
+- recommendation_prompt: recommendation request built from the results table
+- leaderboard_pipeline: CSV to ranked leaderboard (load + metrics), end to end
+- cube_build: detection count cube and its two-way roll-ups
+- cube_breakdown: a sliced category x jailbreak source heatmap of the cube
+- bootstrap: 1,000 bootstrap replicates of every metric, in one process
+- ranks: rank distribution and win probabilities of 10,000 BELLS score replicates
+- significance: McNemar tests of every pair of safeguards on every slice
+- disagreement_index: packed verdicts and disagreement summaries of the corpus
+- disagreement_filter: rows caught only by one safeguard, from the index
+- similarity_index: TF-IDF index of the prompt texts
+- similarity_query: top 10 prompts most similar to one of them
+- adaptive_ranking: adaptive BELLS ranking of the stub safeguards on the corpus prompts
+- online_first_estimate: first estimate of the results table from one of 16 Parquet row groups
+- online_scan: online aggregation of all 16 row groups, estimating after each one
+
+Results are medians over repeated runs. `--save-baseline` stores them in
+benchmarks/baselines/suite.json, `--compare` reports the ratio to the stored
+baseline and exits with status 1 when a case is slower than the threshold.
+Baselines are machine-dependent: compare runs made on the same machine.
+
+    python benchmarks/suite.py --sizes 1000 10000 --safeguards 5 20
+    python benchmarks/suite.py --compare --threshold 0.25
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PACKAGE_DIR = Path(__file__).parent.parent / 'src' / 'BELLS_leaderboard_mock_up'
+sys.path[:0] = [str(PACKAGE_DIR / 'panel_version'), str(PACKAGE_DIR.parent)]
+
+from BELLS_leaderboard_mock_up import datastore
+from BELLS_leaderboard_mock_up.metrics import detection_rates, leaderboard
+from BELLS_leaderboard_mock_up.synthetic import generate_frame
+
+BASELINE = Path(__file__).parent / 'baselines' / 'suite.json'
+# Prompts the sampling case draws detections for: the Panel playground samples one dataset at a time,
+# the largest (harmful_non-adversarial.csv) has 100; one draw per prompt and safeguard is slow
+SAMPLED_PROMPTS = 100
+
+USER_PREFERENCES = {
+    'system_type': 'Black Box API',
+    'interaction_types': ['Direct Prompting'],
+    'user_types': ['General Public'],
+    'conservativeness': 'Balanced',
+    'primary_concerns': ['Jailbreaks', 'Harmful Content'],
+    'request_volume': '1,000-10,000 requests/day',
+    'jailbreak_proportion': 'Medium',
+    'fpr_tolerance': 'Low',
+}
+
+
+# Synthetic inputs
+
+def evaluation_results(names):
+    """Results table with one row per safeguard name, cycling through the real safeguards"""
+    real = pd.read_csv(datastore.DATA_DIR / 'safeguard_evaluation_results.csv')
+    table = real.iloc[np.arange(len(names)) % len(real)].reset_index(drop=True)
+    table['safeguard'] = names
+    return table
+
+
+def verdict_corpus(size, safeguards, seed=0):
+    """Synthetic corpus of `size` prompts and the results table of its safeguards"""
+    corpus, spec = generate_frame(size, safeguards=safeguards, seed=seed)
+    # Column names of the playground datasets
+    corpus = corpus.rename(columns={'question': 'Goal', 'category': 'Category'})
+    return corpus, evaluation_results(spec.safeguards)
+
+
+# Cases: each returns the function to time, after its untimed setup
+
+def case_load_data(corpus, results, tmp):
+    corpus.to_csv(tmp / 'verdicts.csv', index=False)
+
+    def run():
+        datastore.clear()
+        datastore.load_dataset('verdicts.csv', tmp)
+    return run
+
+
+def case_load_data_cached(corpus, results, tmp):
+    corpus.to_csv(tmp / 'verdicts.csv', index=False)
+    datastore.load_dataset('verdicts.csv', tmp)
+    return lambda: datastore.load_dataset('verdicts.csv', tmp)
+
+
+def case_metrics(corpus, results, tmp):
+    safeguards = results['safeguard'].tolist()
+    return lambda: leaderboard(detection_rates(corpus, safeguards))
+
+
+def case_playground_index(corpus, results, tmp):
+    from playground import build_index
+    datasets = {'Harmful': {'Non-Adversarial': corpus}}
+    return lambda: build_index(datasets)
+
+
+def case_playground_filter(corpus, results, tmp):
+    from playground import filter_dataset
+    search_text = corpus['Goal'].str.lower()
+    category = corpus['Category'].iloc[0]
+    return lambda: filter_dataset(corpus, search_text, 'kill', category)
+
+
+def case_sampling(corpus, results, tmp):
+    # The Panel playground draws one detection per prompt and safeguard
+    from playground import get_detection_result
+    prompts = min(len(corpus), SAMPLED_PROMPTS)
+
+    def run():
+        return {
+            name: sum(get_detection_result(results, name, 'Harmful', 'Adversarial') for _ in range(prompts))
+            for name in results['safeguard']
+        }
+    return run
+
+
+def case_recommendation_prompt(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.streamlit_version.recommender import build_prompt
+    return lambda: build_prompt(USER_PREFERENCES, results)
+
+
+def case_leaderboard_pipeline(corpus, results, tmp):
+    corpus.to_csv(tmp / 'verdicts.csv', index=False)
+    safeguards = results['safeguard'].tolist()
+
+    def run():
+        datastore.clear()
+        verdicts = datastore.load_dataset('verdicts.csv', tmp)
+        return leaderboard(detection_rates(verdicts, safeguards))
+    return run
+
+
+def case_cube_build(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.cube import DataCube, cube_cells
+    verdicts = corpus.rename(columns={'Goal': 'question', 'Category': 'category'})
+    safeguards = results['safeguard'].tolist()
+    return lambda: DataCube(cube_cells(verdicts, safeguards)).materialize()
+
+
+def case_cube_breakdown(corpus, results, tmp):
+    # A heatmap of the leaderboards: a slice of the cube, then one two-way roll-up
+    from BELLS_leaderboard_mock_up.cube import DataCube, cube_cells
+    verdicts = corpus.rename(columns={'Goal': 'question', 'Category': 'category'})
+    cube = DataCube(cube_cells(verdicts, results['safeguard'].tolist()))
+    safeguard = results['safeguard'].iloc[0]
+    return lambda: cube.slice(harm_level='harmful', adversarial=True).breakdown(
+        'category', 'jailbreak_source', safeguard)
+
+
+def case_bootstrap(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.bootstrap import Bootstrap, compress
+    verdicts = corpus.rename(columns={'Goal': 'question', 'Category': 'category'})
+    bootstrap = Bootstrap(compress(verdicts, results['safeguard'].tolist()))
+    return lambda: bootstrap.replicates(1000, workers=1)
+
+
+def case_ranks(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.bootstrap import Bootstrap, compress
+    from BELLS_leaderboard_mock_up.ranks import rank_counts
+    verdicts = corpus.rename(columns={'Goal': 'question', 'Category': 'category'})
+    bootstrap = Bootstrap(compress(verdicts, results['safeguard'].tolist()))
+    scores = bootstrap.replicates(10000, workers=1)[:, :, bootstrap.metrics.index('BELLS_score')]
+    return lambda: rank_counts(scores)
+
+
+def case_significance(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.bootstrap import compress
+    from BELLS_leaderboard_mock_up.significance import pairwise_tests
+    verdicts = corpus.rename(columns={'Goal': 'question', 'Category': 'category'})
+    patterns = compress(verdicts, results['safeguard'].tolist())
+    return lambda: pairwise_tests(patterns)
+
+
+def case_disagreement_index(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.disagreement import DisagreementIndex
+    safeguards = results['safeguard'].tolist()
+    return lambda: DisagreementIndex(corpus, safeguards)
+
+
+def case_disagreement_filter(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.disagreement import DisagreementIndex
+    index = DisagreementIndex(corpus, results['safeguard'].tolist())
+    safeguard = index.safeguards[0]
+    return lambda: index.rows(index.query('caught_only', safeguard))
+
+
+def case_similarity_index(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.similarity import SimilarityIndex
+    texts = corpus['Goal'].astype(str).tolist()
+    return lambda: SimilarityIndex.build({'non_adversarial': texts})
+
+
+def case_similarity_query(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.similarity import SimilarityIndex
+    texts = corpus['Goal'].astype(str).tolist()
+    index = SimilarityIndex.build({'non_adversarial': texts})
+    return lambda: index.similar(texts[0], 10)
+
+
+def case_adaptive_ranking(corpus, results, tmp):
+    import pyarrow as pa
+    from BELLS_leaderboard_mock_up.adaptive import evaluate_adaptive
+    from BELLS_leaderboard_mock_up.safeguards import stub_safeguards
+    from BELLS_leaderboard_mock_up.verdicts import PROMPT_COLUMNS
+    prompts = pa.Table.from_pandas(corpus.rename(columns={'Goal': 'question', 'Category': 'category'})[PROMPT_COLUMNS],
+                                   preserve_index=False)
+    return lambda: evaluate_adaptive(prompts, stub_safeguards())
+
+
+def write_row_groups(corpus, path, row_groups=16):
+    """Corpus as a Parquet verdict corpus of `row_groups` row groups"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(corpus.rename(columns={'Goal': 'question', 'Category': 'category'}),
+                                 preserve_index=False)
+    pq.write_table(table, path, row_group_size=-(-len(corpus) // row_groups))
+
+
+def case_online_first_estimate(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.online import OnlineAggregation
+    write_row_groups(corpus, tmp / 'verdicts.parquet')
+
+    def run():
+        aggregation = OnlineAggregation(tmp / 'verdicts.parquet')
+        aggregation.step()
+        return aggregation.estimates()
+    return run
+
+
+def case_online_scan(corpus, results, tmp):
+    from BELLS_leaderboard_mock_up.online import OnlineAggregation
+    write_row_groups(corpus, tmp / 'verdicts.parquet')
+    return lambda: list(OnlineAggregation(tmp / 'verdicts.parquet'))
+
+
+CASES = {
+    'load_data': case_load_data,
+    'load_data_cached': case_load_data_cached,
+    'metrics': case_metrics,
+    'playground_index': case_playground_index,
+    'playground_filter': case_playground_filter,
+    'sampling': case_sampling,
+    'recommendation_prompt': case_recommendation_prompt,
+    'leaderboard_pipeline': case_leaderboard_pipeline,
+    'cube_build': case_cube_build,
+    'cube_breakdown': case_cube_breakdown,
+    'bootstrap': case_bootstrap,
+    'ranks': case_ranks,
+    'significance': case_significance,
+    'disagreement_index': case_disagreement_index,
+    'disagreement_filter': case_disagreement_filter,
+    'similarity_index': case_similarity_index,
+    'similarity_query': case_similarity_query,
+    'adaptive_ranking': case_adaptive_ranking,
+    'online_first_estimate': case_online_first_estimate,
+    'online_scan': case_online_scan,
+}
+
+
+# Running
+
+def measure(run, repeat, max_time, min_sample=0.05):
+    """Median time of one call over up to `repeat` samples, stopping early after `max_time` seconds.
+
+    Fast cases are called several times per sample (at least `min_sample`
+    seconds), as timeit does, so timer resolution and noise do not dominate.
+    """
+    # Warm-up (imports, caches), a run slower than `max_time` is measured only once
+    start = time.perf_counter()
+    run()
+    first = time.perf_counter() - start
+    if first > max_time:
+        return first, 1
+
+    number = max(1, int(min_sample / max(first, 1e-9)))
+    durations = []
+    deadline = time.perf_counter() + max_time
+    while len(durations) < repeat:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        durations.append((time.perf_counter() - start) / number)
+        if time.perf_counter() > deadline:
+            break
+    return statistics.median(durations), len(durations) * number
+
+
+def run_suite(sizes, safeguard_counts, cases, repeat, max_time):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            for safeguards in safeguard_counts:
+                corpus, table = verdict_corpus(size, safeguards)
+                for name in cases:
+                    key = f"{name}[n={size},s={safeguards}]"
+                    seconds, runs = measure(CASES[name](corpus, table, Path(tmp)), repeat, max_time)
+                    results[key] = seconds
+                    print(f"{key:>48} {seconds * 1e3:12.3f} ms  ({runs} calls)", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the ratio of each case to its baseline, returns the names of the regressions"""
+    regressions = []
+    print(f"\n{'case':>48} {'baseline [ms]':>14} {'now [ms]':>12} {'ratio':>7}")
+    for key, seconds in results.items():
+        if key not in baseline:
+            print(f"{key:>48} {'-':>14} {seconds * 1e3:12.3f} {'new':>7}")
+            continue
+        ratio = seconds / baseline[key]
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = '  SLOWER'
+        print(f"{key:>48} {baseline[key] * 1e3:14.3f} {seconds * 1e3:12.3f} {ratio:7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help='Corpus sizes (number of prompts)')
+    parser.add_argument('--safeguards', type=int, nargs='+', default=[5, 20],
+                        help='Numbers of safeguards')
+    parser.add_argument('--case', choices=list(CASES), action='append', help='Case(s) to run, all by default')
+    parser.add_argument('--repeat', type=int, default=7, help='Maximum runs per case')
+    parser.add_argument('--max-time', type=float, default=2.0,
+                        help='Stop repeating a case after this many seconds')
+    parser.add_argument('--save-baseline', action='store_true', help=f'Store the results in {BASELINE.name}')
+    parser.add_argument('--compare', action='store_true', help='Compare the results with the stored baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Relative slowdown reported as a regression (0.25 = 25%% slower)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE, help='Baseline file')
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.safeguards, args.case or list(CASES), args.repeat, args.max_time)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'processor': platform.machine()},
+            'results': results,
+        }, indent=2) + '\n')
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) more than {args.threshold:.0%} slower than the baseline")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
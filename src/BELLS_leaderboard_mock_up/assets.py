@@ -0,0 +1,149 @@
+"""Static image assets shared by the three front ends.
+
+Images from `images/` are resized to the sizes they are displayed at,
+re-encoded to AVIF/WebP and written under content-hashed file names, so they
+can be served as static files with a long cache lifetime instead of being
+inlined (base64) into every page.
+
+Build ahead of time with `python -m BELLS_leaderboard_mock_up.assets`, or let
+the apps call `build_assets()` at startup: it only re-encodes images whose
+source changed since the last build.
+"""
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+IMAGES_DIR = PROJECT_ROOT / 'images'
+STATIC_DIR = PROJECT_ROOT / 'static' / 'assets'
+
+# CSS width (px) each image is displayed at; a 2x variant is built for high-DPI screens
+VARIANTS = {
+    'logo_cesia_full.png': 160,
+    'adv_harm_color_matrix.png': 800,
+    'continuous_prompts_space.png': 800,
+}
+
+# Preferred format first, the last one is used for the <img> fallback
+FORMATS = {
+    'avif': {'quality': 60, 'speed': 8},
+    'webp': {'quality': 80, 'method': 4},
+}
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def _supported_formats():
+    """Formats the installed Pillow can encode (AVIF needs Pillow >= 11.3)"""
+    from PIL import features
+    return [fmt for fmt in FORMATS if features.check(fmt)]
+
+
+def _encode_variants(source, width, output_dir):
+    """Resize `source` to `width` and 2x `width`, encode every format, returns the variants"""
+    from PIL import Image
+    from io import BytesIO
+
+    variants = {}
+    with Image.open(source) as image:
+        for fmt in _supported_formats():
+            variants[fmt] = {}
+            for scale in (1, 2):
+                # Never upscale past the source resolution
+                target_width = min(width * scale, image.width)
+                target_height = round(image.height * target_width / image.width)
+                resized = image.resize((target_width, target_height), Image.LANCZOS)
+
+                buffer = BytesIO()
+                resized.save(buffer, format=fmt.upper(), **FORMATS[fmt])
+                data = buffer.getvalue()
+
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                filename = f"{Path(source).stem}.{target_width}w.{digest}.{fmt}"
+                (output_dir / filename).write_bytes(data)
+                variants[fmt][f'{scale}x'] = filename
+        size = image.size
+
+    return variants, size
+
+
+def build_assets(output_dir=STATIC_DIR, images_dir=IMAGES_DIR):
+    """Build the resized variants of every image in VARIANTS and return the manifest"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+
+    previous = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    encoding = {fmt: FORMATS[fmt] for fmt in _supported_formats()}
+    manifest = {}
+
+    for name, width in VARIANTS.items():
+        source = Path(images_dir) / name
+        source_hash = _file_hash(source)
+        entry = previous.get(name)
+
+        # Reuse the previous build if neither the image, its display size nor the encoding changed
+        if (entry and entry['source_hash'] == source_hash and entry['width'] == width
+                and entry['encoding'] == encoding
+                and all((output_dir / f).exists() for v in entry['variants'].values() for f in v.values())):
+            manifest[name] = entry
+            continue
+
+        variants, size = _encode_variants(source, width, output_dir)
+        height = round(size[1] * width / size[0])
+        manifest[name] = {
+            'source_hash': source_hash,
+            'width': width,
+            'height': height,
+            'encoding': encoding,
+            'variants': variants
+        }
+
+    # Remove variants left over from previous builds
+    current = {f for entry in manifest.values() for v in entry['variants'].values() for f in v.values()}
+    for path in output_dir.iterdir():
+        if path.name != MANIFEST_NAME and path.name not in current:
+            path.unlink()
+
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def asset_url(filename, url_prefix):
+    """URL of a built asset.
+
+    The `v` query argument makes Tornado's static file handlers (used by
+    Streamlit and Panel) send a far-future Cache-Control header.
+    """
+    digest = filename.split('.')[-2]
+    return f"{url_prefix}/{filename}?v={digest}"
+
+
+def picture_html(manifest, name, url_prefix, alt='', attrs=''):
+    """<picture> element serving the AVIF/WebP variants of `name` at 1x and 2x"""
+    entry = manifest[name]
+    variants = entry['variants']
+
+    sources = []
+    for fmt, files in variants.items():
+        srcset = ', '.join(f"{asset_url(filename, url_prefix)} {scale}" for scale, filename in files.items())
+        sources.append(f'<source type="image/{fmt}" srcset="{srcset}">')
+
+    fallback = asset_url(list(variants.values())[-1]['1x'], url_prefix)
+    img = (f'<img src="{fallback}" width="{entry["width"]}" height="{entry["height"]}" '
+           f'alt="{alt}" {attrs}>')
+    return f"<picture>{''.join(sources)}{img}</picture>"
+
+
+if __name__ == '__main__':
+    output_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else STATIC_DIR
+    manifest = build_assets(output_dir)
+    for name, entry in manifest.items():
+        files = [f for v in entry['variants'].values() for f in v.values()]
+        size = sum((output_dir / f).stat().st_size for f in files)
+        print(f"{name}: {len(files)} variants, {size / 1024:.1f} KB total")
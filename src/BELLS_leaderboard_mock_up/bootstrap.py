@@ -0,0 +1,288 @@
+"""Bootstrap confidence intervals of every leaderboard metric.
+
+A verdict corpus is first reduced to its verdict patterns: prompts of the
+same cell (`metrics.CELL_COLUMNS`) with the same verdict from every
+safeguard are interchangeable, so each distinct row is kept once with its
+number of `prompts` (`data/verdict_patterns.csv`).
+
+A replicate resamples the prompts of every dataset (harm level x
+adversarial) with replacement, keeping the dataset sizes. Drawing prompt
+indices only matters through how many times each pattern is drawn, which
+is a multinomial over the dataset's patterns: replicates cost the number of
+patterns, not of prompts. Replicates are drawn in batches; the (batch x
+patterns) draw counts times a (patterns x groups . safeguards) matrix of the
+verdicts of every group of prompts (dataset, harm category, jailbreak type
+and source) gives, in one product, the detections of every safeguard in
+every group of every replicate of the batch. Every metric of
+`metrics.results_table` and `metrics.leaderboard` follows from them.
+
+Batches run in a process pool; batch `i` is drawn from seed (seed, i), so
+the replicates do not depend on the number of workers. Intervals are
+percentile intervals, cached per patterns digest in `data/bootstrap/`.
+
+The repository has no per-prompt verdicts of the real evaluation, and an
+interval's width depends only on the prompts of each dataset: the committed
+patterns are those of a synthetic corpus with as many prompts per dataset as
+the real evaluation (`dataset_sizes`). Their intervals, and the rank
+probabilities and tests built on them, are simulated.
+
+    python -m BELLS_leaderboard_mock_up.bootstrap --replicates 10000
+    python -m BELLS_leaderboard_mock_up.bootstrap --sized --patterns-output data/verdict_patterns.csv
+    python -m BELLS_leaderboard_mock_up.bootstrap --verdicts data/verdicts.parquet --patterns-output data/verdict_patterns.csv
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR, dataset_digest, load_dataset
+from BELLS_leaderboard_mock_up.metrics import (
+    CELL_COLUMNS, HARM_LEVELS, JAILBREAK_SOURCE_PREFIX, JAILBREAK_TYPE_PREFIX, bells_score, category_column,
+    dataset_column, jailbreak_type, prevention_score,
+)
+
+BATCH_SIZE = 256
+LEADERBOARD_METRICS = ['BELLS_score', 'prevention_score', 'borderline_sensitivity', 'adversarial_sensitivity']
+
+
+def dataset_sizes(data_dir=DATA_DIR):
+    """Prompts of every dataset (harm level, adversarial) of the real evaluation: those of the playground's
+    non-adversarial datasets, and as many jailbreaks, one per goal (the jailbreak datasets are not in the
+    repository)"""
+    sizes = {}
+    for adversarial in (False, True):
+        for harm_level in HARM_LEVELS:
+            sizes[(harm_level, adversarial)] = len(load_dataset(f'{harm_level}_non-adversarial.csv', data_dir))
+    return sizes
+
+
+def compress(verdicts, safeguards):
+    """Verdict patterns of a corpus: its distinct (cell, verdicts) rows and their number of prompts"""
+    frame = verdicts[CELL_COLUMNS].astype(object)
+    frame = frame.where(frame.notna(), None).assign(adversarial=verdicts['adversarial'].astype(bool))
+    frame = pd.concat([frame, pd.DataFrame({safeguard: verdicts[safeguard].astype('int8').to_numpy()
+                                            for safeguard in safeguards}, index=frame.index)], axis=1)
+    return _with_keys(frame.groupby(CELL_COLUMNS + list(safeguards), dropna=False).size())
+
+
+def _with_keys(counts):
+    """Pattern columns and `prompts` of counts indexed by the patterns, built at once rather than column by column"""
+    columns = {name: counts.index.get_level_values(name) for name in counts.index.names}
+    return pd.DataFrame({**columns, 'prompts': counts.to_numpy()})
+
+
+def merge_patterns(parts):
+    """Verdict patterns of the union of disjoint corpora"""
+    patterns = pd.concat(parts, ignore_index=True)
+    keys = [column for column in patterns.columns if column != 'prompts']
+    return _with_keys(patterns.groupby(keys, dropna=False)['prompts'].sum())
+
+
+def groups(patterns):
+    """Groups of prompts every metric is a rate over, as {metric: mask over the patterns}.
+
+    Datasets, then harm categories over harmful prompts, jailbreak types and
+    sources over harmful jailbreaks, as in `metrics.results_table`.
+    """
+    harm_level = patterns['harm_level'].astype(str).to_numpy()
+    adversarial = patterns['adversarial'].astype(str).str.lower().eq('true').to_numpy()
+    category = patterns['category'].astype(str).str.strip().to_numpy()
+    source = patterns['jailbreak_source'].astype(object)
+    has_source = source.notna().to_numpy()
+    source = source.where(has_source, None).to_numpy()
+    masks = {}
+    for level, is_adversarial in sorted(set(zip(harm_level, adversarial)), key=lambda key: (not key[1], key[0])):
+        masks[dataset_column(level, is_adversarial)] = (harm_level == level) & (adversarial == is_adversarial)
+    harmful = harm_level == 'harmful'
+    for name in sorted(set(category[harmful])):
+        masks[category_column(name)] = harmful & (category == name)
+    jailbreaks = harmful & adversarial & has_source
+    types = np.array([jailbreak_type(s) if isinstance(s, str) else None for s in source], dtype=object)
+    for name in sorted(set(types[jailbreaks])):
+        masks[JAILBREAK_TYPE_PREFIX + name] = jailbreaks & (types == name)
+    for name in sorted(set(source[jailbreaks])):
+        masks[JAILBREAK_SOURCE_PREFIX + name] = jailbreaks & (source == name)
+    return masks
+
+
+def _leaderboard_metrics(rates, names):
+    """BELLS, prevention and sensitivity scores from the group rates (..., groups) of `names`"""
+    column = {name: rates[..., i] for i, name in enumerate(names)}
+    needed = ['harmful_jailbreaks', 'harmful_non-adversarial', 'benign_non-adversarial',
+              'borderline_non-adversarial', 'benign_jailbreaks']
+    if any(name not in column for name in needed):
+        return np.zeros(rates.shape[:-1] + (0,)), []
+    scores = np.stack([
+        bells_score(column['harmful_jailbreaks'], column['harmful_non-adversarial'], column['benign_non-adversarial']),
+        prevention_score(column['harmful_jailbreaks'], column['harmful_non-adversarial']),
+        column['borderline_non-adversarial'],
+        column['benign_jailbreaks'],
+    ], axis=-1)
+    return scores, LEADERBOARD_METRICS
+
+
+class Bootstrap:
+    """Replicates of every metric of every safeguard, see the module docstring"""
+
+    def __init__(self, patterns, safeguards=None):
+        self.safeguards = list(safeguards or [c for c in patterns.columns if c not in CELL_COLUMNS + ['prompts']])
+        self.prompts = patterns['prompts'].to_numpy(dtype='int64')
+        masks = groups(patterns)
+        self.groups = list(masks)
+        verdicts = patterns[self.safeguards].to_numpy(dtype='float32')
+        # Per group: its prompts, then the detections of every safeguard
+        block = np.concatenate([np.ones((len(patterns), 1), dtype='float32'), verdicts], axis=1)
+        self.weights = np.concatenate([block * masks[name][:, None] for name in self.groups], axis=1)
+
+        # Replicates resample each dataset separately
+        datasets = patterns[['harm_level', 'adversarial']].astype(str).agg('|'.join, axis=1)
+        self.strata = [np.flatnonzero((datasets == key).to_numpy()) for key in datasets.unique()]
+        self.metrics = self.groups + _leaderboard_metrics(np.zeros((1, len(self.groups))), self.groups)[1]
+
+    def _metrics(self, counts):
+        """(replicates, safeguards, metrics) of the draw counts (replicates, patterns)"""
+        sums = (counts @ self.weights).reshape(len(counts), len(self.groups), len(self.safeguards) + 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = np.transpose(sums[:, :, 1:] / sums[:, :, :1], (0, 2, 1))
+        scores, _ = _leaderboard_metrics(rates, self.groups)
+        return np.concatenate([rates, scores], axis=-1).astype('float32')
+
+    def estimates(self):
+        """(safeguards, metrics) on the corpus itself"""
+        return self._metrics(self.prompts[None, :].astype('float32'))[0]
+
+    def sample(self, rng, size):
+        """(size, safeguards, metrics) for `size` replicates"""
+        counts = np.zeros((size, len(self.prompts)), dtype='float32')
+        for rows in self.strata:
+            counts[:, rows] = rng.multinomial(self.prompts[rows].sum(), self.prompts[rows] / self.prompts[rows].sum(),
+                                              size=size)
+        return self._metrics(counts)
+
+    def replicates(self, replicates, seed=0, workers=None):
+        """(replicates, safeguards, metrics), batch `i` of `BATCH_SIZE` drawn from seed (seed, i)"""
+        sizes = [min(BATCH_SIZE, replicates - start) for start in range(0, replicates, BATCH_SIZE)]
+        tasks = [(seed, index, size) for index, size in enumerate(sizes)]
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        if workers <= 1:
+            batches = [_sample(self, *task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker, initargs=(self,)) as pool:
+                batches = list(pool.map(_worker_sample, tasks))
+        return np.concatenate(batches) if batches else np.zeros((0, len(self.safeguards), len(self.metrics)))
+
+    def intervals(self, replicates=10000, confidence=0.95, seed=0, workers=None):
+        """Estimate, standard error and percentile interval of every (safeguard, metric), long format"""
+        samples = self.replicates(replicates, seed, workers)
+        tail = (1 - confidence) / 2 * 100
+        with np.errstate(invalid='ignore'):
+            low, high = np.nanpercentile(samples, [tail, 100 - tail], axis=0)
+            std = np.nanstd(samples, axis=0)
+        index = pd.MultiIndex.from_product([self.safeguards, self.metrics], names=['safeguard', 'metric'])
+        return pd.DataFrame({'estimate': self.estimates().ravel(), 'std': std.ravel(),
+                             'low': low.ravel(), 'high': high.ravel()}, index=index).reset_index()
+
+
+def _sample(bootstrap, seed, index, size):
+    return bootstrap.sample(np.random.default_rng([seed, index]), size)
+
+
+_worker_bootstrap = None
+
+
+def _set_worker(bootstrap):
+    global _worker_bootstrap
+    _worker_bootstrap = bootstrap
+
+
+def _worker_sample(task):
+    return _sample(_worker_bootstrap, *task)
+
+
+def error_bars(intervals):
+    """Half-widths of the intervals below (`minus`) and above (`plus`) their estimate, per safeguard and metric"""
+    return intervals[['safeguard', 'metric']].assign(minus=intervals['estimate'] - intervals['low'],
+                                                     plus=intervals['high'] - intervals['estimate'])
+
+
+_intervals = {}
+_lock = threading.Lock()
+
+
+def load_intervals(name='verdict_patterns.csv', replicates=10000, confidence=0.95, data_dir=DATA_DIR,
+                   cache_dir=None, workers=1):
+    """Intervals of the verdict patterns `data/<name>`, cached in memory and on disk per content digest.
+
+    The apps call it from their server threads, so replicates are drawn in process by default rather
+    than in a pool of every core while the other sessions wait on the lock.
+    """
+    digest = dataset_digest(name, data_dir)
+    cache_dir = Path(cache_dir or Path(data_dir) / 'bootstrap')
+    path = cache_dir / f"{Path(name).stem}-{digest[:16]}-{replicates}-{confidence}.csv"
+    with _lock:
+        if path not in _intervals:
+            if path.exists():
+                _intervals[path] = pd.read_csv(path)
+            else:
+                intervals = Bootstrap(load_dataset(name, data_dir)).intervals(replicates, confidence,
+                                                                              workers=workers)
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                intervals.to_csv(path, index=False)
+                _intervals[path] = intervals
+        return _intervals[path]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals of the leaderboard metrics")
+    parser.add_argument('--verdicts', default=None,
+                        help='Verdict corpus (.parquet), default: the patterns of data/verdict_patterns.csv')
+    parser.add_argument('--synthetic', type=int, default=None, metavar='PROMPTS',
+                        help='Use a synthetic corpus of PROMPTS prompts following the results table instead')
+    parser.add_argument('--sized', action='store_true',
+                        help='Use a synthetic corpus with the prompts of each real dataset (the committed patterns)')
+    parser.add_argument('--patterns-output', default=None, help='Write the verdict patterns of the corpus to this CSV')
+    parser.add_argument('--replicates', type=int, default=10000)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='CSV of the intervals')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.verdicts or args.synthetic or args.sized:
+        if args.verdicts:
+            from BELLS_leaderboard_mock_up.verdicts import iter_batches, read_schema, safeguard_names
+            safeguards = safeguard_names(read_schema(args.verdicts))
+            batches = iter_batches(args.verdicts)
+        elif args.sized:
+            from BELLS_leaderboard_mock_up.synthetic import generate_datasets
+            safeguards, batches = generate_datasets(dataset_sizes(), seed=args.seed)
+        else:
+            from BELLS_leaderboard_mock_up.synthetic import CorpusSpec, generate
+            spec = CorpusSpec()
+            safeguards, batches = spec.safeguards, generate(spec, args.synthetic)
+        patterns = merge_patterns([compress(batch.to_pandas(), safeguards) for batch in batches])
+    else:
+        patterns = pd.read_csv(DATA_DIR / 'verdict_patterns.csv')
+    if args.patterns_output:
+        patterns.to_csv(args.patterns_output, index=False)
+    print(f"{patterns['prompts'].sum()} prompts in {len(patterns)} verdict patterns "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    intervals = Bootstrap(patterns).intervals(args.replicates, args.confidence, args.seed, args.workers)
+    print(f"{args.replicates} replicates with {args.workers} workers in {time.perf_counter() - start:.1f}s")
+    if args.output:
+        intervals.to_csv(args.output, index=False)
+    shown = intervals[intervals['metric'].isin(LEADERBOARD_METRICS)]
+    print(shown.pivot(index='safeguard', columns='metric', values=['low', 'estimate', 'high'])
+          .swaplevel(axis=1).sort_index(axis=1).round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
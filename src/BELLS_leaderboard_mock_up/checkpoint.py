@@ -0,0 +1,274 @@
+"""Crash-safe evaluation runs: write-ahead log, checkpoints and resume.
+
+A run directory holds the state of one evaluation:
+
+- `wal.log`: every evaluated chunk is appended as one record (chunk id,
+  length, CRC32, then the chunk's verdicts as an Arrow IPC stream) and
+  synced to disk before it counts as done
+- `segment-<n>.parquet`, `counts-<n>.parquet`, `manifest.json`: every
+  `checkpoint_every` chunks, the chunks of the log are compacted into a new
+  Parquet segment and their detection counts folded into the run's; the
+  manifest, listing the chunks of every segment, is then replaced
+  atomically and the log truncated
+- `progress.json`: prompts done and remaining, throughput and ETA
+
+A chunk is identified by its first `prompt_id`. On restart, the manifest is
+loaded and the log replayed up to its first torn or corrupt record; chunks
+already in the manifest (a crash between the manifest and the truncation)
+are skipped. Every chunk is then either done, and counted exactly once, or
+evaluated again from scratch.
+"""
+import asyncio
+import io
+import json
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from BELLS_leaderboard_mock_up.evaluation import EvaluationRunner
+from BELLS_leaderboard_mock_up.metrics import CELL_COLUMNS, detection_counts, merge_counts
+from BELLS_leaderboard_mock_up.verdicts import VerdictWriter
+
+# Chunk id, payload length, payload CRC32
+RECORD_HEADER = struct.Struct('<qII')
+
+
+def _write_atomic(path, write):
+    """Write through a temporary file, synced then renamed over `path`"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    write(tmp)
+    with open(tmp, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Progress:
+    """Throughput and ETA of the prompts evaluated since the run (re)started"""
+
+    def __init__(self, total, done=0):
+        self.total = total
+        self.done = done
+        self._resumed_at = done
+        self._start = time.perf_counter()
+
+    def advance(self, rows):
+        self.done += rows
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self._start
+        return (self.done - self._resumed_at) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        return (self.total - self.done) / self.rate if self.rate else None
+
+    def as_dict(self):
+        return {'done': self.done, 'total': self.total, 'prompts_per_second': self.rate, 'eta_seconds': self.eta}
+
+    def __str__(self):
+        eta = '?' if self.eta is None else time.strftime('%H:%M:%S', time.gmtime(self.eta))
+        return (f"{self.done}/{self.total} prompts ({self.done / max(self.total, 1):.1%}), "
+                f"{self.rate:.0f} prompts/s, ETA {eta}")
+
+
+class EvaluationJournal:
+    """State of a run directory, see the module docstring.
+
+    `done` holds the ids of the chunks already evaluated; `write` logs one
+    more chunk, `counts()` returns the detection counts of all of them.
+    """
+
+    def __init__(self, run_dir, safeguards, run_key, checkpoint_every=16):
+        self.run_dir = Path(run_dir)
+        self.safeguards = list(safeguards)
+        self.checkpoint_every = checkpoint_every
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self._manifest_path = self.run_dir / 'manifest.json'
+        self._wal_path = self.run_dir / 'wal.log'
+
+        if self._manifest_path.exists():
+            self.manifest = json.loads(self._manifest_path.read_text())
+            if self.manifest['run'] != run_key or self.manifest['safeguards'] != self.safeguards:
+                raise ValueError(f"{self.run_dir} holds another run (different prompts, chunks or safeguards)")
+        else:
+            self.manifest = {'run': run_key, 'safeguards': self.safeguards, 'sequence': 0,
+                             'chunks': {}, 'counts': None}
+        self._counts = (pd.read_parquet(self.run_dir / self.manifest['counts']).set_index(CELL_COLUMNS)
+                        if self.manifest['counts'] else None)
+        self._pending = {}
+        self._recover()
+        self._wal = open(self._wal_path, 'ab')
+
+    @property
+    def done(self):
+        return {int(chunk) for chunk in self.manifest['chunks']} | set(self._pending)
+
+    @property
+    def rows(self):
+        return sum(rows for _, _, rows in self.manifest['chunks'].values()) + \
+            sum(batch.num_rows for batch in self._pending.values())
+
+    def _recover(self):
+        """Replay the valid records of the log, then truncate what follows them"""
+        if not self._wal_path.exists():
+            return
+        data = self._wal_path.read_bytes()
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            chunk, length, crc = RECORD_HEADER.unpack_from(data, position)
+            payload = data[position + RECORD_HEADER.size:position + RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            position += RECORD_HEADER.size + length
+            if str(chunk) not in self.manifest['chunks']:
+                self._pending[chunk] = pa.ipc.open_stream(payload).read_next_batch()
+        with open(self._wal_path, 'r+b') as f:
+            f.truncate(position)
+
+    def write(self, batch):
+        """Log a chunk; it is done once this returns"""
+        chunk = batch.column(0)[0].as_py()
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, batch.schema) as stream:
+            stream.write_batch(batch)
+        payload = sink.getvalue()
+        self._wal.write(RECORD_HEADER.pack(chunk, len(payload), zlib.crc32(payload)) + payload)
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+        self._pending[chunk] = batch
+        if len(self._pending) >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Compact the logged chunks into a segment and truncate the log"""
+        if not self._pending:
+            return
+        sequence = self.manifest['sequence'] + 1
+        segment = f"segment-{sequence:05d}.parquet"
+        chunks = sorted(self._pending)
+
+        def write_segment(path):
+            with VerdictWriter(path, self.safeguards) as writer:
+                for chunk in chunks:
+                    writer.write(self._pending[chunk])
+        _write_atomic(self.run_dir / segment, write_segment)
+
+        counts = self.counts()
+        counts_file = f"counts-{sequence:05d}.parquet"
+        _write_atomic(self.run_dir / counts_file, lambda path: counts.reset_index().to_parquet(path, index=False))
+
+        previous_counts = self.manifest['counts']
+        manifest = dict(self.manifest, sequence=sequence, counts=counts_file, chunks={
+            **self.manifest['chunks'],
+            **{str(chunk): [segment, group, self._pending[chunk].num_rows] for group, chunk in enumerate(chunks)},
+        })
+        _write_atomic(self._manifest_path, lambda path: path.write_text(json.dumps(manifest)))
+        self.manifest = manifest
+        self._counts = counts
+        self._pending = {}
+
+        self._wal.truncate(0)
+        self._wal.seek(0)
+        if previous_counts:
+            (self.run_dir / previous_counts).unlink(missing_ok=True)
+
+    def counts(self):
+        parts = [] if self._counts is None else [self._counts]
+        parts += [detection_counts(batch.to_pandas(), self.safeguards) for batch in self._pending.values()]
+        if not parts:
+            return pd.DataFrame(columns=CELL_COLUMNS + ['prompts'] + self.safeguards, dtype='int64').set_index(
+                CELL_COLUMNS)
+        return merge_counts(parts)
+
+    def iter_chunks(self):
+        """Record batches of all done chunks, in chunk order"""
+        self.checkpoint()
+        files = {}
+        try:
+            for chunk in sorted(self.done):
+                segment, group, _ = self.manifest['chunks'][str(chunk)]
+                if segment not in files:
+                    files[segment] = pq.ParquetFile(self.run_dir / segment)
+                yield from files[segment].read_row_group(group).to_batches()
+        finally:
+            for f in files.values():
+                f.close()
+
+    def write_progress(self, progress):
+        _write_atomic(self.run_dir / 'progress.json', lambda path: path.write_text(json.dumps(progress.as_dict())))
+
+    def close(self):
+        self._wal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _JournalWriter:
+    """Runner writer logging chunks to the journal and reporting progress"""
+
+    def __init__(self, journal, progress, report, report_every):
+        self.journal = journal
+        self.progress = progress
+        self.report = report
+        self.report_every = report_every
+        self._reported = time.perf_counter()
+
+    def write(self, batch):
+        self.journal.write(batch)
+        self.progress.advance(batch.num_rows)
+        if time.perf_counter() - self._reported >= self.report_every:
+            self._reported = time.perf_counter()
+            self.journal.write_progress(self.progress)
+            if self.report:
+                self.report(str(self.progress))
+
+
+def run_key(prompts, chunk_size):
+    """What the chunks of a run depend on: the prompts and their chunking"""
+    ids = prompts.column('prompt_id')
+    return {'prompts': prompts.num_rows, 'first': ids[0].as_py() if len(ids) else None,
+            'last': ids[-1].as_py() if len(ids) else None, 'chunk_size': chunk_size}
+
+
+def evaluate_checkpointed(prompts, output, safeguards, run_dir, checkpoint_every=16, report=print,
+                          report_every=10.0, **runner_options):
+    """`evaluation.evaluate_corpus`, resumable from `run_dir` after a crash.
+
+    Returns the runner and the detection counts of the whole corpus. The run
+    directory is removed once the output is written.
+    """
+    names = [safeguard.name for safeguard in safeguards]
+    runner = EvaluationRunner(safeguards, **runner_options)
+    run_dir = Path(run_dir)
+    with EvaluationJournal(run_dir, names, run_key(prompts, runner.chunk_size), checkpoint_every) as journal:
+        progress = Progress(prompts.num_rows, done=journal.rows)
+        if journal.rows and report:
+            report(f"Resuming {run_dir}: {journal.rows}/{prompts.num_rows} prompts already evaluated")
+        asyncio.run(runner.run(prompts, _JournalWriter(journal, progress, report, report_every), skip=journal.done))
+        journal.write_progress(progress)
+
+        output = Path(output)
+        _write_atomic(output, lambda path: _write_chunks(path, names, journal.iter_chunks()))
+        counts = journal.counts()
+
+    for path in run_dir.iterdir():
+        path.unlink()
+    run_dir.rmdir()
+    return runner, counts
+
+
+def _write_chunks(path, safeguards, batches):
+    with VerdictWriter(path, safeguards) as writer:
+        for batch in batches:
+            writer.write(batch)
@@ -1,9 +1,10 @@
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
 def load_config():
     """Load configuration from environment variables"""
+    from dotenv import load_dotenv
+
     # Try to load from .env file if it exists
     env_path = Path(__file__).parent.parent.parent / '.env'
     load_dotenv(env_path)
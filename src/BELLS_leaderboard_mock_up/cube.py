@@ -0,0 +1,231 @@
+"""Detection counts as a data cube, for drill-down leaderboard breakdowns.
+
+The cube has one cell per combination of the `DIMENSIONS` found in a
+verdict corpus:
+
+- `harm_level`, `adversarial`, `category`
+- `jailbreak_type` and `jailbreak_source` (`none` for non-adversarial prompts)
+- `prompt_source`: the dataset the prompt text comes from (the `source`
+  column of `non_adversarial_prompts.csv`, `Source` of the JBB files,
+  `unknown` otherwise)
+
+and holds, per cell, the number of prompts and the detections of every
+safeguard (`data/safeguard_cube.csv`). Counts add up, so any breakdown is a
+roll-up of the cells:
+
+- `rollup(*dimensions)`: counts per combination of `dimensions`; every
+  roll-up of up to two dimensions is computed when the cube is loaded
+- `slice(**selection)`: the cube restricted to some values of dimensions
+- `rates(*dimensions)`, `breakdown(rows, columns, safeguard)`: detection
+  rates, e.g. a category x jailbreak source heatmap of one safeguard
+
+The cube is built from a Parquet verdict corpus (see `verdicts`), batch by
+batch, or from a synthetic corpus following the results table:
+
+    python -m BELLS_leaderboard_mock_up.cube --output data/safeguard_cube.csv
+    python -m BELLS_leaderboard_mock_up.cube --verdicts data/verdicts.parquet --output data/verdict_cube.csv
+"""
+import argparse
+import itertools
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR, dataset_digest, load_dataset
+from BELLS_leaderboard_mock_up.metrics import jailbreak_type
+from BELLS_leaderboard_mock_up.synthetic import CorpusSpec, generate
+from BELLS_leaderboard_mock_up.verdicts import iter_batches, read_schema, safeguard_names
+
+DIMENSIONS = ['harm_level', 'adversarial', 'category', 'jailbreak_type', 'jailbreak_source', 'prompt_source']
+DIMENSION_LABELS = {
+    'harm_level': 'Harm level',
+    'adversarial': 'Adversarial',
+    'category': 'Harm category',
+    'jailbreak_type': 'Jailbreak type',
+    'jailbreak_source': 'Jailbreak source',
+    'prompt_source': 'Prompt source',
+}
+NONE = 'none'
+UNKNOWN = 'unknown'
+
+
+def prompt_sources(data_dir=DATA_DIR):
+    """Source dataset of every prompt text of the prompt files"""
+    sources = {}
+    for name in ['harmful_non-adversarial.csv', 'borderline_non-adversarial.csv', 'benign_non-adversarial.csv']:
+        frame = pd.read_csv(data_dir / name)
+        sources.update(zip(frame['Goal'], frame['Source'] if 'Source' in frame else ['JailbreakBench'] * len(frame)))
+    frame = pd.read_csv(data_dir / 'non_adversarial_prompts.csv')
+    sources.update(zip(frame['question'], frame['source']))
+    return sources
+
+
+def cube_cells(verdicts, safeguards, sources=None):
+    """Prompts and detections of every safeguard per cell of the cube.
+
+    `verdicts` has the prompt columns of a verdict corpus (`question`,
+    `harm_level`, `adversarial`, `category`, `jailbreak_source`) and one 0/1
+    column per safeguard; `sources` maps prompt texts to their source.
+    """
+    adversarial = verdicts['adversarial'].astype(bool).to_numpy()
+    jailbreak_source = pd.Series(verdicts['jailbreak_source'].astype(object).to_numpy())
+    jailbreak_source = jailbreak_source.where(adversarial & jailbreak_source.notna().to_numpy(), NONE)
+    questions = pd.Series(verdicts['question'].astype(object).to_numpy())
+    keys = pd.DataFrame({
+        'harm_level': verdicts['harm_level'].astype(str).to_numpy(),
+        'adversarial': adversarial,
+        'category': verdicts['category'].astype(str).str.strip().to_numpy(),
+        'jailbreak_type': jailbreak_source.map(lambda source: NONE if source == NONE else jailbreak_type(source)),
+        'jailbreak_source': jailbreak_source,
+        'prompt_source': questions.map(sources or {}).fillna(UNKNOWN),
+    })
+    values = pd.DataFrame({'prompts': np.ones(len(keys), dtype='int64')})
+    for safeguard in safeguards:
+        values[safeguard] = verdicts[safeguard].to_numpy(dtype='int64')
+    return values.groupby([keys[dimension] for dimension in DIMENSIONS]).sum().reset_index()
+
+
+def merge_cells(parts):
+    """Cells of the union of disjoint corpora"""
+    return pd.concat(parts, ignore_index=True).groupby(DIMENSIONS).sum().reset_index()
+
+
+class DataCube:
+    """Detection counts per cell, see the module docstring"""
+
+    def __init__(self, cells):
+        self.cells = cells.reset_index(drop=True)
+        self.safeguards = [column for column in cells.columns if column not in DIMENSIONS and column != 'prompts']
+        self.levels, self._codes = {}, {}
+        for dimension in DIMENSIONS:
+            values = self.cells[dimension]
+            if dimension == 'adversarial':
+                values = values.astype(str).str.lower() == 'true'
+            self._codes[dimension], self.levels[dimension] = pd.factorize(values, sort=True)
+        self._counts = self.cells[['prompts'] + self.safeguards].to_numpy(dtype='int64')
+        self._rollups = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.cells)
+
+    def materialize(self, max_dimensions=2):
+        """Compute every roll-up of up to `max_dimensions` dimensions"""
+        for size in range(max_dimensions + 1):
+            for dimensions in itertools.combinations(DIMENSIONS, size):
+                self.rollup(*dimensions)
+        return self
+
+    def rollup(self, *dimensions):
+        """Prompts and detections per combination of `dimensions` present in the cube.
+
+        Indexed by `dimensions` (in the order of `DIMENSIONS`), built once and
+        shared: treat it as read-only.
+        """
+        unknown = set(dimensions) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {sorted(unknown)}")
+        dimensions = tuple(d for d in DIMENSIONS if d in dimensions)
+        with self._lock:
+            if dimensions not in self._rollups:
+                self._rollups[dimensions] = self._rollup(dimensions)
+            return self._rollups[dimensions]
+
+    def _rollup(self, dimensions):
+        shape = tuple(len(self.levels[d]) for d in dimensions)
+        keys = np.ravel_multi_index([self._codes[d] for d in dimensions], shape) if dimensions \
+            else np.zeros(len(self.cells), dtype='int64')
+        size = int(np.prod(shape))
+        sums = np.stack([np.bincount(keys, weights=column, minlength=size) for column in self._counts.T], axis=1)
+        present = np.flatnonzero(sums[:, 0])
+        if dimensions:
+            index = pd.MultiIndex.from_arrays(
+                [self.levels[d][codes] for d, codes in zip(dimensions, np.unravel_index(present, shape))],
+                names=list(dimensions))
+            index = index.get_level_values(0) if len(dimensions) == 1 else index
+        else:
+            index = pd.Index(['all'][:len(present)])
+        return pd.DataFrame(sums[present].astype('int64'), index=index, columns=['prompts'] + self.safeguards)
+
+    def slice(self, **selection):
+        """Cube of the cells whose dimensions take the selected value, or one of the selected values"""
+        keep = np.ones(len(self.cells), dtype=bool)
+        for dimension, values in selection.items():
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dimension}")
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            keep &= np.isin(self.levels[dimension][self._codes[dimension]], list(values))
+        return DataCube(self.cells[keep])
+
+    def rates(self, *dimensions):
+        """Detection rate of every safeguard per combination of `dimensions`"""
+        counts = self.rollup(*dimensions)
+        return counts[self.safeguards].div(counts['prompts'], axis=0)
+
+    def breakdown(self, rows, columns, safeguard):
+        """Detection rates of `safeguard`, `rows` values x `columns` values (NaN for empty cells)"""
+        if rows == columns:
+            raise ValueError("Rows and columns must be different dimensions")
+        return self.rates(rows, columns)[safeguard].unstack(columns)
+
+    def save(self, path):
+        self.cells.to_csv(path, index=False)
+
+
+def build_cells(batches, safeguards, sources=None):
+    """Cells of a corpus given as Arrow record batches"""
+    parts = [cube_cells(batch.to_pandas(), safeguards, sources) for batch in batches]
+    return merge_cells(parts)
+
+
+_cubes = {}
+_lock = threading.Lock()
+
+
+def load_cube(name='safeguard_cube.csv', data_dir=DATA_DIR):
+    """Shared cube of `data/<name>` with its two-dimensional roll-ups, rebuilt when the file changes"""
+    digest = dataset_digest(name, data_dir)
+    key = str(Path(data_dir) / name)
+    with _lock:
+        cached = _cubes.get(key)
+        if cached is None or cached[0] != digest:
+            cached = (digest, DataCube(load_dataset(name, data_dir)).materialize())
+            _cubes[key] = cached
+        return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the detection count cube of a verdict corpus")
+    parser.add_argument('--verdicts', default=None,
+                        help='Verdict corpus (.parquet), default: a synthetic corpus following the results table')
+    parser.add_argument('--prompts', type=int, default=1000000, help='Prompts of the synthetic corpus')
+    parser.add_argument('--output', type=Path, default=DATA_DIR / 'safeguard_cube.csv', help='CSV to write')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sources = prompt_sources()
+    if args.verdicts:
+        safeguards = safeguard_names(read_schema(args.verdicts))
+        cells = build_cells(iter_batches(args.verdicts), safeguards, sources)
+    else:
+        spec = CorpusSpec()
+        safeguards = spec.safeguards
+        cells = build_cells(generate(spec, args.prompts), safeguards, sources)
+    cube = DataCube(cells)
+    cube.save(args.output)
+    print(f"{cells['prompts'].sum()} prompts x {len(safeguards)} safeguards in {len(cube)} cells, "
+          f"{time.perf_counter() - start:.1f}s; written to {args.output}")
+
+    start = time.perf_counter()
+    heatmap = cube.slice(harm_level='harmful', adversarial=True).breakdown('category', 'jailbreak_source',
+                                                                          safeguards[0])
+    print(f"{safeguards[0]}, harmful jailbreaks, category x jailbreak source "
+          f"({(time.perf_counter() - start) * 1e3:.1f} ms):")
+    print(heatmap.round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
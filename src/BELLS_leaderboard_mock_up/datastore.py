@@ -0,0 +1,83 @@
+"""Process-wide, read-only cache of the CSV datasets in `data/`.
+
+Every session and page of an app gets the same Arrow-backed DataFrame for a
+given file instead of its own copy: columns wrap immutable Arrow buffers, so
+filtering and slicing them does not duplicate the underlying data. Callers
+must treat the returned frames as read-only (use `.copy()` before mutating).
+
+A file is reloaded when its mtime/size changes and its content hash differs
+from the cached one.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent.parent / 'data'
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class _Entry:
+    def __init__(self, signature, digest, frame):
+        self.signature = signature
+        self.digest = digest
+        self.frame = frame
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def _read(path):
+    """Read a CSV into an Arrow-backed DataFrame"""
+    import pandas as pd
+    return pd.read_csv(path, engine='pyarrow', dtype_backend='pyarrow')
+
+
+def _entry(name, data_dir):
+    path = str(Path(data_dir) / name)
+    signature = _signature(path)
+
+    entry = _cache.get(path)
+    if entry is not None and entry.signature == signature:
+        return entry
+
+    with _lock:
+        # Another thread may have reloaded the file while we waited
+        entry = _cache.get(path)
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        digest = _digest(path)
+        if entry is not None and entry.digest == digest:
+            # Touched but unchanged, keep the loaded frame
+            entry.signature = signature
+            return entry
+
+        entry = _Entry(signature, digest, _read(path))
+        _cache[path] = entry
+        return entry
+
+
+def load_dataset(name, data_dir=DATA_DIR):
+    """Shared read-only DataFrame for `data/<name>`, reloaded when the file changes"""
+    return _entry(name, data_dir).frame
+
+
+def dataset_digest(name, data_dir=DATA_DIR):
+    """Content hash of the currently loaded version of `data/<name>`"""
+    return _entry(name, data_dir).digest
+
+
+def clear():
+    """Drop all cached datasets, the next access reloads them from disk"""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,219 @@
+"""Near-duplicate prompts across corpora: MinHash signatures and LSH banding.
+
+A prompt is reduced to the set of its character `shingle`-grams (lower
+case, alphanumerics and single spaces only). Two prompts are near-duplicates
+when the Jaccard similarity of their sets is about `threshold` or more,
+estimated without comparing them pairwise:
+
+- MinHash: `num_perm` random multiply-shift hash functions ((a x + b) mod
+  2^64, high 32 bits) over the shingle hashes; the share of equal minima of
+  two prompts estimates their Jaccard similarity. Shingles are hashed on the Arrow string buffer, a
+  rolling polynomial over all byte positions at once.
+- LSH: the signature is cut into bands of rows; prompts with one band equal
+  fall in the same bucket. Bands and rows are chosen so that the chance of
+  sharing a bucket rises steeply around `threshold` (`bands_for`).
+- Clusters: each prompt is linked to the first prompt of each of its
+  buckets if their signatures agree about as much as `threshold` (dropping
+  most dissimilar prompts that share a bucket by chance); clusters are the
+  connected components, found by propagating the smallest prompt index
+  along the links until it settles.
+
+Every step is linear in the number of prompts (and distinct texts are only
+signed once). A cluster id is the index of its first prompt; see
+`metrics.dedup_weights` to count each cluster once per dataset.
+
+    python -m BELLS_leaderboard_mock_up.dedup --output data/prompt_clusters.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR
+from BELLS_leaderboard_mock_up.metrics import dedup_weights, detection_rates
+
+# Shingle hashes processed at once, sized so their hashes (8 bytes x num_perm each) stay in cache
+SHINGLE_CHUNK = 1 << 11
+
+# Prompt datasets of data/ and their text column
+DATASETS = {
+    'non_adversarial_prompts.csv': 'question',
+    'harmful_non-adversarial.csv': 'Goal',
+    'borderline_non-adversarial.csv': 'Goal',
+    'benign_non-adversarial.csv': 'Goal',
+}
+
+
+def normalize(texts):
+    """Lower case, alphanumerics and single spaces"""
+    texts = pc.utf8_lower(pa.array(texts, pa.string()))
+    texts = pc.replace_substring_regex(texts, r'[^a-z0-9]+', ' ')
+    return pc.utf8_trim(texts, ' ')
+
+
+def shingle_hashes(texts, shingle=5):
+    """32-bit hashes of the character shingles of every text, and the offset of each text's hashes.
+
+    Texts shorter than `shingle` are padded, so every text has at least one.
+    """
+    texts = pc.utf8_rpad(normalize(texts), shingle, ' ').cast(pa.large_string())
+    offsets = np.frombuffer(texts.buffers()[1], dtype='int64')[texts.offset:texts.offset + len(texts) + 1]
+    data = np.frombuffer(texts.buffers()[2], dtype='uint8')[offsets[0]:offsets[-1]].astype('uint64')
+    offsets = offsets - offsets[0]
+
+    # Polynomial hash of data[j:j + shingle] for every position j
+    hashes = np.zeros(max(len(data) - shingle + 1, 0), dtype='uint64')
+    for i in range(shingle):
+        hashes = hashes * np.uint64(1000003) + data[i:len(data) - shingle + 1 + i]
+    # Only the shingles that end within their text
+    counts = np.diff(offsets) - shingle + 1
+    starts = np.repeat(offsets[:-1], counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    hashes = (hashes[starts] ^ (hashes[starts] >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+    return hashes, np.concatenate([[0], np.cumsum(counts)])
+
+
+def permutations(num_perm, seed=0):
+    """Odd multipliers and offsets of the `num_perm` hash functions"""
+    rng = np.random.default_rng(seed)
+    return (rng.integers(0, 1 << 63, size=num_perm, dtype='uint64') * np.uint64(2) + np.uint64(1),
+            rng.integers(0, 1 << 63, size=num_perm, dtype='uint64'))
+
+
+def signatures(texts, num_perm=128, shingle=5, seed=0):
+    """MinHash signatures of `texts`, shape (len(texts), num_perm)"""
+    a, b = permutations(num_perm, seed)
+    hashes, offsets = shingle_hashes(texts, shingle)
+    result = np.empty((len(offsets) - 1, num_perm), dtype='uint32')
+    # Whole texts per chunk, about SHINGLE_CHUNK shingles each
+    bounds = np.searchsorted(offsets, np.arange(0, offsets[-1], SHINGLE_CHUNK), side='right') - 1
+    bounds = np.unique(np.concatenate([bounds, [len(offsets) - 1]]))
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        start, end = offsets[first], offsets[last]
+        values = np.multiply(hashes[start:end, None], a)
+        values += b
+        # The high bits are monotonic in the whole value: shift the minima only
+        result[first:last] = np.minimum.reduceat(values, offsets[first:last] - start, axis=0) >> np.uint64(32)
+    return result
+
+
+def bands_for(threshold, num_perm, recall=0.95):
+    """(bands, rows) of the LSH: the most rows per band (the fewest dissimilar prompts sharing
+    a bucket) for which two prompts of similarity `threshold` share one with chance `recall`"""
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+def lsh_buckets(signature, bands):
+    """Bucket of every prompt in every band, shape (bands, len(signature))"""
+    rows = signature.shape[1] // bands
+    buckets = np.empty((bands, len(signature)), dtype='int64')
+    for band in range(bands):
+        keys = np.ascontiguousarray(signature[:, band * rows:(band + 1) * rows]).view(f"V{rows * 4}").ravel()
+        buckets[band] = np.unique(keys, return_inverse=True)[1]
+    return buckets
+
+
+def links(signature, buckets, threshold):
+    """Prompt pairs (i, j) linking each prompt to the first of each of its buckets, when their
+    signatures agree on `threshold` of their values, less 3 standard deviations of the estimate"""
+    tolerance = 3 * np.sqrt(threshold * (1 - threshold) / signature.shape[1])
+    prompts = np.arange(len(signature))
+    sources, targets = [], []
+    for bucket in buckets:
+        first = np.full(bucket.max() + 1, len(prompts))
+        np.minimum.at(first, bucket, prompts)
+        i = np.flatnonzero(first[bucket] != prompts)
+        j = first[bucket[i]]
+        similar = (signature[i] == signature[j]).mean(axis=1) >= threshold - tolerance
+        sources.append(i[similar])
+        targets.append(j[similar])
+    return np.concatenate(sources), np.concatenate(targets)
+
+
+def connected_components(size, sources, targets):
+    """Smallest prompt index of the component of every prompt, prompts linked by (sources, targets)"""
+    labels = np.arange(size)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, sources, labels[targets])
+        np.minimum.at(labels, targets, labels[sources])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def cluster(texts, threshold=0.8, num_perm=128, shingle=5, seed=0):
+    """Cluster id of every text: the index of the first text of its near-duplicate cluster"""
+    texts = pa.array(texts, pa.string())
+    if isinstance(texts, pa.ChunkedArray):
+        texts = texts.combine_chunks()
+    # Exact duplicates are signed once
+    encoded = pc.dictionary_encode(texts)
+    distinct = encoded.dictionary
+    bands, rows = bands_for(threshold, num_perm)
+    signature = signatures(distinct, bands * rows, shingle, seed)
+    labels = connected_components(len(signature), *links(signature, lsh_buckets(signature, bands), threshold))
+
+    indices = encoded.indices.to_numpy(zero_copy_only=False)
+    # First text of each distinct text, then of each cluster
+    first_text = np.full(len(distinct), len(indices))
+    np.minimum.at(first_text, indices, np.arange(len(indices)))
+    first_of_cluster = np.full(len(distinct), len(indices))
+    np.minimum.at(first_of_cluster, labels, first_text)
+    return first_of_cluster[labels[indices]]
+
+
+def load_corpora(data_dir=DATA_DIR):
+    """Prompts of every dataset of `DATASETS`, with their dataset and row"""
+    frames = []
+    for name, column in DATASETS.items():
+        dataset = pd.read_csv(data_dir / name)
+        frames.append(pd.DataFrame({'dataset': name, 'row': np.arange(len(dataset)),
+                                    'question': dataset[column].astype(str)}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate prompts across the prompt datasets")
+    parser.add_argument('--output', default=str(DATA_DIR / 'prompt_clusters.csv'),
+                        help='CSV of the cluster id of every prompt of every dataset')
+    parser.add_argument('--threshold', type=float, default=0.8, help='Jaccard similarity of near-duplicates')
+    parser.add_argument('--num-perm', type=int, default=128, help='MinHash functions')
+    parser.add_argument('--shingle', type=int, default=5, help='Characters per shingle')
+    args = parser.parse_args()
+
+    prompts = load_corpora()
+    start = time.perf_counter()
+    prompts['cluster_id'] = cluster(prompts['question'], args.threshold, args.num_perm, args.shingle)
+    elapsed = time.perf_counter() - start
+    sizes = prompts.groupby('cluster_id')['cluster_id'].transform('size')
+    prompts.to_csv(args.output, index=False)
+    print(f"{len(prompts)} prompts in {prompts['cluster_id'].nunique()} clusters "
+          f"({(sizes > 1).sum()} prompts have near-duplicates), {elapsed:.2f}s; written to {args.output}")
+
+    crossing = prompts[sizes > 1].groupby('cluster_id')['dataset'].nunique()
+    print(f"{(crossing > 1).sum()} clusters span several datasets; some clusters of different texts:")
+    variants = prompts.groupby('cluster_id')['question'].transform('nunique')
+    for cluster_id in prompts.loc[variants > 1, 'cluster_id'].drop_duplicates()[:5]:
+        members = prompts[prompts['cluster_id'] == cluster_id].drop_duplicates('question').head(3)
+        print('  ' + '\n    ~ '.join(f"{text} [{dataset}]" for text, dataset in
+                                     zip(members['question'], members['dataset'])))
+
+    # Raw vs. deduplicated detection rates of the safeguards of the main dataset
+    verdicts = pd.read_csv(DATA_DIR / 'non_adversarial_prompts.csv').assign(adversarial=False)
+    verdicts['cluster_id'] = prompts.loc[prompts['dataset'] == 'non_adversarial_prompts.csv', 'cluster_id'].to_numpy()
+    safeguards = ['lakera_guard', 'prompt_guard', 'langkit', 'nemo', 'llm_guard']
+    raw = detection_rates(verdicts, safeguards)
+    deduplicated = detection_rates(verdicts, safeguards, weights=dedup_weights(verdicts))
+    print("Deduplicated minus raw detection rates, data/non_adversarial_prompts.csv:")
+    print((deduplicated - raw).round(4).to_string())
+
+
+if __name__ == '__main__':
+    main()
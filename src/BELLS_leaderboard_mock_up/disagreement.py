@@ -0,0 +1,238 @@
+"""Index of the prompts on which the safeguards disagree.
+
+The verdicts of every safeguard are packed into bitsets over the prompts
+(64 prompts per word), and every query is a few bitwise operations on them:
+
+- caught only by X: X & ~(OR of the others)
+- missed only by X: ~X & (AND of the others)
+- missed by all: ~(OR of all), caught by all: AND of all
+- X and Y disagree: X ^ Y
+- caught by the safeguards A and missed by the safeguards B: AND(A) & ~OR(B)
+
+The OR and AND of "the others" come from prefix and suffix ORs/ANDs, so the
+index is built in O(safeguards x prompts / 64) word operations. Counts are
+popcounts of the resulting words: the unique catches and misses of every
+safeguard, the pairwise disagreement counts and the number of safeguards
+flagging each prompt (its agreement level) are precomputed when the index is
+built.
+
+    python -m BELLS_leaderboard_mock_up.disagreement --filter caught_only --safeguard lakera_guard
+"""
+import argparse
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR, dataset_digest, load_dataset
+
+# Filters of the playgrounds: label and the safeguards they take (0, 1 or 2)
+FILTERS = {
+    'all': ('All prompts', 0),
+    'disagree': ('Safeguards disagree', 0),
+    'caught_only': ('Caught only by', 1),
+    'missed_only': ('Missed only by', 1),
+    'missed_by_all': ('Missed by all', 0),
+    'caught_by_all': ('Caught by all', 0),
+    'pair': ('Two safeguards disagree', 2),
+}
+
+
+def verdict_columns(table):
+    """Columns of `table` holding 0/1 verdicts"""
+    columns = []
+    for column in table.columns:
+        if pd.api.types.is_numeric_dtype(table[column]) or pd.api.types.is_bool_dtype(table[column]):
+            values = table[column].dropna()
+            if values.isin([0, 1]).all():
+                columns.append(column)
+    return columns
+
+
+def popcount(words):
+    """Set bits of uint64 `words`, summed over the last axis"""
+    return np.bitwise_count(words).sum(axis=-1, dtype='int64')
+
+
+class DisagreementIndex:
+    """Packed verdicts of `safeguards` over the rows of `table`, see the module docstring"""
+
+    def __init__(self, table, safeguards=None):
+        self.safeguards = list(safeguards or verdict_columns(table))
+        self.size = len(table)
+        verdicts = np.zeros((len(self.safeguards), self.size), dtype=bool)
+        for i, safeguard in enumerate(self.safeguards):
+            verdicts[i] = table[safeguard].fillna(0).to_numpy(dtype='int8') != 0
+        self.bits = self._pack(verdicts)
+        self.valid = self._pack(np.ones((1, self.size), dtype=bool))[0]
+
+        # OR and AND of the safeguards before and after each one
+        count = len(self.safeguards)
+        zeros, ones = np.zeros_like(self.valid), self.valid.copy()
+        ors_before, ors_after = [zeros] * (count + 1), [zeros] * (count + 1)
+        ands_before, ands_after = [ones] * (count + 1), [ones] * (count + 1)
+        for i in range(count):
+            ors_before[i + 1] = ors_before[i] | self.bits[i]
+            ands_before[i + 1] = ands_before[i] & self.bits[i]
+            ors_after[count - i - 1] = ors_after[count - i] | self.bits[count - i - 1]
+            ands_after[count - i - 1] = ands_after[count - i] & self.bits[count - i - 1]
+        self.caught_by_any = ors_before[count]
+        self.caught_by_all = ands_before[count]
+        self.missed_by_all = self.valid & ~self.caught_by_any
+        others_or = np.array([ors_before[i] | ors_after[i + 1] for i in range(count)]).reshape(self.bits.shape)
+        others_and = np.array([ands_before[i] & ands_after[i + 1] for i in range(count)]).reshape(self.bits.shape)
+        self.caught_only = self.bits & ~others_or
+        self.missed_only = self.valid & ~self.bits & others_and
+
+        # Safeguards flagging each prompt, from the bits of every safeguard
+        self.flags = np.zeros(self.size, dtype='int16')
+        for row in self.bits:
+            self.flags += self._unpack(row).astype('int16')
+        self.disagreements = np.stack([popcount(row ^ self.bits) for row in self.bits]) if count else \
+            np.zeros((0, 0), dtype='int64')
+
+    def _pack(self, verdicts):
+        """(rows, words) uint64 bitsets of (rows, prompts) booleans, prompt k being bit k % 64 of word k // 64"""
+        words = -(-self.size // 64)
+        padded = np.zeros((len(verdicts), words * 64), dtype=bool)
+        padded[:, :self.size] = verdicts
+        return np.packbits(padded, axis=1, bitorder='little').view('<u8')
+
+    def _unpack(self, bits):
+        return np.unpackbits(bits.view('uint8'), bitorder='little')[:self.size].astype(bool)
+
+    def position(self, safeguard):
+        try:
+            return self.safeguards.index(safeguard)
+        except ValueError:
+            raise ValueError(f"Unknown safeguard: {safeguard}, expected one of {self.safeguards}") from None
+
+    def select(self, caught=(), missed=()):
+        """Bits of the prompts flagged by every safeguard of `caught` and by none of `missed`"""
+        bits = self.valid.copy()
+        for safeguard in caught:
+            bits &= self.bits[self.position(safeguard)]
+        for safeguard in missed:
+            bits &= ~self.bits[self.position(safeguard)]
+        return bits
+
+    def query(self, name='all', safeguard=None, other=None):
+        """Bits of the prompts of a filter of `FILTERS`"""
+        if name not in FILTERS:
+            raise ValueError(f"Unknown filter: {name}, expected one of {list(FILTERS)}")
+        arity = FILTERS[name][1]
+        if arity >= 1 and safeguard is None or arity == 2 and other is None:
+            raise ValueError(f"Filter {name} needs {arity} safeguard(s)")
+        if name == 'all':
+            return self.valid
+        if name == 'disagree':
+            return self.caught_by_any & ~self.caught_by_all
+        if name == 'caught_only':
+            return self.caught_only[self.position(safeguard)]
+        if name == 'missed_only':
+            return self.missed_only[self.position(safeguard)]
+        if name == 'missed_by_all':
+            return self.missed_by_all
+        if name == 'caught_by_all':
+            return self.caught_by_all
+        return self.bits[self.position(safeguard)] ^ self.bits[self.position(other)]
+
+    def pack(self, mask):
+        """Bits of a boolean mask over the rows"""
+        return self._pack(np.asarray(mask, dtype=bool)[None, :])[0]
+
+    def mask(self, bits):
+        """Boolean mask over the rows of `bits`"""
+        return self._unpack(bits)
+
+    def rows(self, bits):
+        """Row positions of `bits`"""
+        return np.flatnonzero(self._unpack(bits))
+
+    def count(self, bits):
+        return int(popcount(bits))
+
+    def summary(self, bits=None):
+        """Detections, unique catches (flagged by it only) and unique misses (missed by it only) per safeguard,
+        over the prompts of `bits` (all by default)"""
+        bits = self.valid if bits is None else bits
+        return pd.DataFrame({
+            'safeguard': self.safeguards,
+            'detections': popcount(self.bits & bits),
+            'unique_catches': popcount(self.caught_only & bits),
+            'unique_misses': popcount(self.missed_only & bits),
+        })
+
+    def pair_matrix(self, bits=None):
+        """Prompts of `bits` (all by default) on which each pair of safeguards disagrees"""
+        disagreements = self.disagreements if bits is None else \
+            np.stack([popcount((row ^ self.bits) & bits) for row in self.bits]).reshape(self.disagreements.shape)
+        index = pd.Index(self.safeguards, name='safeguard')
+        return pd.DataFrame(disagreements, index=index, columns=pd.Index(self.safeguards, name='opponent'))
+
+    def agreement_levels(self, bits=None):
+        """Prompts of `bits` (all by default) per number of safeguards flagging them, 0 to all"""
+        flags = self.flags if bits is None else self.flags[self._unpack(bits)]
+        counts = np.bincount(flags, minlength=len(self.safeguards) + 1)
+        return pd.Series(counts, index=pd.RangeIndex(len(counts), name='flagged_by'), name='prompts')
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def load_index(name='non_adversarial_prompts.csv', data_dir=DATA_DIR):
+    """`DisagreementIndex` of `data/<name>`, rebuilt when the file changes"""
+    key = str(Path(data_dir) / name)
+    digest = dataset_digest(name, data_dir)
+    with _lock:
+        cached = _indexes.get(key)
+        if cached is None or cached[0] != digest:
+            cached = (digest, DisagreementIndex(load_dataset(name, data_dir)))
+            _indexes[key] = cached
+        return cached[1]
+
+
+def store_index(store):
+    """`DisagreementIndex` of the rows of a `jailbreak_store.JailbreakStore`, built once per store"""
+    with _lock:
+        cached = _indexes.get(id(store))
+        if cached is None or cached[0] is not store:
+            cached = (store, DisagreementIndex(store.view(), store.safeguards))
+            _indexes[id(store)] = cached
+        return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompts on which the safeguards disagree")
+    parser.add_argument('--prompts', default='non_adversarial_prompts.csv',
+                        help='CSV in data/ with one 0/1 verdict column per safeguard')
+    parser.add_argument('--filter', choices=list(FILTERS), default='disagree')
+    parser.add_argument('--safeguard', default=None, help='Safeguard of the caught_only, missed_only and pair filters')
+    parser.add_argument('--other', default=None, help='Second safeguard of the pair filter')
+    parser.add_argument('--limit', type=int, default=10, help='Prompts printed')
+    args = parser.parse_args()
+
+    table = load_dataset(args.prompts)
+    start = time.perf_counter()
+    index = DisagreementIndex(table)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    bits = index.query(args.filter, args.safeguard, args.other)
+    rows = index.rows(bits)
+    print(f"{index.size} prompts x {len(index.safeguards)} safeguards indexed in {built * 1e3:.2f} ms, "
+          f"{len(rows)} prompts match in {(time.perf_counter() - start) * 1e3:.3f} ms\n")
+    print(index.summary().to_string(index=False))
+    print()
+    print(index.pair_matrix().to_string())
+    print()
+    print(index.agreement_levels().to_string())
+    print()
+    print(table.iloc[rows[:args.limit]][[c for c in table.columns if c not in index.safeguards][:1]
+                                       + index.safeguards].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Evaluate safeguards on a prompt corpus and write their verdicts.
+
+Prompts are sent to each safeguard in batches of its `batch_size`. All
+batches of all safeguards are scheduled on one asyncio event loop, each
+safeguard with its own limits: at most `max_concurrency` calls in flight and
+at most `rate_limit` calls per second. Calls failing transiently are retried
+with exponential backoff. Throughput therefore grows with the concurrency
+the safeguards allow, until their rate limits are reached.
+
+Before any call, a safeguard's scores are looked up in the verdict cache
+(see `verdict_cache`), by prompt text: only texts it has never scored with
+its current version and settings are sent, each distinct text once.
+
+The corpus is processed in chunks of `chunk_size` prompts; a few chunks are
+in flight at once so no safeguard idles at chunk boundaries, and each chunk
+is written as one row group of the verdict store as soon as it and the
+chunks before it are done. With a run directory (see `checkpoint`), chunks
+go through a write-ahead log instead, and an interrupted run resumes where
+it stopped.
+
+    python -m BELLS_leaderboard_mock_up.evaluation --output data/verdicts.parquet
+    python -m BELLS_leaderboard_mock_up.evaluation --prompts data/synthetic_verdicts.parquet \
+        --output data/verdicts.parquet --latency 0.05 --concurrency 16
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR
+from BELLS_leaderboard_mock_up.safeguards import SafeguardError, stub_safeguards
+from BELLS_leaderboard_mock_up.verdict_cache import VerdictCache
+from BELLS_leaderboard_mock_up.verdicts import PROMPT_COLUMNS, PROMPT_FIELDS, VerdictWriter, verdict_schema
+
+TRANSIENT_ERRORS = (SafeguardError, TimeoutError, ConnectionError)
+
+
+def load_prompts(path=None):
+    """Prompt columns of a corpus as an Arrow table.
+
+    `path` is a verdict corpus (Parquet) or a CSV with `question`,
+    `harm_level` and `category` columns, by default
+    `data/non_adversarial_prompts.csv`.
+    """
+    path = Path(path) if path else DATA_DIR / 'non_adversarial_prompts.csv'
+    if path.suffix == '.parquet':
+        return pq.read_table(path, columns=PROMPT_COLUMNS)
+    prompts = pd.read_csv(path)
+    prompts = pd.DataFrame({
+        'prompt_id': np.arange(len(prompts)),
+        'question': prompts['question'],
+        'harm_level': prompts['harm_level'],
+        'category': prompts['category'].str.strip(),
+        'adversarial': prompts['adversarial'] if 'adversarial' in prompts else False,
+        'jailbreak_source': prompts['jailbreak_source'] if 'jailbreak_source' in prompts else None,
+    })
+    return pa.Table.from_pandas(prompts, schema=pa.schema(PROMPT_FIELDS), preserve_index=False)
+
+
+class RateLimiter:
+    """Token bucket: `rate` calls per second on average, bursts of up to `burst` calls"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class EvaluationRunner:
+    """Schedules the calls to `safeguards`, see the module docstring.
+
+    `stats` counts, per safeguard, the calls made, the retries, the time
+    spent in calls and the texts scored by calls or found in `cache`.
+    """
+
+    def __init__(self, safeguards, retries=3, backoff=0.5, timeout=None, chunk_size=4096, window=3,
+                 cache=None):
+        names = [safeguard.name for safeguard in safeguards]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate safeguard names: {names}")
+        self.safeguards = list(safeguards)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.window = window
+        self.cache = cache
+        self.stats = {name: {'calls': 0, 'retries': 0, 'seconds': 0.0, 'scored': 0, 'cached': 0}
+                      for name in names}
+        self._semaphores = {}
+        self._limiters = {}
+
+    def _limits(self, safeguard):
+        # Created on first use, inside the running event loop
+        if safeguard.name not in self._semaphores:
+            self._semaphores[safeguard.name] = asyncio.Semaphore(safeguard.max_concurrency)
+            self._limiters[safeguard.name] = (RateLimiter(safeguard.rate_limit, safeguard.burst)
+                                              if safeguard.rate_limit else None)
+        return self._semaphores[safeguard.name], self._limiters[safeguard.name]
+
+    async def _call(self, safeguard, texts):
+        """Scores of one batch, retried on transient errors"""
+        semaphore, limiter = self._limits(safeguard)
+        stats = self.stats[safeguard.name]
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    if limiter:
+                        await limiter.acquire()
+                    start = time.perf_counter()
+                    try:
+                        scores = await asyncio.wait_for(safeguard.classify(texts), self.timeout)
+                    finally:
+                        stats['calls'] += 1
+                        stats['seconds'] += time.perf_counter() - start
+                break
+            except TRANSIENT_ERRORS:
+                if attempt >= self.retries:
+                    raise
+            # Backoff outside the semaphore, with jitter so retries do not synchronize
+            stats['retries'] += 1
+            await asyncio.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+
+        if len(scores) != len(texts):
+            raise ValueError(f"{safeguard.name} returned {len(scores)} verdicts for {len(texts)} texts")
+        return np.asarray(scores, dtype='float64')
+
+    async def _evaluate_safeguard(self, safeguard, texts):
+        # Distinct texts, then those missing from the cache
+        unique = list(dict.fromkeys(texts))
+        scores = {}
+        if self.cache is not None:
+            keys = dict(zip(unique, self.cache.keys(safeguard, unique)))
+            cached = self.cache.get_many(list(keys.values()))
+            scores = {text: cached[key] for text, key in keys.items() if key in cached}
+            self.stats[safeguard.name]['cached'] += len(scores)
+        missing = [text for text in unique if text not in scores]
+
+        size = safeguard.batch_size
+        batches = [missing[start:start + size] for start in range(0, len(missing), size)]
+        results = await asyncio.gather(*(self._call(safeguard, batch) for batch in batches))
+        fresh = dict(zip(missing, (score for result in results for score in result)))
+        self.stats[safeguard.name]['scored'] += len(fresh)
+        if self.cache is not None and fresh:
+            self.cache.put_many((keys[text], score) for text, score in fresh.items())
+        scores.update(fresh)
+        return np.array([scores[text] for text in texts], dtype='float64') >= safeguard.threshold
+
+    async def evaluate(self, texts):
+        """Verdicts of every safeguard on `texts`, as {name: boolean array}"""
+        verdicts = await asyncio.gather(*(self._evaluate_safeguard(s, texts) for s in self.safeguards))
+        return {safeguard.name: v for safeguard, v in zip(self.safeguards, verdicts)}
+
+    async def evaluate_each(self, texts):
+        """Verdicts of each safeguard on its own texts, `texts` being {name: texts}, as {name: boolean array}"""
+        safeguards = [safeguard for safeguard in self.safeguards if safeguard.name in texts]
+        verdicts = await asyncio.gather(*(self._evaluate_safeguard(s, texts[s.name]) for s in safeguards))
+        return {safeguard.name: v for safeguard, v in zip(safeguards, verdicts)}
+
+    async def _evaluate_chunk(self, chunk, schema):
+        verdicts = await self.evaluate(chunk.column('question').to_pylist())
+        columns = chunk.columns + [pa.array(verdicts[name]) for name in schema.names[len(PROMPT_COLUMNS):]]
+        return pa.Table.from_arrays(columns, schema=schema).combine_chunks().to_batches()[0]
+
+    async def run(self, prompts, writer, skip=()):
+        """Evaluate a prompt table (see `load_prompts`), writing chunks to `writer` in order.
+
+        Chunks whose first `prompt_id` is in `skip` (already done) are not evaluated.
+        """
+        schema = verdict_schema([safeguard.name for safeguard in self.safeguards])
+        pending = deque()
+        try:
+            for offset in range(0, prompts.num_rows, self.chunk_size):
+                chunk = prompts.slice(offset, self.chunk_size)
+                if skip and chunk.column('prompt_id')[0].as_py() in skip:
+                    continue
+                pending.append(asyncio.create_task(self._evaluate_chunk(chunk, schema)))
+                if len(pending) >= self.window:
+                    writer.write(await pending.popleft())
+            while pending:
+                writer.write(await pending.popleft())
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def evaluate_corpus(prompts, output, safeguards, **options):
+    """Evaluate `safeguards` on a prompt table and write the corpus to `output`, returns the runner"""
+    runner = EvaluationRunner(safeguards, **options)
+    with VerdictWriter(output, [safeguard.name for safeguard in safeguards]) as writer:
+        asyncio.run(runner.run(prompts, writer))
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the (stub) safeguards on a prompt corpus")
+    parser.add_argument('--prompts', default=None,
+                        help='Verdict corpus (.parquet) or prompt CSV, default: data/non_adversarial_prompts.csv')
+    parser.add_argument('--limit', type=int, default=None, help='Evaluate only the first prompts')
+    parser.add_argument('--output', required=True, help='Parquet file to write')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated seconds per safeguard call')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Simulated share of safeguard calls failing transiently')
+    parser.add_argument('--concurrency', type=int, default=4, help='Calls in flight per safeguard')
+    parser.add_argument('--batch-size', type=int, default=32, help='Prompts per safeguard call')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Calls per second per safeguard')
+    parser.add_argument('--retries', type=int, default=3, help='Retries of a failed call')
+    parser.add_argument('--chunk-size', type=int, default=4096, help='Prompts per chunk / row group')
+    parser.add_argument('--cache', type=Path, default=DATA_DIR / 'verdict_cache.sqlite', help='Verdict cache file')
+    parser.add_argument('--cache-size', type=int, default=256, help='Maximum verdict cache size (MB)')
+    parser.add_argument('--no-cache', action='store_true', help='Query the safeguards for every prompt')
+    parser.add_argument('--run-dir', type=Path, default=None,
+                        help='Write-ahead log and checkpoints, resumed if present (default: <output>.run)')
+    parser.add_argument('--checkpoint-every', type=int, default=16, help='Chunks between two checkpoints')
+    parser.add_argument('--no-checkpoint', action='store_true', help='Write the output directly, no resume')
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.prompts)
+    if args.limit is not None:
+        prompts = prompts.slice(0, args.limit)
+    safeguards = stub_safeguards(latency=args.latency, failure_rate=args.failure_rate,
+                                 max_concurrency=args.concurrency, batch_size=args.batch_size)
+    for safeguard in safeguards:
+        safeguard.rate_limit = args.rate_limit
+
+    cache = None if args.no_cache else VerdictCache(args.cache, max_bytes=args.cache_size << 20)
+    try:
+        start = time.perf_counter()
+        options = dict(retries=args.retries, chunk_size=args.chunk_size, cache=cache)
+        if args.no_checkpoint:
+            runner = evaluate_corpus(prompts, args.output, safeguards, **options)
+        else:
+            from BELLS_leaderboard_mock_up.checkpoint import evaluate_checkpointed
+            run_dir = args.run_dir or Path(f"{args.output}.run")
+            runner, _ = evaluate_checkpointed(prompts, args.output, safeguards, run_dir,
+                                              checkpoint_every=args.checkpoint_every, **options)
+        seconds = time.perf_counter() - start
+        print(f"Evaluated {prompts.num_rows} prompts x {len(safeguards)} safeguards in {seconds:.1f}s "
+              f"({prompts.num_rows / seconds:.0f} prompts/s), written to {args.output}")
+        for name, stats in runner.stats.items():
+            print(f"  {name:>14}: {stats['scored']} texts scored, {stats['cached']} from cache, "
+                  f"{stats['calls']} calls, {stats['retries']} retries, {stats['seconds']:.1f}s in calls")
+        if cache is not None:
+            cache.evict()
+            cache_stats = cache.stats()
+            print(f"Cache {args.cache}: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                  f"({cache_stats['hit_rate']:.0%}), {cache_stats['evictions']} evicted, "
+                  f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 2 ** 20:.1f} MB")
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -176,7 +176,16 @@ function createHarmPreventionPlot(data) {
     Plotly.newPlot('harmPreventionPlot', traces, layout);
 }
 
-function createRankingList(data) {
+// Simulated rank distribution of the safeguards over bootstrap resamples of the prompts (BELLS_leaderboard_mock_up.ranks)
+async function loadRanks() {
+    const response = await fetch('../../../data/rank_probabilities.csv');
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return new Map(d3.csvParse(await response.text()).map(row => [row.safeguard, row]));
+}
+
+function createRankingList(data, ranks = new Map()) {
     const sortedData = [...data].sort((a, b) => parseFloat(b.BELLS_score) - parseFloat(a.BELLS_score));
     
     const rankingContainer = document.getElementById('rankingList');
@@ -250,6 +259,11 @@ function createRankingList(data) {
             <i class="fas fa-info-circle tooltip-icon" 
                data-tooltip="Our comprehensive metric that balances detection effectiveness with false positive control. Combines multiple factors into a single score - higher is better."></i>
         </div>
+        <div class="metric-column">
+            Probability of being #1<br/><span class="metric-subtext">Simulated</span>
+            <i class="fas fa-info-circle tooltip-icon" 
+               data-tooltip="How often the safeguard ranks first by BELLS Score when the benchmark prompts are resampled. Close scores share the top spot; a low probability means the ranking could change with different prompts. Simulated: the resamples come from a synthetic corpus sized like the real datasets, not from the real per-prompt verdicts."></i>
+        </div>
     `;
     rankingContainer.appendChild(headerRow);
 
@@ -259,6 +273,8 @@ function createRankingList(data) {
         const detection_adv = parseFloat(item.harmful_jailbreaks).toFixed(3);
         const detection_non_adv = parseFloat(item["harmful_non-adversarial"]).toFixed(3);
         const fpr = parseFloat(item["benign_non-adversarial"]).toFixed(3);
+        const rank = ranks.get(item.safeguard);
+        const first = rank ? `${Math.round(parseFloat(rank.rank_1) * 100)}%` : '–';
         
         const rankingItem = document.createElement('div');
         rankingItem.className = 'ranking-item';
@@ -281,11 +297,270 @@ function createRankingList(data) {
             <div class="metric-column">
                 <div class="score ${getScoreClass(bells_score)} ${Math.abs(bells_score - bestScores.bells) < 0.001 ? 'best-score' : ''}">${bells_score}</div>
             </div>
+            <div class="metric-column">
+                <div class="score">${first}</div>
+            </div>
         `;
         rankingContainer.appendChild(rankingItem);
     });
 }
 
+// Composite score formulas, the language of BELLS_leaderboard_mock_up.formulas
+const FORMULAS = {
+    'BELLS score': '(harmful_jailbreaks + `harmful_non-adversarial` + (1 - `benign_non-adversarial`)) / 3',
+    'Prevention score': '(harmful_jailbreaks + `harmful_non-adversarial`) / 2'
+};
+const FORMULA_FUNCTIONS = {
+    min: [1, Infinity], max: [1, Infinity], mean: [1, Infinity], abs: [1, 1], sqrt: [1, 1], log: [1, 1], clip: [3, 3]
+};
+const compiledFormulas = new Map();
+// Deepest tree accepted, as MAX_DEPTH of the Python formulas
+const MAX_FORMULA_DEPTH = 64;
+
+class FormulaError extends Error {
+    constructor(message, position = null) {
+        super(position === null ? message : `${message} (at character ${position + 1})`);
+        this.position = position;
+    }
+}
+
+// [kind, value, position] tokens, kind being number, name, column or symbol
+function tokenizeFormula(expression) {
+    const pattern = /\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|`([^`]+)`|(\S))/y;
+    const tokens = [];
+    let match;
+    while (pattern.lastIndex < expression.length && (match = pattern.exec(expression))) {
+        const [text, number, name, column, symbol] = match;
+        const start = match.index + text.length - text.trimStart().length;
+        if (number !== undefined) tokens.push(['number', parseFloat(number), start]);
+        else if (name !== undefined) tokens.push(['name', name, start]);
+        else if (column !== undefined) tokens.push(['column', column, start]);
+        else if ('+-*/^(),'.includes(symbol)) tokens.push(['symbol', symbol, start]);
+        else throw new FormulaError(`Unexpected character '${symbol}'`, start);
+    }
+    return tokens;
+}
+
+// Recursive descent to a tree: ['number', x], ['column', name], ['neg', a], [op, a, b], ['call', f, args]
+function parseFormula(expression) {
+    const tokens = tokenizeFormula(expression);
+    let index = 0;
+    const peek = () => tokens[index] || ['end', null, expression.length];
+    const isSymbol = (...symbols) => peek()[0] === 'symbol' && symbols.includes(peek()[1]);
+    const describe = token => token[0] === 'end' ? 'end of formula' : `'${token[1]}'`;
+    const take = symbol => {
+        const token = peek();
+        if (symbol !== undefined && !(token[0] === 'symbol' && token[1] === symbol)) {
+            throw new FormulaError(`Expected '${symbol}', found ${describe(token)}`, token[2]);
+        }
+        index += 1;
+        return token;
+    };
+
+    function parseExpression() {
+        let tree = parseTerm();
+        while (isSymbol('+', '-')) tree = [take()[1], tree, parseTerm()];
+        return tree;
+    }
+    function parseTerm() {
+        let tree = parseUnary();
+        while (isSymbol('*', '/')) tree = [take()[1], tree, parseUnary()];
+        return tree;
+    }
+    function parseUnary() {
+        if (isSymbol('-')) { take(); return ['neg', parseUnary()]; }
+        if (isSymbol('+')) { take(); return parseUnary(); }
+        return parsePower();
+    }
+    function parsePower() {
+        const tree = parseAtom();
+        if (isSymbol('^')) { take(); return ['^', tree, parseUnary()]; }
+        return tree;
+    }
+    function parseAtom() {
+        const token = take();
+        const [kind, value, position] = token;
+        if (kind === 'number' || kind === 'column') return [kind, value];
+        if (kind === 'name' && isSymbol('(')) {
+            if (!(value in FORMULA_FUNCTIONS)) throw new FormulaError(`Unknown function '${value}'`, position);
+            take('(');
+            const args = [parseExpression()];
+            while (isSymbol(',')) { take(); args.push(parseExpression()); }
+            take(')');
+            const [low, high] = FORMULA_FUNCTIONS[value];
+            if (args.length < low || args.length > high) {
+                throw new FormulaError(`Wrong number of arguments for ${value}(): ${args.length}`, position);
+            }
+            return ['call', value, args];
+        }
+        if (kind === 'name') return ['column', value];
+        if (kind === 'symbol' && value === '(') {
+            const tree = parseExpression();
+            take(')');
+            return tree;
+        }
+        throw new FormulaError(`Unexpected ${describe(token)}`, position);
+    }
+
+    let tree;
+    try {
+        tree = parseExpression();
+    } catch (error) {
+        if (error instanceof RangeError) throw new FormulaError('Formula too deeply nested');
+        throw error;
+    }
+    if (peek()[0] !== 'end') throw new FormulaError(`Unexpected '${peek()[1]}'`, peek()[2]);
+    if (formulaDepth(tree) > MAX_FORMULA_DEPTH) throw new FormulaError('Formula too deeply nested');
+    return tree;
+}
+
+// Depth of a formula tree, without recursion
+function formulaDepth(tree) {
+    let depth = 0;
+    let level = [tree];
+    while (level.length) {
+        depth += 1;
+        level = level.flatMap(node => {
+            if (node[0] === 'number' || node[0] === 'column') return [];
+            return node[0] === 'call' ? node[2] : node.slice(1);
+        });
+    }
+    return depth;
+}
+
+// Compiled formula: the columns it reads and evaluate(values of those columns), cached by tokens
+function compileFormula(expression) {
+    const key = tokenizeFormula(expression).map(([kind, value]) => `${kind}:${value}`).join('\u0000');
+    if (compiledFormulas.has(key)) return compiledFormulas.get(key);
+
+    const columns = [];
+    const constants = [];
+    const lookup = (names, letter, value) => {
+        if (!names.includes(value)) names.push(value);
+        return `${letter}[${names.indexOf(value)}]`;
+    };
+    const source = tree => {
+        const [kind] = tree;
+        if (kind === 'number') return lookup(constants, 'k', tree[1]);
+        if (kind === 'column') return lookup(columns, 'c', tree[1]);
+        if (kind === 'neg') return `(-${source(tree[1])})`;
+        if (kind === 'call') {
+            const args = tree[2].map(source);
+            if (tree[1] === 'mean') return `((${args.join(' + ')}) / ${args.length})`;
+            if (tree[1] === 'clip') return `Math.min(Math.max(${args[0]}, ${args[1]}), ${args[2]})`;
+            return `Math.${tree[1]}(${args.join(', ')})`;
+        }
+        return `(${source(tree[1])} ${kind === '^' ? '**' : kind} ${source(tree[2])})`;
+    };
+    // Only built from the parsed tree: column and number lookups, operators and Math functions
+    const body = source(parseFormula(expression));
+    const evaluate = new Function('c', 'k', `return ${body};`);
+    const formula = { columns, evaluate: values => evaluate(values, constants) };
+    compiledFormulas.set(key, formula);
+    return formula;
+}
+
+function createFormulaRanking(data) {
+    const preset = document.getElementById('formulaPreset');
+    const input = document.getElementById('formulaInput');
+    const error = document.getElementById('formulaError');
+    const container = document.getElementById('formulaRanking');
+    if (!preset || !input || !container) {
+        return;
+    }
+    Object.keys(FORMULAS).forEach(name => preset.add(new Option(name, name)));
+    input.value = FORMULAS[preset.value];
+
+    function update() {
+        let formula;
+        try {
+            formula = compileFormula(input.value);
+            const missing = formula.columns.filter(column => !(column in data[0]));
+            if (missing.length) throw new FormulaError(`Unknown columns: ${missing.join(', ')}`);
+            const text = formula.columns.find(column => data.some(row => row[column] !== '' && isNaN(Number(row[column]))));
+            if (text !== undefined) throw new FormulaError(`Column is not numeric: ${text}`);
+        } catch (e) {
+            if (!(e instanceof FormulaError)) throw e;
+            error.textContent = `Invalid formula: ${e.message}`;
+            return;
+        }
+        error.textContent = '';
+        const ranked = data.map(row => ({
+            row,
+            score: formula.evaluate(formula.columns.map(column => parseFloat(row[column])))
+        }));
+        // Best first, NaN scores last
+        const key = score => isNaN(score) ? -Infinity : score;
+        ranked.sort((a, b) => key(b.score) - key(a.score) || 0);
+
+        const format = value => isNaN(value) ? '–' : value.toFixed(3);
+        container.innerHTML = `
+            <table class="table table-sm">
+                <thead><tr><th>Rank</th><th>Safeguard</th>${formula.columns.map(c => `<th>${c}</th>`).join('')}<th>Score</th></tr></thead>
+                <tbody>${ranked.map(({ row, score }, i) => `
+                    <tr><td>#${i + 1}</td><td>${row.safeguard}</td>${formula.columns.map(c => `<td>${format(parseFloat(row[c]))}</td>`).join('')}<td><strong>${format(score)}</strong></td></tr>`).join('')}
+                </tbody>
+            </table>`;
+    }
+
+    preset.addEventListener('change', () => { input.value = FORMULAS[preset.value]; update(); });
+    input.addEventListener('input', update);
+    update();
+}
+
+// Live results of the verdict corpus, pushed by the server while it scans it (see online.py)
+const LIVE_COLUMNS = ['BELLS_score', 'harmful_jailbreaks', 'harmful_non-adversarial', 'benign_non-adversarial'];
+
+function createLiveResults() {
+    const section = document.getElementById('liveResultsSection');
+    if (!section || !window.EventSource) {
+        return;
+    }
+    const source = new EventSource('/api/online');
+    source.onmessage = event => {
+        const snapshot = JSON.parse(event.data);
+        section.style.display = '';
+        renderLiveResults(snapshot);
+        if (snapshot.done) {
+            source.close();
+        }
+    };
+    // No corpus (204) or no API (static server): the stream closes and the section stays hidden
+    source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) {
+            console.log('Live results unavailable');
+        }
+    };
+}
+
+function renderLiveResults(snapshot) {
+    const share = snapshot.rows / Math.max(snapshot.total_rows, 1);
+    const progress = document.getElementById('liveProgress');
+    progress.style.width = `${(share * 100).toFixed(1)}%`;
+    progress.textContent = `${(share * 100).toFixed(0)}%`;
+    document.getElementById('liveConfidence').textContent = `${Math.round(snapshot.confidence * 100)}%`;
+    document.getElementById('liveStatus').textContent = snapshot.done
+        ? `Exact: ${snapshot.total_rows.toLocaleString()} verdicts scanned in ${snapshot.seconds.toFixed(1)}s`
+        : `${snapshot.rows.toLocaleString()} of ${snapshot.total_rows.toLocaleString()} verdicts scanned ` +
+          `(${snapshot.blocks} of ${snapshot.total_blocks} blocks)`;
+
+    const errors = new Map(snapshot.errors.map(row => [row.safeguard, row]));
+    const columns = LIVE_COLUMNS.filter(column => snapshot.estimates.length && column in snapshot.estimates[0]);
+    const rows = [...snapshot.estimates].sort((a, b) => (b.BELLS_score ?? -Infinity) - (a.BELLS_score ?? -Infinity));
+    const format = (value, error) => {
+        if (value === null) return '–';
+        if (error === null || error === 0) return value.toFixed(3);
+        return `${value.toFixed(3)} <span class="text-muted">± ${error.toFixed(3)}</span>`;
+    };
+    document.getElementById('liveResults').innerHTML = `
+        <table class="table table-sm">
+            <thead><tr><th>Safeguard</th>${columns.map(c => `<th>${c}</th>`).join('')}</tr></thead>
+            <tbody>${rows.map(row => `
+                <tr><td>${row.safeguard}</td>${columns.map(c => `<td>${format(row[c], errors.get(row.safeguard)[c])}</td>`).join('')}</tr>`).join('')}
+            </tbody>
+        </table>`;
+}
+
 function getScoreClass(value) {
     if (value >= 0.9) return 'score-excellent';
     if (value >= 0.7) return 'score-good';
@@ -816,6 +1091,218 @@ function createJailbreakComparison(data) {
     createTypeView();
 }
 
+// Drill-down breakdown over the detection count cube (data/safeguard_cube.csv,
+// built by BELLS_leaderboard_mock_up.cube): one row per cell of the dimensions
+// below, with its prompts and the detections of every safeguard
+const CUBE_DIMENSIONS = {
+    harm_level: 'Harm level',
+    adversarial: 'Adversarial',
+    category: 'Harm category',
+    jailbreak_type: 'Jailbreak type',
+    jailbreak_source: 'Jailbreak source',
+    prompt_source: 'Prompt source'
+};
+
+async function loadCube() {
+    const response = await fetch('../../../data/safeguard_cube.csv');
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const cells = d3.csvParse(await response.text());
+    const safeguards = cells.columns.filter(c => !(c in CUBE_DIMENSIONS) && c !== 'prompts');
+    cells.forEach(cell => {
+        cell.adversarial = String(cell.adversarial.toLowerCase() === 'true');
+        cell.prompts = +cell.prompts;
+        safeguards.forEach(s => { cell[s] = +cell[s]; });
+    });
+    return { cells, safeguards };
+}
+
+// Prompts and detections of `safeguard` per (row value, column value), over the cells matching `filters`
+function rollupCube(cube, rows, columns, safeguard, filters) {
+    const sums = new Map();
+    cube.cells.forEach(cell => {
+        if (Object.entries(filters).some(([dimension, value]) => cell[dimension] !== value)) {
+            return;
+        }
+        const key = `${cell[rows]}\u0000${cell[columns]}`;
+        const sum = sums.get(key) || { row: cell[rows], column: cell[columns], prompts: 0, detections: 0 };
+        sum.prompts += cell.prompts;
+        sum.detections += cell[safeguard];
+        sums.set(key, sum);
+    });
+    return [...sums.values()];
+}
+
+function createBreakdown(cube) {
+    const controls = {
+        safeguard: document.getElementById('breakdownSafeguard'),
+        rows: document.getElementById('breakdownRows'),
+        columns: document.getElementById('breakdownColumns'),
+        harmLevel: document.getElementById('breakdownHarmLevel'),
+        prompts: document.getElementById('breakdownPrompts')
+    };
+    if (!controls.safeguard || !document.getElementById('breakdownPlot')) {
+        return;
+    }
+
+    const addOptions = (select, values, labels = {}) => values.forEach(value => {
+        select.add(new Option(labels[value] || value, value));
+    });
+    addOptions(controls.safeguard, cube.safeguards);
+    addOptions(controls.rows, Object.keys(CUBE_DIMENSIONS), CUBE_DIMENSIONS);
+    addOptions(controls.columns, Object.keys(CUBE_DIMENSIONS), CUBE_DIMENSIONS);
+    controls.harmLevel.add(new Option('All', 'all'));
+    addOptions(controls.harmLevel, [...new Set(cube.cells.map(cell => cell.harm_level))].sort());
+    controls.rows.value = 'category';
+    controls.columns.value = 'jailbreak_source';
+
+    function update() {
+        const rows = controls.rows.value;
+        const columns = controls.columns.value;
+        const safeguard = controls.safeguard.value;
+        const filters = {};
+        if (controls.harmLevel.value !== 'all') filters.harm_level = controls.harmLevel.value;
+        if (controls.prompts.value !== 'all') filters.adversarial = controls.prompts.value;
+
+        const sums = rows === columns ? [] : rollupCube(cube, rows, columns, safeguard, filters);
+        if (!sums.length) {
+            Plotly.purge('breakdownPlot');
+            document.getElementById('breakdownPlot').textContent = rows === columns
+                ? 'Choose two different dimensions.' : 'No prompts in this selection.';
+            return;
+        }
+        document.getElementById('breakdownPlot').textContent = '';
+        const rowValues = [...new Set(sums.map(s => s.row))].sort();
+        const columnValues = [...new Set(sums.map(s => s.column))].sort();
+        const rates = rowValues.map(() => columnValues.map(() => null));
+        sums.forEach(s => {
+            rates[rowValues.indexOf(s.row)][columnValues.indexOf(s.column)] = s.detections / s.prompts;
+        });
+
+        Plotly.react('breakdownPlot', [{
+            z: rates,
+            x: columnValues,
+            y: rowValues,
+            type: 'heatmap',
+            zmin: 0,
+            zmax: 1,
+            colorscale: 'RdYlGn',
+            text: rates.map(row => row.map(rate => rate === null ? '' : rate.toFixed(2))),
+            texttemplate: '%{text}',
+            hovertemplate: `${CUBE_DIMENSIONS[rows]}: %{y}<br>${CUBE_DIMENSIONS[columns]}: %{x}` +
+                '<br>Detection rate: %{z:.3f}<extra></extra>',
+            colorbar: { title: 'Detection rate' }
+        }], {
+            title: `${safeguard} Detection Rate by ${CUBE_DIMENSIONS[rows]} and ${CUBE_DIMENSIONS[columns]}`,
+            xaxis: { title: CUBE_DIMENSIONS[columns], tickangle: -45, automargin: true },
+            yaxis: { title: CUBE_DIMENSIONS[rows], automargin: true },
+            height: Math.max(400, 40 * rowValues.length + 200)
+        }, { responsive: true, displayModeBar: false });
+    }
+
+    Object.values(controls).forEach(control => control.addEventListener('change', update));
+    update();
+}
+
+// Simulated paired McNemar tests between safeguards (BELLS_leaderboard_mock_up.significance)
+async function loadSignificance() {
+    const response = await fetch('../../../data/pairwise_significance.csv');
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const tests = d3.csvParse(await response.text());
+    tests.forEach(test => {
+        test.difference = +test.difference;
+        test.p_adjusted = +test.p_adjusted;
+        test.significant = test.significant.toLowerCase() === 'true';
+    });
+    return tests;
+}
+
+function createSignificance(tests) {
+    const select = document.getElementById('significanceSlice');
+    if (!select || !document.getElementById('significancePlot')) {
+        return;
+    }
+    [...new Set(tests.map(test => test.slice))].forEach(name => select.add(new Option(name, name)));
+
+    function update() {
+        const rows = tests.filter(test => test.slice === select.value);
+        const names = [...new Set(rows.flatMap(test => [test.safeguard, test.opponent]))];
+        const index = new Map(names.map((name, i) => [name, i]));
+        const signs = names.map(() => names.map(() => 0));
+        const labels = names.map(() => names.map(() => ''));
+        const pValues = names.map(() => names.map(() => null));
+        rows.forEach(test => {
+            const i = index.get(test.safeguard);
+            const j = index.get(test.opponent);
+            const sign = test.significant ? Math.sign(test.difference) : 0;
+            signs[i][j] = sign;
+            signs[j][i] = -sign;
+            labels[i][j] = `${test.difference >= 0 ? '+' : ''}${(100 * test.difference).toFixed(1)}%`;
+            labels[j][i] = `${test.difference <= 0 ? '+' : ''}${(-100 * test.difference).toFixed(1)}%`;
+            pValues[i][j] = pValues[j][i] = test.p_adjusted;
+        });
+
+        Plotly.react('significancePlot', [{
+            z: signs,
+            x: names,
+            y: names,
+            type: 'heatmap',
+            zmin: -1,
+            zmax: 1,
+            colorscale: [[0, '#e03131'], [0.5, '#f1f3f5'], [1, '#2f9e44']],
+            showscale: false,
+            text: labels,
+            texttemplate: '%{text}',
+            customdata: pValues,
+            hovertemplate: '%{y} vs %{x}<br>Difference: %{text}<br>Adjusted p-value: %{customdata:.2g}<extra></extra>'
+        }], {
+            title: `Pairwise McNemar Tests (${select.value}, simulated)`,
+            xaxis: { title: 'Opponent', automargin: true },
+            yaxis: { title: 'Safeguard', automargin: true },
+            height: Math.max(400, 40 * names.length + 200)
+        }, { responsive: true, displayModeBar: false });
+    }
+
+    select.addEventListener('change', update);
+    update();
+}
+
+function createPerformancePlot(data) {
+    if (!document.getElementById('performancePlot') || !data.length || !('latency_p95_ms' in data[0])) {
+        return;
+    }
+    // Simulated by performance.py on the stub profiles of safeguards.STUB_PROFILES
+    const cost = data.map(d => +d.cost_per_1k_prompts);
+    Plotly.newPlot('performancePlot', [{
+        x: data.map(d => +d.latency_p95_ms),
+        y: data.map(d => +d.throughput_saturation),
+        text: data.map(d => d.safeguard),
+        customdata: data.map((d, i) => [cost[i], +d.performance_score]),
+        mode: 'markers+text',
+        type: 'scatter',
+        textposition: 'top center',
+        marker: {
+            // Free safeguards keep a visible marker
+            size: cost.map(c => 12 + 24 * c / Math.max(...cost, 1e-9)),
+            color: data.map(d => +d.performance_score),
+            colorscale: 'Viridis',
+            cmin: 0,
+            cmax: 1,
+            colorbar: { title: 'Performance score' }
+        },
+        hovertemplate: '%{text}<br>p95 latency: %{x:.1f} ms<br>Throughput: %{y:.0f} prompts/s<br>' +
+            'Cost: $%{customdata[0]:.2f} per 1k prompts<br>Performance score: %{customdata[1]:.2f}<extra></extra>'
+    }], {
+        title: 'Serving Performance (simulated)',
+        xaxis: { title: 'p95 latency (ms, log scale)', type: 'log' },
+        yaxis: { title: 'Throughput at saturation (prompts/s)', type: 'log' },
+        height: 500
+    }, { responsive: true, displayModeBar: false });
+}
+
 function toggleInterpretation(interpretationId) {
     const content = document.getElementById(interpretationId);
     const button = content.previousElementSibling;
@@ -958,17 +1445,34 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
     // Rest of your existing initialization code...
-    loadData().then(data => {
+    // The ranking is shown without rank probabilities if they cannot be loaded
+    const ranks = loadRanks().catch(error => {
+        console.error('Error loading the rank probabilities:', error);
+        return new Map();
+    });
+    Promise.all([loadData(), ranks]).then(([data, ranks]) => {
         if (data) {
-            createRankingList(data);
+            createRankingList(data, ranks);
+            createFormulaRanking(data);
             createHeatmap(data);
             createFPRComparison(data);
             createJailbreakComparison(data);
             createSensitivityAnalysis(data);
+            createPerformancePlot(data);
         }
     }).catch(error => {
         console.error('Error loading data:', error);
     });
+
+    createLiveResults();
+
+    loadCube().then(createBreakdown).catch(error => {
+        console.error('Error loading the breakdown cube:', error);
+    });
+
+    loadSignificance().then(createSignificance).catch(error => {
+        console.error('Error loading the pairwise tests:', error);
+    });
 });
 
 // Also check if the div exists in the HTML
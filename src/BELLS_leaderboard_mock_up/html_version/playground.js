@@ -1,8 +1,87 @@
+// Syntactic transforms of BELLS_leaderboard_mock_up.jailbreaks, applied to the UTF-8 bytes
+const LEET = { a: '4', e: '3', i: '1', o: '0', s: '5', t: '7' };
+const utf8Bytes = text => Array.from(new TextEncoder().encode(text));
+const TRANSFORMS = {
+    none: text => text,
+    url_encoded: text => encodeURIComponent(text)
+        .replace(/[!'()*]/g, c => '%' + c.charCodeAt(0).toString(16).toUpperCase()),
+    uppercase: text => text.toUpperCase(),
+    reverse: text => Array.from(text).reverse().join(''),
+    disemvowel: text => text.replace(/[aeiouAEIOU]/g, ''),
+    base64: text => btoa(String.fromCharCode(...utf8Bytes(text))),
+    rot13: text => text.replace(/[a-zA-Z]/g, c => {
+        const base = c <= 'Z' ? 65 : 97;
+        return String.fromCharCode((c.charCodeAt(0) - base + 13) % 26 + base);
+    }),
+    binary: text => utf8Bytes(text).map(b => b.toString(2).padStart(8, '0')).join(' '),
+    hex: text => utf8Bytes(text).map(b => b.toString(16).padStart(2, '0')).join(''),
+    ascii: text => utf8Bytes(text).join(' '),
+    leet: text => text.replace(/[aeiostAEIOST]/g, c => LEET[c.toLowerCase()])
+};
+const GOAL_PLACEHOLDER = '{goal}';
+// Similar prompts API of server.py (BELLS_leaderboard_mock_up.similarity)
+const SIMILAR_API = '/api/similar';
+const SIMILAR_PROMPTS = 10;
+
+// Jailbreak prompt of a row of the factorized store, rendered on demand
+function renderJailbreak(prompt) {
+    const store = window.loadedData.jailbreakStore;
+    const template = store.templates[prompt.template_id].template;
+    const goal = store.goals[prompt.goal_id].question;
+    const transform = store.transforms[prompt.transform_id].transform;
+    return TRANSFORMS[transform](template.split(GOAL_PLACEHOLDER).join(goal));
+}
+
+// Whether the prompt of a row, before its transform, contains the (lower-cased) search term:
+// in its template, or across its goal and the text around a placeholder
+function jailbreakMatches(prompt, searchTerm) {
+    const store = window.loadedData.jailbreakStore;
+    const parts = store.templates[prompt.template_id].template.toLowerCase().split(GOAL_PLACEHOLDER);
+    if (parts.some(part => part.includes(searchTerm))) return true;
+    const goal = store.goals[prompt.goal_id].question.toLowerCase();
+    const margin = searchTerm.length - 1;
+    return parts.slice(0, -1).some((before, i) =>
+        (before.slice(Math.max(before.length - margin, 0)) + goal + parts[i + 1].slice(0, margin))
+            .includes(searchTerm));
+}
+
+// "More like this": the prompts of both corpora most similar to `text`, with their verdicts
+async function showSimilarPrompts(text, container) {
+    container.innerHTML = '<div class="text-muted small">Searching similar prompts...</div>';
+    try {
+        const response = await fetch(`${SIMILAR_API}?k=${SIMILAR_PROMPTS}&text=${encodeURIComponent(text)}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const { prompts } = await response.json();
+        const safeguards = window.loadedData.safeguards;
+        container.innerHTML = prompts.length === 0 ? '<div class="text-muted small">No similar prompts.</div>' : `
+            <table class="table table-sm small">
+                <thead><tr><th>Similarity</th><th>Prompt</th><th>Harm level</th>${safeguards.map(s =>
+                    `<th>${s.replace('_', ' ')}</th>`).join('')}</tr></thead>
+                <tbody>${prompts.map(prompt => `
+                    <tr><td>${prompt.similarity.toFixed(2)}</td><td>${prompt.question}${prompt.corpus === 'adversarial'
+                        ? ` <span class="badge bg-secondary">${prompt.jailbreak_type}</span>` : ''}</td>
+                    <td>${prompt.harm_level}</td>${safeguards.map(s => `<td>${+prompt[s] ? '✅' : '❌'}</td>`).join('')}</tr>`).join('')}
+                </tbody>
+            </table>`;
+    } catch (error) {
+        console.error('Error loading similar prompts:', error);
+        container.innerHTML = `<div class="alert alert-warning small">
+            Similar prompts are served by the BELLS server (python -m BELLS_leaderboard_mock_up.html_version.server).</div>`;
+    }
+}
+
 // Data loading function
 async function loadData() {
+    // Jailbreaks are stored factorized (templates x goals x transforms, see
+    // BELLS_leaderboard_mock_up.jailbreak_store): rows only hold ids and verdicts
     const dataFiles = {
         nonAdversarial: '../../../data/non_adversarial_prompts.csv',
-        adversarial: '../../../data/adversarial_prompts.csv'
+        templates: '../../../data/jailbreaks/templates.csv',
+        goals: '../../../data/jailbreaks/goals.csv',
+        transforms: '../../../data/jailbreaks/transforms.csv',
+        rows: '../../../data/jailbreaks/rows.csv'
     };
 
     try {
@@ -29,6 +108,24 @@ async function loadData() {
         // Debug log to check data structure
         console.log('Loaded data structure:', loadedData);
 
+        // Adversarial rows share the label strings of their goal and template
+        loadedData.adversarial = loadedData.rows.map(row => {
+            const goal = loadedData.goals[+row.goal_id];
+            const template = loadedData.templates[+row.template_id];
+            return {
+                ...row,
+                template_id: +row.template_id,
+                goal_id: +row.goal_id,
+                transform_id: +row.transform_id,
+                question: goal.question,
+                harm_level: goal.harm_level,
+                category: goal.category,
+                source: goal.source,
+                jailbreak_source: template.jailbreak_source,
+                jailbreak_type: template.jailbreak_type
+            };
+        });
+
         // Organize data by harm level
         const datasets = {
             'Harmful': {
@@ -50,6 +147,11 @@ async function loadData() {
 
         return {
             datasets: datasets,
+            jailbreakStore: {
+                templates: loadedData.templates,
+                goals: loadedData.goals,
+                transforms: loadedData.transforms
+            },
             safeguards: ['lakera_guard', 'prompt_guard', 'langkit', 'nemo', 'llm_guard']
         };
     } catch (error) {
@@ -242,7 +344,7 @@ function updatePlayground() {
     if (searchTerm) {
         currentDataset = currentDataset.filter(prompt => 
             prompt.question.toLowerCase().includes(searchTerm) ||
-            (prompt.jailbreak_prompt && prompt.jailbreak_prompt.toLowerCase().includes(searchTerm))
+            (contentType === 'Adversarial' && jailbreakMatches(prompt, searchTerm))
         );
     }
 
@@ -263,6 +365,7 @@ function updatePlayground() {
     }
 
     currentDataset.forEach(prompt => {
+        const jailbreakPrompt = contentType === 'Adversarial' ? renderJailbreak(prompt) : null;
         const card = document.createElement('div');
         card.className = 'card mb-3';
         
@@ -296,10 +399,10 @@ function updatePlayground() {
                         `;
                     }).join(' ')}
                 </div>
-                ${contentType === 'Adversarial' && prompt.jailbreak_prompt ? `
+                ${jailbreakPrompt ? `
                     <div class="prompt-content">
                         <strong>Jailbreak Attempt:</strong>
-                        <p class="text-muted">${prompt.jailbreak_prompt}</p>
+                        <p class="text-muted">${jailbreakPrompt}</p>
                         <div class="mt-2">
                             <strong>Type:</strong> ${prompt.jailbreak_type || 'N/A'}
                             <br>
@@ -312,8 +415,12 @@ function updatePlayground() {
                     <br>
                     <strong>Source:</strong> ${prompt.source}
                 </div>
+                <button type="button" class="btn btn-outline-secondary btn-sm mt-2 more-like-this">🔎 More like this</button>
+                <div class="similar-prompts mt-2"></div>
             </div>
         `;
+        card.querySelector('.more-like-this').addEventListener('click', () =>
+            showSimilarPrompts(jailbreakPrompt || prompt.question, card.querySelector('.similar-prompts')));
         
         promptsContainer.appendChild(card);
     });
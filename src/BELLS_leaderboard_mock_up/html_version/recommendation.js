@@ -137,10 +137,13 @@ function calculateRagCompatibilityScore(safeguard, ragEnabled) {
 }
 
 function calculatePerformanceScore(safeguard, requestVolume) {
+    // Simulated by performance.py on the stub profiles, neutral when the column is missing
+    const performance = parseFloat(safeguard.performance_score);
+    const performanceScore = isNaN(performance) ? 1 : performance;
     const volumeScores = {
         'Low': 1,
-        'Medium': safeguard.performance_score,
-        'High': safeguard.performance_score * safeguard.performance_score
+        'Medium': performanceScore,
+        'High': performanceScore * performanceScore
     };
     return volumeScores[requestVolume];
 }
@@ -174,7 +177,8 @@ function generateDetailedExplanation(preferences, topSafeguard) {
                 <ul>
                     <li>BELLS Score: ${topSafeguard.details.BELLS_score} 
                         (${getScoreQualification(topSafeguard.details.BELLS_score)})</li>
-                    <li>Performance Rating: Handles ${preferences.requestVolume} volume efficiently</li>
+                    <li>Performance Rating: ${topSafeguard.details.performance_score ?? 'n/a'} for ${preferences.requestVolume} volume
+                        (simulated on the stub profiles of safeguards.STUB_PROFILES)</li>
                     <li>Risk Protection: Suitable for ${preferences.riskLevel} risk environments</li>
                     ${preferences.ragEnabled === 'Yes' ? 
                         `<li>RAG Compatible: Seamless integration with retrieval-augmented generation</li>` : ''}
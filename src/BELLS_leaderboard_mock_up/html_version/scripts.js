@@ -487,10 +487,13 @@ function calculateRagCompatibilityScore(safeguard, ragEnabled) {
 }
 
 function calculatePerformanceScore(safeguard, requestVolume) {
+    // Simulated by performance.py on the stub profiles, neutral when the column is missing
+    const performance = parseFloat(safeguard.performance_score);
+    const performanceScore = isNaN(performance) ? 1 : performance;
     const volumeScores = {
         'Low': 1,
-        'Medium': safeguard.performance_score,
-        'High': safeguard.performance_score * safeguard.performance_score
+        'Medium': performanceScore,
+        'High': performanceScore * performanceScore
     };
     return volumeScores[requestVolume];
 }
@@ -1,30 +1,219 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+import json
 import os
+import re
+import sys
+
+from BELLS_leaderboard_mock_up.assets import build_assets, picture_html
+
+STATIC_ASSETS_URL = '/static/assets'
+DISAGREEMENTS_URL = '/api/disagreements'
+SIMILAR_URL = '/api/similar'
+ONLINE_URL = '/api/online'
+# Prompts returned per request of the disagreement API, at most
+MAX_API_ROWS = 1000
+# Seconds between two messages of the live results stream, at most
+ONLINE_KEEPALIVE = 15
+
+# Built image variants, NAME.WIDTHw.DIGEST.FORMAT (see assets.py), unlike manifest.json
+HASHED_ASSET = re.compile(re.escape(STATIC_ASSETS_URL) + r'/[^/?#]+\.\d+w\.[0-9a-f]{12}\.\w+(?:[?#].*)?$')
+
+# <img src="../../../images/NAME" ...> tags of the HTML pages
+IMAGE_TAG = re.compile(r'<img\s+src="[^"]*images/([^"]+)"([^>]*?)/?>')
+ALT_ATTR = re.compile(r'\s*alt="([^"]*)"')
 
 class CORSRequestHandler(SimpleHTTPRequestHandler):
+    # Asset manifest and rewritten pages, shared by all requests
+    manifest = {}
+    pages = {}
+
+    def send_response(self, code, message=None):
+        self.status = code
+        super().send_response(code, message)
+
     def end_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
+        # Built assets have content-hashed names, so they can be cached forever; not errors or the manifest
+        if getattr(self, 'status', None) == 200 and HASHED_ASSET.match(self.path):
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
         super().end_headers()
 
     def do_OPTIONS(self):
         self.send_response(200)
         self.end_headers()
 
-def run_server():
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == ONLINE_URL:
+            return self.stream_online()
+        if url.path not in API:
+            return super().do_GET()
+        try:
+            status, payload = 200, API[url.path]({k: v[-1] for k, v in parse_qs(url.query).items()})
+        except FileNotFoundError as e:
+            status, payload = 404, {'error': f"Unknown dataset: {e.filename}"}
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        body = to_json(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_online(self):
+        """Snapshots of the online aggregation of the verdict corpus (see `online`), as server-sent events
+        until its scan is done"""
+        from BELLS_leaderboard_mock_up.online import VERDICTS, load_online, snapshot_json
+
+        if not VERDICTS.exists():
+            # No content: EventSource does not reconnect
+            self.send_response(204)
+            self.end_headers()
+            return
+        aggregation = load_online()
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        version = 0
+        try:
+            while True:
+                snapshot = aggregation.wait(version, timeout=ONLINE_KEEPALIVE)
+                if snapshot is not None and snapshot['version'] > version:
+                    version = snapshot['version']
+                    self.wfile.write(f"data: {to_json(snapshot_json(snapshot))}\n\n".encode('utf-8'))
+                elif snapshot is None or not snapshot['done']:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+                if snapshot is not None and snapshot['done']:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not path.endswith('.html') or not os.path.isfile(path):
+            return super().send_head()
+
+        # Serve HTML pages with their images pointing to the resized static variants
+        mtime = os.path.getmtime(path)
+        cached = self.pages.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding='utf-8') as f:
+                cached = (mtime, self.rewrite_images(f.read()).encode('utf-8'))
+            self.pages[path] = cached
+        body = cached[1]
+
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return BytesIO(body)
+
+    def rewrite_images(self, html):
+        def replace(match):
+            name, attrs = match.groups()
+            if name not in self.manifest:
+                return match.group(0)
+            alt = ALT_ATTR.search(attrs)
+            attrs = ALT_ATTR.sub('', attrs).strip()
+            return picture_html(self.manifest, name, STATIC_ASSETS_URL,
+                                alt=alt.group(1) if alt else '', attrs=attrs)
+        return IMAGE_TAG.sub(replace, html)
+
+def to_json(payload):
+    return json.dumps(payload, default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+
+def disagreements(params):
+    """Response of the disagreement API: prompts of a dataset in data/ matching a filter of
+    `disagreement.FILTERS`, and the index's summaries over the prompts of the requested harm level.
+
+    Parameters: `dataset` (non_adversarial_prompts.csv), `filter` (disagree), `safeguard` and `other`
+    (the safeguards of the filter), `harm_level` (all by default), `offset` and `limit` of the prompts.
+    """
+    from BELLS_leaderboard_mock_up.datastore import load_dataset
+    from BELLS_leaderboard_mock_up.disagreement import load_index
+
+    name = params.get('dataset', 'non_adversarial_prompts.csv')
+    if '/' in name or '\\' in name or not name.endswith('.csv'):
+        raise ValueError(f"Invalid dataset: {name}")
+    index = load_index(name)
+    prompts = load_dataset(name)
+    scope = index.valid
+    if params.get('harm_level'):
+        if 'harm_level' not in prompts.columns:
+            raise ValueError(f"{name} has no harm_level column")
+        scope = index.pack((prompts['harm_level'] == params['harm_level']).fillna(False).to_numpy(dtype=bool))
+    try:
+        offset = int(params.get('offset', 0))
+        limit = min(int(params.get('limit', 100)), MAX_API_ROWS)
+    except ValueError:
+        raise ValueError("offset and limit must be integers") from None
+
+    rows = index.rows(index.query(params.get('filter', 'disagree'), params.get('safeguard'), params.get('other')) & scope)
+    page = rows[max(offset, 0):max(offset, 0) + max(limit, 0)]
+    records = prompts.iloc[page].astype(object).where(prompts.iloc[page].notna(), None)
+    return {
+        'dataset': name,
+        'safeguards': index.safeguards,
+        'prompts': index.count(scope),
+        'matches': len(rows),
+        'offset': offset,
+        'rows': [{'position': position, **record} for position, record in zip(page.tolist(), records.to_dict('records'))],
+        'summary': index.summary(scope).to_dict('records'),
+        'disagreements': index.pair_matrix(scope).to_numpy().tolist(),
+        'agreement_levels': index.agreement_levels(scope).tolist(),
+    }
+
+def similar(params):
+    """Response of the similar prompts API: the `k` (10) prompts of both corpora most similar to `text`,
+    with their labels and verdicts, leaving out the prompt `row` of `corpus` if given"""
+    from BELLS_leaderboard_mock_up.similarity import load_similarity, similar_prompts
+
+    if not params.get('text'):
+        raise ValueError("Missing text")
+    try:
+        k = min(int(params.get('k', 10)), MAX_API_ROWS)
+        exclude = (params['corpus'], int(params['row'])) if 'corpus' in params and 'row' in params else None
+    except ValueError:
+        raise ValueError("k and row must be integers") from None
+    if k < 1:
+        raise ValueError("k must be positive")
+    if exclude is not None:
+        index = load_similarity()
+        corpus, row = exclude
+        if corpus not in index.corpora:
+            raise ValueError(f"Invalid corpus: {corpus}")
+        position = index.corpora.index(corpus)
+        if not 0 <= row < index.corpus_offsets[position + 1] - index.corpus_offsets[position]:
+            raise ValueError(f"Invalid row of {corpus}: {row}")
+    results = similar_prompts(params['text'], k, exclude)
+    return {'prompts': results.astype(object).where(results.notna(), None).to_dict('records')}
+
+API = {DISAGREEMENTS_URL: disagreements, SIMILAR_URL: similar}
+
+def run_server(port=8000):
     # Change to the project root directory (3 levels up from html_version)
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))
     os.chdir(project_root)
-    
+
     print(f"Current directory: {current_dir}")
     print(f"Project root: {project_root}")
     print(f"Serving files from: {os.getcwd()}")
-    
-    port = 8000
+
+    # Build the resized image variants into static/assets
+    CORSRequestHandler.manifest = build_assets()
+
     server_address = ('', port)
-    httpd = HTTPServer(server_address, CORSRequestHandler)
+    # One thread per request, so live result streams do not hold up the other requests
+    httpd = ThreadingHTTPServer(server_address, CORSRequestHandler)
     print(f"Server running on http://localhost:{port}")
     httpd.serve_forever()
 
 if __name__ == '__main__':
-    run_server() 
\ No newline at end of file
+    # Optional port argument, like `python -m http.server 8080`
+    run_server(int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
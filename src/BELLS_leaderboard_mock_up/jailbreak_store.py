@@ -0,0 +1,228 @@
+"""Jailbreak datasets stored factorized: templates x goals x transforms.
+
+A jailbreak prompt is a template (narrative framing, role play, ...) with
+the goal substituted for its `{goal}` placeholders, optionally passed
+through a syntactic transform (see `jailbreaks.TRANSFORMS`). Storing every
+rendered prompt repeats each long template once per goal; a store instead
+holds, in a directory of CSV files:
+
+- `templates.csv`: `template`, `jailbreak_source`, `jailbreak_type`
+- `goals.csv`: `question`, `harm_level`, `category`, `source`
+- `transforms.csv`: `transform` (`none` first, then `jailbreaks.TRANSFORMS`)
+- `rows.csv`: `template_id`, `goal_id`, `transform_id` (row numbers in the
+  tables above) and one 0/1 verdict column per safeguard
+
+`view()` returns the labels and verdicts of every row with categorical
+columns (codes into the small tables), and `render(rows)` the jailbreak
+prompts of the rows actually displayed. `search(query)` matches the
+prompts before their transform without rendering them: a template matches
+on its own, or a (template, goal) pair when the query spans the goal and
+the text around one of its placeholders.
+
+`factorize` builds a store from rendered prompts (the columns of `view()`
+plus `jailbreak_prompt`), and is lossless: prompts in which the goal does
+not appear become templates without placeholder.
+
+    python -m BELLS_leaderboard_mock_up.jailbreak_store data/adversarial_prompts.csv --output data/jailbreaks
+"""
+import argparse
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR, dataset_digest, load_dataset
+from BELLS_leaderboard_mock_up.jailbreaks import TRANSFORMS
+
+GOAL = '{goal}'
+TABLES = ['templates', 'goals', 'transforms', 'rows']
+# Shown by the playgrounds when the store has not been built
+BUILD_COMMAND = ("python -m BELLS_leaderboard_mock_up.jailbreak_store data/adversarial_prompts.csv "
+                 "--output data/jailbreaks")
+TRANSFORM_NAMES = ['none'] + list(TRANSFORMS)
+ID_COLUMNS = ['template_id', 'goal_id', 'transform_id']
+GOAL_COLUMNS = ['question', 'harm_level', 'category', 'source']
+LABEL_COLUMNS = ['jailbreak_source', 'jailbreak_type']
+
+
+def _transform(name, texts):
+    return texts if name == 'none' else TRANSFORMS[name](pa.array(texts, pa.string())).to_pylist()
+
+
+class JailbreakStore:
+    """Factorized jailbreak dataset, see the module docstring"""
+
+    def __init__(self, templates, goals, transforms, rows):
+        self.templates = templates.reset_index(drop=True)
+        self.goals = goals.reset_index(drop=True)
+        self.transforms = transforms.reset_index(drop=True)
+        self.rows = rows.reset_index(drop=True)
+        self.safeguards = [c for c in rows.columns if c not in ID_COLUMNS]
+        self._ids = {c: rows[c].to_numpy(dtype='int64') for c in ID_COLUMNS}
+
+        # Lower-cased text of the factors, for search
+        self._template_text = self.templates['template'].astype(str).str.lower().tolist()
+        self._goal_text = self.goals['question'].astype(str).str.lower().to_numpy(dtype=object)
+        self._view = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def view(self):
+        """Labels and verdicts of every row; text columns are categoricals over the small tables.
+
+        Built once and shared: treat it as read-only.
+        """
+        if self._view is None:
+            self._view = self._build_view()
+        return self._view
+
+    def _build_view(self):
+        def labels(table, column, codes):
+            categories, inverse = np.unique(table[column].fillna('').to_numpy(dtype=str), return_inverse=True)
+            return pd.Categorical.from_codes(inverse[codes], categories)
+
+        goal_id, template_id = self._ids['goal_id'], self._ids['template_id']
+        frame = pd.DataFrame({
+            **{column: labels(self.goals, column, goal_id) for column in GOAL_COLUMNS},
+            **{column: labels(self.templates, column, template_id) for column in LABEL_COLUMNS},
+        })
+        for safeguard in self.safeguards:
+            frame[safeguard] = self.rows[safeguard].to_numpy(dtype='int8')
+        return frame
+
+    def render(self, rows):
+        """Jailbreak prompts of `rows` (positions in the store)"""
+        rows = np.asarray(rows, dtype='int64')
+        templates = self.templates['template'].to_numpy(dtype=object)[self._ids['template_id'][rows]]
+        goals = self.goals['question'].to_numpy(dtype=object)[self._ids['goal_id'][rows]]
+        texts = np.array([str(t).replace(GOAL, str(g)) for t, g in zip(templates, goals)], dtype=object)
+
+        transform_ids = self._ids['transform_id'][rows]
+        names = self.transforms['transform'].tolist()
+        for transform_id in np.unique(transform_ids):
+            selected = transform_ids == transform_id
+            texts[selected] = _transform(names[transform_id], texts[selected].tolist())
+        return texts.tolist()
+
+    def search(self, query):
+        """Rows whose prompt, before its transform, contains `query` (case-insensitive)"""
+        query = query.lower()
+        margin = len(query) - 1
+        matches = np.zeros((len(self.templates), len(self.goals)), dtype=bool)
+        for template_id, template in enumerate(self._template_text):
+            parts = template.split(GOAL)
+            if any(query in part for part in parts):
+                matches[template_id] = True
+                continue
+            # A match across a goal starts or ends within `margin` characters of it
+            for before, after in zip(parts[:-1], parts[1:]):
+                text = pd.Series(before[max(len(before) - margin, 0):] + self._goal_text + after[:margin])
+                matches[template_id] |= text.str.contains(query, regex=False).to_numpy()
+        return matches[self._ids['template_id'], self._ids['goal_id']]
+
+    def nbytes(self):
+        """Memory of the store's tables"""
+        return sum(int(table.memory_usage(deep=True).sum())
+                   for table in (self.templates, self.goals, self.transforms, self.rows))
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in TABLES:
+            getattr(self, name).to_csv(directory / f"{name}.csv", index=False)
+
+
+def factorize(frame, safeguards):
+    """Store of a rendered jailbreak dataset.
+
+    `frame` has the `GOAL_COLUMNS`, `jailbreak_prompt`, `jailbreak_source`,
+    `jailbreak_type` and `safeguards` columns. A prompt is the goal in a
+    template, or a transform of the goal (the transform named by its
+    `jailbreak_source`); otherwise the prompt is its own template.
+    """
+    frame = frame.reset_index(drop=True)
+    goal_keys = frame[GOAL_COLUMNS].astype(object).where(frame[GOAL_COLUMNS].notna(), None)
+    goals = goal_keys.drop_duplicates().reset_index(drop=True)
+    goal_id = pd.MultiIndex.from_frame(goals.fillna('\0')).get_indexer(
+        pd.MultiIndex.from_frame(goal_keys.fillna('\0')))
+
+    questions = frame['question'].astype(str).tolist()
+    prompts = frame['jailbreak_prompt'].astype(str).tolist()
+    sources = frame['jailbreak_source'].astype(object).tolist()
+    templates = list(prompts)
+    transform_id = np.zeros(len(frame), dtype='int64')
+
+    # Syntactic rows: the prompt is the transformed goal
+    for index, name in enumerate(TRANSFORM_NAMES[1:], start=1):
+        selected = [i for i, source in enumerate(sources) if source == name]
+        if not selected:
+            continue
+        rendered = _transform(name, [questions[i] for i in selected])
+        for i, text in zip(selected, rendered):
+            if text == prompts[i]:
+                templates[i] = GOAL
+                transform_id[i] = index
+    for i, (question, prompt) in enumerate(zip(questions, prompts)):
+        if not transform_id[i] and question and question in prompt and GOAL not in prompt:
+            templates[i] = prompt.replace(question, GOAL)
+
+    template_keys = frame[LABEL_COLUMNS].assign(template=templates)[['template'] + LABEL_COLUMNS]
+    template_keys = template_keys.astype(object).where(template_keys.notna(), None)
+    template_table = template_keys.drop_duplicates().reset_index(drop=True)
+    template_id = pd.MultiIndex.from_frame(template_table.fillna('\0')).get_indexer(
+        pd.MultiIndex.from_frame(template_keys.fillna('\0')))
+
+    rows = pd.DataFrame({'template_id': template_id, 'goal_id': goal_id, 'transform_id': transform_id})
+    for safeguard in safeguards:
+        rows[safeguard] = frame[safeguard].astype('int8').to_numpy()
+    return JailbreakStore(template_table, goals, pd.DataFrame({'transform': TRANSFORM_NAMES}), rows)
+
+
+_stores = {}
+_lock = threading.Lock()
+
+
+def has_store(name='jailbreaks', data_dir=DATA_DIR):
+    """Whether `data/<name>/` holds a store; it is not part of the repository and is built with `main`"""
+    return all((Path(data_dir) / name / f"{table}.csv").is_file() for table in TABLES)
+
+
+def load_store(name='jailbreaks', data_dir=DATA_DIR):
+    """Shared store of `data/<name>/`, rebuilt when one of its files changes"""
+    digests = tuple(dataset_digest(f"{name}/{table}.csv", data_dir) for table in TABLES)
+    key = str(Path(data_dir) / name)
+    with _lock:
+        cached = _stores.get(key)
+        if cached is None or cached[0] != digests:
+            tables = [load_dataset(f"{name}/{table}.csv", data_dir) for table in TABLES]
+            cached = (digests, JailbreakStore(*tables))
+            _stores[key] = cached
+        return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Factorize a rendered jailbreak dataset into a template store")
+    parser.add_argument('input', help='Rendered dataset (CSV with jailbreak_prompt and verdict columns)')
+    parser.add_argument('--output', type=Path, default=DATA_DIR / 'jailbreaks', help='Store directory')
+    parser.add_argument('--safeguards', nargs='+', default=None,
+                        help='Verdict columns, default: lakera_guard prompt_guard langkit nemo llm_guard')
+    args = parser.parse_args()
+
+    frame = pd.read_csv(args.input)
+    safeguards = args.safeguards or ['lakera_guard', 'prompt_guard', 'langkit', 'nemo', 'llm_guard']
+    store = factorize(frame, safeguards)
+    if store.render(np.arange(len(store))) != frame['jailbreak_prompt'].astype(str).tolist():
+        raise SystemExit("Rendered prompts differ from the input, store not written")
+    store.save(args.output)
+
+    print(f"{len(store)} prompts: {len(store.templates)} templates x {len(store.goals)} goals")
+    print(f"Memory: {frame.memory_usage(deep=True).sum() / 1e6:.1f} MB rendered, "
+          f"{store.nbytes() / 1e6:.1f} MB factorized")
+    print(f"Store written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
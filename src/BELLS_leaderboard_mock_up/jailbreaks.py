@@ -0,0 +1,222 @@
+"""Syntactic jailbreaks: the base prompts rewritten by character-level transforms.
+
+Each transform of `TRANSFORMS` (the `jailbreak_source_*` syntactic columns
+of the results table) rewrites a whole batch of prompts at once, on the
+Arrow string buffers rather than string by string:
+
+- `uppercase`, `reverse`: Arrow compute kernels
+- `rot13`, `leet`, `disemvowel`: a lookup table over the UTF-8 bytes
+- `binary`, `hex`: each byte replaced by its 8 bits or 2 hex digits, as a
+  2-d array of fixed width
+- `url_encoded`, `ascii`: each byte replaced by its encoding of variable
+  length (`%XX` outside the URL-safe characters, decimal code), padded to
+  a fixed width then compressed
+- `base64`: bytes padded to a multiple of 3 per prompt, then encoded 3 bytes
+  at a time
+
+`binary` and `ascii` separate the codes of consecutive bytes by a space.
+
+The non-adversarial prompts of a corpus are read in batches of `batch_size`,
+and every transform of a batch is written as one row group of a verdict
+store without safeguard columns. `adversarial` is set on each row and
+`jailbreak_source` names the transform. The result is a prompt corpus for
+`evaluation` and `sharding`.
+
+    python -m BELLS_leaderboard_mock_up.jailbreaks --output data/syntactic_jailbreaks.parquet
+"""
+import argparse
+import string
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from BELLS_leaderboard_mock_up.evaluation import load_prompts
+from BELLS_leaderboard_mock_up.verdicts import VerdictWriter, verdict_schema
+
+URL_SAFE = (string.ascii_letters + string.digits + '_.-~').encode()
+BASE64_ALPHABET = np.frombuffer((string.ascii_uppercase + string.ascii_lowercase + string.digits + '+/').encode(),
+                                dtype='uint8')
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype='uint8')
+LEET = {'a': '4', 'e': '3', 'i': '1', 'o': '0', 's': '5', 't': '7'}
+
+
+def _buffers(array):
+    """UTF-8 bytes of a string array and the offsets of its strings into them"""
+    array = pc.fill_null(array.cast(pa.large_string()), '')
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    offsets = np.frombuffer(array.buffers()[1], dtype='int64')[array.offset:array.offset + len(array) + 1]
+    data = np.frombuffer(array.buffers()[2], dtype='uint8') if array.buffers()[2] else np.zeros(0, 'uint8')
+    return offsets - offsets[0], data[offsets[0]:offsets[-1]]
+
+
+def _strings(offsets, data):
+    array = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(np.ascontiguousarray(offsets)),
+                                             pa.py_buffer(np.ascontiguousarray(data)))
+    return array.cast(pa.string())
+
+
+def _byte_table(mapping):
+    """Lookup table of a byte to byte mapping, other bytes unchanged"""
+    table = np.arange(256, dtype='uint8')
+    for source, target in mapping.items():
+        table[ord(source)] = ord(target)
+    return table
+
+
+def translate(mapping):
+    """Transform replacing characters by others, both ASCII, as in `mapping`"""
+    table = _byte_table(mapping)
+
+    def transform(array):
+        offsets, data = _buffers(array)
+        return _strings(offsets, table[data])
+    return transform
+
+
+def expand(encodings):
+    """Transform replacing each byte `b` by the bytes `encodings[b]`"""
+    width = max(len(encoding) for encoding in encodings)
+    table = np.array([list(encoding.ljust(width)) for encoding in encodings], dtype='uint8')
+    lengths = np.array([len(encoding) for encoding in encodings], dtype='int64')
+    used = np.arange(width) < lengths[:, None]
+
+    def transform(array):
+        offsets, data = _buffers(array)
+        # Fixed width encodings, then only their used bytes
+        encoded = table[data][used[data]]
+        return _strings(np.concatenate([[0], np.cumsum(lengths[data])])[offsets], encoded)
+    return transform
+
+
+def fixed_width(encode, width):
+    """Transform replacing each byte by `width` bytes, `encode(data)` of shape (len(data), width)"""
+    def transform(array):
+        offsets, data = _buffers(array)
+        return _strings(offsets * width, encode(data).ravel())
+    return transform
+
+
+def _hex(data):
+    return HEX_DIGITS[np.stack([data >> 4, data & 15], axis=1)]
+
+
+def _bits(data):
+    # 8 binary digits then a space
+    encoded = np.full((len(data), 9), ord(' '), dtype='uint8')
+    encoded[:, :8] = np.unpackbits(data[:, None], axis=1) + ord('0')
+    return encoded
+
+
+def base64(array):
+    offsets, data = _buffers(array)
+    lengths = np.diff(offsets)
+    groups = -(-lengths // 3)
+    padded = np.zeros(int(groups.sum()) * 3, dtype='uint8')
+    padded[np.arange(len(data)) + np.repeat(np.cumsum(groups * 3 - lengths) - (groups * 3 - lengths), lengths)] = data
+
+    b0, b1, b2 = padded[0::3], padded[1::3], padded[2::3]
+    encoded = np.empty((len(b0), 4), dtype='uint8')
+    encoded[:, 0] = b0 >> 2
+    encoded[:, 1] = (b0 & 3) << 4 | b1 >> 4
+    encoded[:, 2] = (b1 & 15) << 2 | b2 >> 6
+    encoded[:, 3] = b2 & 63
+    encoded = BASE64_ALPHABET[encoded.ravel()]
+
+    ends = np.cumsum(groups * 4)
+    encoded[ends[lengths % 3 == 1] - 2] = ord('=')
+    encoded[ends[lengths % 3 != 0] - 1] = ord('=')
+    return _strings(np.concatenate([[0], ends]), encoded)
+
+
+def remove(characters):
+    """Transform dropping the (ASCII) `characters`"""
+    dropped = np.zeros(256, dtype=bool)
+    dropped[list(characters.encode())] = True
+
+    def transform(array):
+        offsets, data = _buffers(array)
+        kept = ~dropped[data]
+        return _strings(np.concatenate([[0], np.cumsum(kept)])[offsets], data[kept])
+    return transform
+
+
+def _trim(transform):
+    """Drop the separator `transform` leaves after the last byte"""
+    return lambda array: pc.utf8_rtrim(transform(array), ' ')
+
+
+TRANSFORMS = {
+    'url_encoded': expand([bytes([b]) if b in URL_SAFE else f"%{b:02X}".encode() for b in range(256)]),
+    'uppercase': pc.utf8_upper,
+    'reverse': pc.utf8_reverse,
+    'disemvowel': remove('aeiouAEIOU'),
+    'base64': base64,
+    'rot13': translate(dict(zip(string.ascii_lowercase + string.ascii_uppercase,
+                                string.ascii_lowercase[13:] + string.ascii_lowercase[:13]
+                                + string.ascii_uppercase[13:] + string.ascii_uppercase[:13]))),
+    'binary': _trim(fixed_width(_bits, 9)),
+    'hex': fixed_width(_hex, 2),
+    'ascii': _trim(expand([f"{b} ".encode() for b in range(256)])),
+    'leet': translate({**LEET, **{source.upper(): target for source, target in LEET.items()}}),
+}
+
+
+def base_prompts(path=None):
+    """Non-adversarial prompts of a corpus (see `evaluation.load_prompts`)"""
+    prompts = load_prompts(path)
+    return prompts.filter(pc.invert(prompts.column('adversarial')))
+
+
+def generate(prompts, transforms=None, batch_size=4096):
+    """Record batches of the jailbreaks of `prompts`, one per transform and batch of prompts"""
+    names = list(transforms or TRANSFORMS)
+    unknown = set(names) - set(TRANSFORMS)
+    if unknown:
+        raise ValueError(f"Unknown transforms: {sorted(unknown)}")
+    sources = pa.array(names)
+    prompt_id = 0
+    for batch in prompts.to_batches(max_chunksize=batch_size):
+        questions = batch.column('question').cast(pa.string())
+        for index, name in enumerate(names):
+            rows = batch.num_rows
+            yield pa.RecordBatch.from_arrays([
+                pa.array(np.arange(prompt_id, prompt_id + rows, dtype='int64')),
+                TRANSFORMS[name](questions).dictionary_encode(),
+                batch.column('harm_level'),
+                batch.column('category'),
+                pa.array(np.ones(rows, dtype=bool)),
+                pa.DictionaryArray.from_arrays(pa.array(np.full(rows, index, dtype='int8')), sources),
+            ], schema=verdict_schema([]))
+            prompt_id += rows
+
+
+def write_corpus(path, prompts, transforms=None, batch_size=4096):
+    """Write the jailbreaks of `prompts` to a Parquet file, returns the number of rows written"""
+    with VerdictWriter(path, []) as writer:
+        for batch in generate(prompts, transforms, batch_size):
+            writer.write(batch)
+    return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the syntactic jailbreaks of the base prompts")
+    parser.add_argument('--prompts', default=None,
+                        help='Base corpus (.parquet) or prompt CSV, default: data/non_adversarial_prompts.csv')
+    parser.add_argument('--output', required=True, help='Parquet file to write')
+    parser.add_argument('--transforms', nargs='+', default=None, choices=list(TRANSFORMS),
+                        help='Transforms to apply, default: all')
+    parser.add_argument('--batch-size', type=int, default=4096, help='Base prompts per batch')
+    args = parser.parse_args()
+
+    prompts = base_prompts(args.prompts)
+    start = time.perf_counter()
+    rows = write_corpus(args.output, prompts, args.transforms, args.batch_size)
+    print(f"Wrote {rows} jailbreaks of {prompts.num_rows} prompts to {args.output} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
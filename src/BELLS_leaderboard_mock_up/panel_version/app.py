@@ -1,23 +1,341 @@
+import threading
+
 import panel as pn
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from pathlib import Path
 
-from recommender import recommendation_ui
-from playground import playground_ui
+from BELLS_leaderboard_mock_up.assets import asset_url, build_assets
+from BELLS_leaderboard_mock_up.datastore import dataset_digest, load_dataset
+
+# Plotly, numpy and the analysis engines are imported inside the functions
+# that use them, so that importing the app (and serving the first page) does
+# not pay for them
 
 # Enable Panel extensions
 pn.extension('plotly', 'tabulator')
 
-# Read the CSV file
+# Read the CSV file, shared read-only by all sessions of the process
 def load_data():
-    data_dir = Path(__file__).parent.parent.parent.parent / 'data'
-    df = pd.read_csv(data_dir / 'safeguard_evaluation_results.csv')
-    return df
+    return load_dataset('safeguard_evaluation_results.csv')
+
+# Figures are built on first use and cached per process, keyed by the
+# content hashes of the results and verdict patterns so they are rebuilt
+# when either CSV changes
+@pn.cache
+def bells_figure(data_version):
+    """BELLS score bar chart with simulated bootstrap intervals and probabilities of ranking first"""
+    import plotly.express as px
+    from BELLS_leaderboard_mock_up.bootstrap import error_bars, load_intervals
+    from BELLS_leaderboard_mock_up.ranks import load_ranks
+    df = load_data()
+    bars = error_bars(load_intervals())
+    ranks, _ = load_ranks(results='safeguard_evaluation_results.csv')
+    
+    # BELLS Score plot, labelled with the probability of ranking first
+    df_sorted = df.sort_values('BELLS_score', ascending=False).merge(
+        bars[bars['metric'] == 'BELLS_score'].drop(columns='metric'), on='safeguard', how='left').merge(
+        ranks[['safeguard', 'rank_1']], on='safeguard', how='left')
+    bells_plot = px.bar(df_sorted,
+                       x='safeguard',
+                       y='BELLS_score',
+                       error_y='plus',
+                       error_y_minus='minus',
+                       text=df_sorted['rank_1'].map(lambda p: f'P(#1) {p:.0%}'),
+                       title='BELLS Score by Safeguard (simulated 95% intervals and P(#1))')
+    bells_plot.update_traces(marker_color='rgb(55, 83, 109)', textposition='inside')
+    
+    return bells_plot
+
+@pn.cache
+def fp_figure(data_version):
+    """False positive rate scatter plot"""
+    import plotly.express as px
+    df = load_data()
+    
+    # False Positive Analysis
+    fp_plot = px.scatter(df, 
+                        x='benign_jailbreaks',
+                        y='benign_non-adversarial',
+                        text='safeguard',
+                        title='False Positive Rate Comparison',
+                        labels={
+                            'benign_jailbreaks': 'Benign Jailbreak Detection Rate',
+                            'benign_non-adversarial': 'False Positive Rate on Benign Prompts'
+                        })
+    fp_plot.update_traces(textposition='top center')
+    fp_plot.add_shape(type='line',
+                      x0=0, y0=0,
+                      x1=1, y1=1,
+                      line=dict(color='red', dash='dash'))
+    
+    return fp_plot
+
+@pn.cache
+def harm_figure(data_version):
+    """Harm category scores bar chart with simulated bootstrap intervals"""
+    import plotly.express as px
+    from BELLS_leaderboard_mock_up.bootstrap import error_bars, load_intervals
+    df = load_data()
+    bars = error_bars(load_intervals())
+    
+    # Harm Categories Analysis
+    harm_categories = ['Harassment/Discrimination', 'Malware/Hacking', 'Physical_harm', 
+                      'Privacy', 'Expert_advice', 'Government_decision_making']
+    
+    harm_data = df[['safeguard'] + harm_categories].melt(
+        id_vars=['safeguard'],
+        var_name='Category',
+        value_name='Score'
+    ).merge(bars.rename(columns={'metric': 'Category'}), on=['safeguard', 'Category'], how='left')
+    
+    harm_plot = px.bar(harm_data,
+                       x='safeguard',
+                       y='Score',
+                       error_y='plus',
+                       error_y_minus='minus',
+                       color='Category',
+                       title='Performance Across Harm Categories (simulated 95% intervals)',
+                       barmode='group')
+    
+    return harm_plot
+
+@pn.cache
+def performance_figure(data_version):
+    """p95 latency vs throughput scatter plot, sized by cost and colored by performance score"""
+    import plotly.express as px
+    df = load_data()
+    
+    # Free safeguards keep a visible marker
+    performance_plot = px.scatter(df.assign(marker_size=df['cost_per_1k_prompts'] + 0.1),
+                                  x='latency_p95_ms',
+                                  y='throughput_saturation',
+                                  size='marker_size',
+                                  color='performance_score',
+                                  text='safeguard',
+                                  log_x=True,
+                                  log_y=True,
+                                  range_color=[0, 1],
+                                  hover_data={'marker_size': False, 'cost_per_1k_prompts': ':.2f'},
+                                  title='Serving Performance (simulated)',
+                                  labels={
+                                      'latency_p95_ms': 'p95 Latency (ms)',
+                                      'throughput_saturation': 'Throughput at Saturation (prompts/s)',
+                                      'cost_per_1k_prompts': 'Cost per 1k Prompts ($)',
+                                      'performance_score': 'Performance Score'
+                                  })
+    performance_plot.update_traces(textposition='top center')
+    
+    return performance_plot
+
+def breakdown_figure(safeguard, rows, columns, harm_levels, prompts):
+    """Detection rate heatmap of one safeguard along two dimensions of the cube"""
+    import plotly.express as px
+    from BELLS_leaderboard_mock_up.cube import DIMENSION_LABELS, load_cube
+    selection = {'harm_level': harm_levels}
+    if prompts != 'All':
+        selection['adversarial'] = prompts == 'Adversarial'
+    breakdown = load_cube().slice(**selection).breakdown(rows, columns, safeguard) \
+        if harm_levels and rows != columns else None
+    if breakdown is None or breakdown.empty:
+        return pn.pane.Alert("No prompts in this selection.", alert_type='info')
+    breakdown_plot = px.imshow(breakdown, text_auto='.2f', aspect='auto', zmin=0, zmax=1,
+                               color_continuous_scale='RdYlGn',
+                               labels=dict(x=DIMENSION_LABELS[columns], y=DIMENSION_LABELS[rows],
+                                           color='Detection rate'),
+                               title=f'{safeguard} Detection Rate by {DIMENSION_LABELS[rows]} '
+                                     f'and {DIMENSION_LABELS[columns]}')
+    return pn.pane.Plotly(breakdown_plot)
+
+def breakdown_panel():
+    """Drill-down breakdown: a safeguard, two dimensions and a slice of the cube"""
+    from BELLS_leaderboard_mock_up.cube import DIMENSION_LABELS, load_cube
+    cube = load_cube()
+    options = {label: dimension for dimension, label in DIMENSION_LABELS.items()}
+    safeguard = pn.widgets.Select(name='Safeguard', options=cube.safeguards)
+    rows = pn.widgets.Select(name='Rows', options=options, value='category')
+    columns = pn.widgets.Select(name='Columns', options=options, value='jailbreak_source')
+    harm_levels = pn.widgets.MultiChoice(name='Harm levels', options=list(cube.levels['harm_level']),
+                                         value=list(cube.levels['harm_level']))
+    prompts = pn.widgets.RadioButtonGroup(name='Prompts', options=['All', 'Adversarial', 'Non-adversarial'])
+    return pn.Column(
+        pn.pane.Markdown("""
+        ### Drill-down Breakdown
+        Detection rates of one safeguard along any two dimensions of the evaluation, for example
+        harm category x jailbreak source, optionally restricted to some harm levels or to
+        adversarial / non-adversarial prompts.
+        """),
+        pn.Row(safeguard, rows, columns),
+        pn.Row(harm_levels, prompts),
+        pn.bind(breakdown_figure, safeguard, rows, columns, harm_levels, prompts),
+    )
+
+@pn.cache
+def score_table(data_version):
+    """Results table with its columns converted once for scoring formulas"""
+    from BELLS_leaderboard_mock_up.formulas import ScoreTable
+    return ScoreTable(load_data())
+
+def formula_ranking(expression):
+    """Safeguards ranked by a composite score formula"""
+    from BELLS_leaderboard_mock_up.formulas import FormulaError, compile_formula
+    df = load_data()
+    try:
+        formula = compile_formula(expression)
+        scores = score_table(dataset_digest('safeguard_evaluation_results.csv'))
+        order = scores.order(expression)
+    except FormulaError as error:
+        return pn.pane.Alert(f"Invalid formula: {error}", alert_type='warning')
+    ranking = df.iloc[order][['safeguard'] + formula.columns].assign(score=scores.scores(expression)[order])
+    return pn.widgets.Tabulator(ranking.reset_index(drop=True), show_index=False, disabled=True)
+
+def formula_panel():
+    """Leaderboard re-ranked by a composite score typed by the user"""
+    from BELLS_leaderboard_mock_up.formulas import FORMULAS
+    preset = pn.widgets.Select(name='Start from', options=list(FORMULAS))
+    expression = pn.widgets.TextInput(name='Formula', value=FORMULAS[preset.value], sizing_mode='stretch_width')
+    preset.param.watch(lambda event: setattr(expression, 'value', FORMULAS[event.new]), 'value')
+    columns = ', '.join(f'`{column}`' for column in load_data().columns if column != 'safeguard')
+    return pn.Column(
+        pn.pane.Markdown("""
+        ### Custom Score
+        Rank the safeguards by your own combination of the leaderboard columns, for example
+        `0.5 * BELLS_score + 0.3 * (1 - borderline_sensitivity) + 0.2 * performance_score`.
+        Formulas use `+ - * / ^`, parentheses and `min`, `max`, `mean`, `abs`, `sqrt`, `log`,
+        `clip(x, low, high)`; write column names containing other characters than letters, digits
+        and `_` between backticks. The `latency_*`, `throughput_saturation`, `cost_per_1k_prompts` and
+        `performance_score` columns are simulated (see Serving Performance).
+        """),
+        pn.Row(preset, expression),
+        pn.bind(formula_ranking, expression),
+        pn.Card(pn.pane.Markdown(columns), title='Available columns', collapsed=True),
+    )
+
+def significance_figure(slice_name):
+    """Pairwise McNemar test results of one slice"""
+    import numpy as np
+    import plotly.graph_objects as go
+    from BELLS_leaderboard_mock_up.significance import load_tests, pair_matrix, significance_matrix
+    tests = load_tests()
+    differences = pair_matrix(tests, slice_name, 'difference')
+    p_adjusted = pair_matrix(tests, slice_name, 'p_adjusted')
+    significance_plot = go.Figure(go.Heatmap(
+        z=significance_matrix(tests, slice_name).to_numpy(),
+        x=differences.columns, y=differences.index, zmin=-1, zmax=1,
+        colorscale=[[0, '#e03131'], [0.5, '#f1f3f5'], [1, '#2f9e44']], showscale=False,
+        text=np.where(np.eye(len(differences), dtype=bool), '',
+                      differences.map(lambda d: f'{d:+.1%}').to_numpy()), texttemplate='%{text}',
+        customdata=p_adjusted.to_numpy(),
+        hovertemplate='%{y} vs %{x}<br>Difference: %{text}<br>Adjusted p-value: %{customdata:.2g}<extra></extra>'))
+    significance_plot.update_layout(title=f'Pairwise McNemar Tests ({slice_name}, simulated)',
+                                    xaxis_title='Opponent', yaxis_title='Safeguard')
+    return pn.pane.Plotly(significance_plot)
+
+def significance_panel():
+    """Significance matrix of the simulated paired tests, per slice of the prompts"""
+    from BELLS_leaderboard_mock_up.significance import load_tests
+    slice_name = pn.widgets.Select(name='Slice', options=list(dict.fromkeys(load_tests()['slice'])))
+    return pn.Column(
+        pn.pane.Markdown("""
+        ### Pairwise Significance (simulated)
+        Every safeguard is evaluated on the same prompts, so each pair is compared with McNemar's test on
+        the prompts only one of the two flags. A cell is green when the row safeguard flags significantly
+        more prompts of the slice than the column one, red when it flags significantly fewer (5% level,
+        Holm correction over the pairs of the slice). Labels give the difference in detection rate.
+        """),
+        pn.pane.Alert("""
+        ⚠️ **Simulated**: the tests run on a synthetic verdict corpus with as many prompts per dataset as the
+        real evaluation, not on its per-prompt verdicts, which are not published. They do not compare the real
+        safeguards.
+        """, alert_type='warning'),
+        slice_name,
+        pn.bind(significance_figure, slice_name),
+    )
+
+def live_panel():
+    """Results of the verdict corpus, estimated while it is scanned in the background and pushed to the
+    page every second until exact"""
+    from BELLS_leaderboard_mock_up.online import live_table, load_online
+    aggregation = load_online()
+    progress = pn.indicators.Progress(value=0, max=100, sizing_mode='stretch_width')
+    status = pn.pane.Markdown("Scanning the verdict corpus...")
+    table = pn.widgets.Tabulator(pd.DataFrame(), show_index=False, disabled=True, sizing_mode='stretch_width')
+    shown = {'version': 0}
+
+    def update():
+        snapshot = aggregation.snapshot()
+        if snapshot is None or snapshot['version'] == shown['version']:
+            return
+        shown['version'] = snapshot['version']
+        progress.value = int(100 * snapshot['rows'] / max(snapshot['total_rows'], 1))
+        if snapshot['done']:
+            status.object = f"Exact: {snapshot['total_rows']:,} verdicts scanned in {snapshot['seconds']:.1f}s"
+            refresh.stop()
+        else:
+            status.object = (f"{snapshot['rows']:,} of {snapshot['total_rows']:,} verdicts scanned "
+                             f"({snapshot['blocks']} of {snapshot['total_blocks']} blocks)")
+        table.value = live_table(snapshot)
+
+    refresh = pn.state.add_periodic_callback(update, period=1000)
+    update()
+    return pn.Column(
+        pn.pane.Markdown("""
+        ### Live Results
+        Results of the full verdict corpus, estimated from the blocks of verdicts scanned so far in random
+        order, each with the half-width of its 95% confidence interval. The estimates refine as the scan goes
+        on and are exact once every block is scanned.
+        """),
+        progress,
+        status,
+        table,
+    )
+
+def lazy_tabs(*tabs, prewarm=None):
+    """pn.Tabs whose contents are built the first time they are activated.
+
+    `tabs` are (title, builder) pairs; only the first tab is built up front.
+    Once the session has loaded, the tab at index `prewarm` is built in the
+    background so it is ready when the user switches to it.
+    """
+    placeholders = [
+        pn.Column(pn.indicators.LoadingSpinner(value=True, size=50), sizing_mode='stretch_width')
+        for _ in tabs
+    ]
+    built = {}
+    lock = threading.Lock()
+
+    def build(index):
+        with lock:
+            if index not in built:
+                built[index] = tabs[index][1]()
+            return built[index]
+
+    def show(index):
+        placeholders[index][:] = [build(index)]
+
+    def on_active(event):
+        if not isinstance(placeholders[event.new][0], pn.indicators.LoadingSpinner):
+            return
+        show(event.new)
+
+    show(0)
+    # Only the active tab is rendered to Bokeh models
+    tabs_layout = pn.Tabs(*zip([title for title, _ in tabs], placeholders), dynamic=True)
+    tabs_layout.param.watch(on_active, 'active')
+    if prewarm is not None:
+        # Off the event loop when a thread pool is configured (serve.py --num-threads)
+        pn.state.onload(lambda: build(prewarm), threaded=bool(pn.config.nthreads))
+    return tabs_layout
 
 def create_leaderboard():
+    from BELLS_leaderboard_mock_up.online import VERDICTS
     df = load_data()
+    # The error bars follow the verdict patterns the intervals are bootstrapped from
+    data_version = (dataset_digest('safeguard_evaluation_results.csv'), dataset_digest('verdict_patterns.csv'))
+
+    # Resized image variants, served from the `assets` static route
+    # (panel serve app.py --static-dirs assets=../../../static/assets)
+    assets = pn.state.as_cached('assets', build_assets)
+    logo = asset_url(assets['logo_cesia_full.png']['variants']['webp']['2x'], 'assets')
     
     # Introduction text
     intro = pn.pane.Markdown("""
@@ -66,13 +384,11 @@ def create_leaderboard():
     - **[Prompt Guard](https://www.llama.com/docs/model-cards-and-prompt-formats/prompt-guard/)**: Specialized jailbreak detection system
     """)
     
-    # BELLS Score plot
-    df_sorted = df.sort_values('BELLS_score', ascending=False)
-    bells_plot = px.bar(df_sorted,
-                       x='safeguard',
-                       y='BELLS_score',
-                       title='BELLS Score by Safeguard')
-    bells_plot.update_traces(marker_color='rgb(55, 83, 109)')
+    # Cached plots
+    bells_plot = bells_figure(data_version)
+    fp_plot = fp_figure(data_version)
+    harm_plot = harm_figure(data_version)
+    performance_plot = performance_figure(data_version)
     
     # Analysis text
     bells_analysis = pn.pane.Markdown("""
@@ -83,22 +399,6 @@ def create_leaderboard():
     - Clear performance gap between top and bottom performers
     """)
     
-    # False Positive Analysis
-    fp_plot = px.scatter(df, 
-                        x='benign_jailbreaks',
-                        y='benign_non-adversarial',
-                        text='safeguard',
-                        title='False Positive Rate Comparison',
-                        labels={
-                            'benign_jailbreaks': 'Benign Jailbreak Detection Rate',
-                            'benign_non-adversarial': 'False Positive Rate on Benign Prompts'
-                        })
-    fp_plot.update_traces(textposition='top center')
-    fp_plot.add_shape(type='line',
-                      x0=0, y0=0,
-                      x1=1, y1=1,
-                      line=dict(color='red', dash='dash'))
-    
     fp_analysis = pn.pane.Markdown("""
     ### Analysis: False Positive Insights
     - Langkit & LLM Guard show lowest FPR on benign prompts (2%)
@@ -107,23 +407,6 @@ def create_leaderboard():
     - Lakera maintains good balance between metrics
     """)
     
-    # Harm Categories Analysis
-    harm_categories = ['Harassment/Discrimination', 'Malware/Hacking', 'Physical_harm', 
-                      'Privacy', 'Expert_advice', 'Government_decision_making']
-    
-    harm_data = df[['safeguard'] + harm_categories].melt(
-        id_vars=['safeguard'],
-        var_name='Category',
-        value_name='Score'
-    )
-    
-    harm_plot = px.bar(harm_data,
-                       x='safeguard',
-                       y='Score',
-                       color='Category',
-                       title='Performance Across Harm Categories',
-                       barmode='group')
-    
     harm_analysis = pn.pane.Markdown("""
     ### Analysis: Harm Category Breakdown
     - Malware/Hacking: Lakera leads with 98% detection
@@ -132,37 +415,72 @@ def create_leaderboard():
     - Privacy: challenging for all models (51-61%)
     """)
     
+    # Intervals bootstrapped from synthetic verdict patterns sized like the real datasets (bootstrap.py)
+    intervals_info = pn.pane.Alert("""
+    ⚠️ **Simulated error bars and P(#1)**: the 95% bootstrap intervals and the probabilities of ranking first
+    resample a synthetic verdict corpus with as many prompts per dataset as the real evaluation, not its
+    per-prompt verdicts, which are not published. The rank probabilities are centered on the scores of the
+    results table.
+    """, alert_type='warning')
+    
+    # Latency, throughput and cost measured by performance.py on the stub safeguards
+    performance_info = pn.pane.Alert("""
+    ⚠️ **Serving Performance (simulated)**: latency, throughput and cost are measured on offline stubs with
+    the latency, capacity and price profiles of `safeguards.STUB_PROFILES`, not on the real services.
+    """, alert_type='warning')
+    
     # Raw data table with tabulator
     raw_data = pn.widgets.Tabulator(df, pagination='remote', page_size=10)
     
+    leaderboard = pn.Column(
+        intro,
+        disclaimer,  # Add disclaimer
+        dataset_info,
+        safeguards_info,  # Add safeguards section
+        intervals_info,
+        pn.pane.Plotly(bells_plot),
+        *([live_panel()] if VERDICTS.exists() else []),
+        bells_analysis,
+        formula_panel(),
+        pn.pane.Plotly(fp_plot),
+        fp_analysis,
+        pn.pane.Plotly(harm_plot),
+        harm_analysis,
+        breakdown_panel(),
+        significance_panel(),
+        performance_info,
+        pn.pane.Plotly(performance_plot),
+        pn.pane.Markdown("### Raw Data\nThe latency, throughput, cost and performance_score columns are simulated."),
+        raw_data
+    )
+    
+    # Page modules are imported, and their tabs built, on first activation
+    def build_recommendation():
+        from recommender import recommendation_ui
+        return recommendation_ui()
+    
+    def build_playground():
+        from playground import playground_ui
+        return playground_ui()
+    
     # Create template
     template = pn.template.FastListTemplate(
         title='BELLS Leaderboard',
+        logo=logo,
         sidebar=[],
         main=[
-            pn.Tabs(
-                ('Leaderboard', pn.Column(
-                    intro,
-                    disclaimer,  # Add disclaimer
-                    dataset_info,
-                    safeguards_info,  # Add safeguards section
-                    pn.pane.Plotly(bells_plot),
-                    bells_analysis,
-                    pn.pane.Plotly(fp_plot),
-                    fp_analysis,
-                    pn.pane.Plotly(harm_plot),
-                    harm_analysis,
-                    pn.pane.Markdown("### Raw Data"),
-                    raw_data
-                )),
-                ('Recommendation', recommendation_ui()),
-                ('Playground', playground_ui())
+            lazy_tabs(
+                ('Leaderboard', lambda: leaderboard),
+                ('Recommendation', build_recommendation),
+                ('Playground', build_playground),
+                prewarm=1
             )
         ]
     )
     
     return template
 
-# Create and serve the application
-template = create_leaderboard()
-template.servable() 
\ No newline at end of file
+# Create and serve the application (only when run by `panel serve`)
+if __name__.startswith('bokeh'):
+    template = create_leaderboard()
+    template.servable() 
\ No newline at end of file
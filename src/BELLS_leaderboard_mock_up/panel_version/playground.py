@@ -3,43 +3,106 @@ import pandas as pd
 import random
 from pathlib import Path
 
+from BELLS_leaderboard_mock_up.datastore import dataset_digest, load_dataset
+from BELLS_leaderboard_mock_up.disagreement import FILTERS, load_index
+from BELLS_leaderboard_mock_up.jailbreak_store import BUILD_COMMAND, TABLES, has_store, load_store
+from BELLS_leaderboard_mock_up.similarity import NON_ADVERSARIAL, similar_prompts
+
+# Adversarial prompts rendered per update
+MAX_ADVERSARIAL_PROMPTS = 40
+# Prompts listed by "More like this"
+SIMILAR_PROMPTS = 10
+# Prompts listed by the disagreement explorer
+MAX_DISAGREEMENT_PROMPTS = 200
+# Prompts with one verdict column per safeguard, indexed by the disagreement explorer
+VERDICTS_DATASET = 'non_adversarial_prompts.csv'
+
+# Files the playground datasets are read from, and those of the optional jailbreak store
+DATASETS = ['safeguard_evaluation_results.csv', 'benign_non-adversarial.csv', 'borderline_non-adversarial.csv',
+            'harmful_non-adversarial.csv']
+STORE_FILES = [f'jailbreaks/{table}.csv' for table in TABLES]
+
 # Enable Panel extensions
 pn.extension('tabulator')
 
-def load_datasets():
-    """Load all datasets"""
-    data_dir = Path(__file__).parent.parent.parent.parent / 'data'
-    
+@pn.cache(max_items=1)
+def read_datasets(versions):
+    """Load the evaluation results and non-adversarial datasets, for the given content hashes of their files"""
     # Load evaluation results
-    evaluation_results = pd.read_csv(data_dir / 'safeguard_evaluation_results.csv')
+    evaluation_results = load_dataset('safeguard_evaluation_results.csv')
     
     # Load non-adversarial datasets
-    benign_prompts = pd.read_csv(data_dir / 'benign_non-adversarial.csv')
-    borderline_prompts = pd.read_csv(data_dir / 'borderline_non-adversarial.csv')
-    harmful_prompts = pd.read_csv(data_dir / 'harmful_non-adversarial.csv')
+    benign_prompts = load_dataset('benign_non-adversarial.csv')
+    borderline_prompts = load_dataset('borderline_non-adversarial.csv')
+    harmful_prompts = load_dataset('harmful_non-adversarial.csv')
     
-    # Load jailbreak datasets
-    benign_jailbreaks = pd.read_csv(data_dir / 'benign_jailbreaks.csv')
-    borderline_jailbreaks = pd.read_csv(data_dir / 'borderline_jailbreaks.csv')
-    harmful_jailbreaks = pd.read_csv(data_dir / 'harmful_jailbreaks.csv')
+    datasets = {
+        'Harmful': {
+            'Non-Adversarial': harmful_prompts
+        },
+        'Borderline': {
+            'Non-Adversarial': borderline_prompts
+        },
+        'Benign': {
+            'Non-Adversarial': benign_prompts
+        }
+    }
     
     return {
         'evaluation_results': evaluation_results,
-        'datasets': {
-            'Harmful': {
-                'Non-Adversarial': harmful_prompts,
-                'Adversarial': harmful_jailbreaks
-            },
-            'Borderline': {
-                'Non-Adversarial': borderline_prompts,
-                'Adversarial': borderline_jailbreaks
-            },
-            'Benign': {
-                'Non-Adversarial': benign_prompts,
-                'Adversarial': benign_jailbreaks
-            }
-        }
+        'datasets': datasets,
+        'index': build_index(datasets)
+    }
+
+@pn.cache(max_items=1)
+def read_jailbreaks(versions):
+    """Load the adversarial datasets of the jailbreak store, for the given content hashes of its files"""
+    # Labels of the factorized store, prompts rendered on display
+    jailbreak_store = load_store()
+    jailbreaks = jailbreak_store.view().rename(columns={'question': 'Goal', 'category': 'Category'})
+    datasets = {
+        harm_level: {'Adversarial': jailbreaks[jailbreaks['harm_level'] == harm_level.lower()]}
+        for harm_level in ['Harmful', 'Borderline', 'Benign']
     }
+    
+    return {
+        'datasets': datasets,
+        'jailbreak_store': jailbreak_store,
+        'index': build_index(datasets)
+    }
+
+def build_index(datasets):
+    """Precompute the category options and lower-cased search text of every dataset"""
+    index = {}
+    for harm_level, by_content_type in datasets.items():
+        for content_type, dataset in by_content_type.items():
+            index[(harm_level, content_type)] = {
+                'categories': (sorted(dataset['Category'].unique().tolist())
+                               if 'Category' in dataset.columns else []),
+                'search_text': dataset['Goal'].str.lower()
+            }
+    return index
+
+def load_datasets():
+    """Datasets and their indexes, shared by all sessions of the process and rebuilt when one of the files changes"""
+    return read_datasets(tuple(dataset_digest(name) for name in DATASETS))
+
+def load_jailbreaks():
+    """Adversarial datasets and their indexes, loaded on first use like `load_datasets`; None while the
+    jailbreak store has not been built"""
+    if not has_store():
+        return None
+    return read_jailbreaks(tuple(dataset_digest(name) for name in STORE_FILES))
+
+@pn.cache(max_items=1)
+def read_question_rows(version):
+    """{question: row} of the non-adversarial corpus of `similar_prompts`, for the given content hash of its file"""
+    questions = load_dataset(NON_ADVERSARIAL)['question'].astype(str)
+    return {question: row for row, question in enumerate(questions)}
+
+def question_rows():
+    """Rows of the non-adversarial questions, rebuilt like `load_datasets` when the file changes"""
+    return read_question_rows(dataset_digest(NON_ADVERSARIAL))
 
 def get_detection_probability(evaluation_results, safeguard_name, dataset_type, content_type):
     """Get detection probability based on dataset type and safeguard"""
@@ -93,23 +156,56 @@ def create_prompt_card(row, dataset_type, content_type, safeguard, evaluation_re
     # Category if available
     if 'Category' in row:
         card.append(pn.pane.Markdown(f"**Category:** `{row['Category']}`"))
+
+    # Most similar prompts of both corpora and their verdicts, on demand
+    adversarial = content_type == "Adversarial" and 'Jailbreak' in row
+    text = row['Jailbreak'] if adversarial else row['Goal']
+    if adversarial:
+        exclude = ('adversarial', row.name)
+    else:
+        rows = question_rows()
+        exclude = ('non_adversarial', rows[text]) if text in rows else None
+    similar = pn.Column(sizing_mode='stretch_width')
+    more_like_this = pn.widgets.Button(name='🔎 More like this', button_type='light')
+
+    def show_similar(event):
+        results = similar_prompts(text, k=SIMILAR_PROMPTS, exclude=exclude)
+        similar[:] = [pn.widgets.Tabulator(results.drop(columns=['row', 'question'], errors='ignore'),
+                                           show_index=False, disabled=True, sizing_mode='stretch_width')]
+    more_like_this.on_click(show_similar)
+    card.extend([more_like_this, similar])
     
     card.append(pn.pane.Markdown("---"))
     return card
 
-def update_display(harm_level, content_type, safeguard, search_query, category_filter, datasets, evaluation_results):
-    """Update the display based on current selections"""
-    current_dataset = datasets[harm_level][content_type]
+def filter_dataset(dataset, search_text, search_query, category_filter, jailbreak_store=None):
+    """Rows of a dataset matching the category filter and the search query.
+
+    With `jailbreak_store`, the rows are those of the store and the query
+    also searches their jailbreak prompts.
+    """
+    mask = pd.Series(True, index=dataset.index)
     
     # Apply category filter
-    if category_filter != 'All' and 'Category' in current_dataset.columns:
-        current_dataset = current_dataset[current_dataset['Category'] == category_filter]
+    if category_filter != 'All' and 'Category' in dataset.columns:
+        mask &= dataset['Category'] == category_filter
     
-    # Apply search filter
+    # Apply search filter on the precomputed lower-cased text
     if search_query:
-        current_dataset = current_dataset[
-            current_dataset['Goal'].str.contains(search_query, case=False, na=False)
-        ]
+        matches = search_text.str.contains(search_query.lower(), regex=False).fillna(False)
+        if jailbreak_store is not None:
+            matches |= jailbreak_store.search(search_query)[dataset.index]
+        mask &= matches
+    
+    return dataset[mask]
+
+def update_display(harm_level, content_type, safeguard, search_query, category_filter, datasets, evaluation_results, index,
+                   jailbreak_store=None):
+    """Update the display based on current selections"""
+    jailbreak_store = jailbreak_store if content_type == 'Adversarial' else None
+    current_dataset = filter_dataset(datasets[harm_level][content_type],
+                                     index[(harm_level, content_type)]['search_text'],
+                                     search_query, category_filter, jailbreak_store)
     
     # Calculate statistics
     total_count = len(current_dataset)
@@ -136,7 +232,7 @@ def update_display(harm_level, content_type, safeguard, search_query, category_f
             stats_grid.append(
                 pn.indicators.Number(
                     name=name,
-                    value=count/total_count*100,
+                    value=count/max(total_count, 1)*100,
                     format='{value:.1f}%',
                     font_size='24px'
                 )
@@ -160,25 +256,85 @@ def update_display(harm_level, content_type, safeguard, search_query, category_f
             ),
             pn.indicators.Number(
                 name='Detection Rate',
-                value=detected_count/total_count*100,
+                value=detected_count/max(total_count, 1)*100,
                 format='{value:.1f}%',
                 font_size='24px'
             )
         )
         stats.append(stats_row)
     
-    # Create cards for each prompt
+    # Create cards for each prompt, rendering the jailbreaks of a sample only
+    if jailbreak_store is not None:
+        current_dataset = current_dataset.sample(n=min(total_count, MAX_ADVERSARIAL_PROMPTS))
+        current_dataset = current_dataset.assign(Jailbreak=jailbreak_store.render(current_dataset.index))
     cards = pn.Column()
     for _, row in current_dataset.iterrows():
         cards.append(create_prompt_card(row, harm_level, content_type, safeguard, evaluation_results))
     
     return pn.Column(stats, cards)
 
+def disagreement_view(harm_level, filter_name, safeguard, other):
+    """Prompts of a harm level matching a disagreement filter, with the index's summaries over that harm level"""
+    index = load_index(VERDICTS_DATASET)
+    prompts = load_dataset(VERDICTS_DATASET)
+    level = index.pack((prompts['harm_level'] == harm_level.lower()).fillna(False).to_numpy(dtype=bool))
+    rows = index.rows(index.query(filter_name, safeguard, other) & level)
+    matches = prompts.iloc[rows[:MAX_DISAGREEMENT_PROMPTS]][['question', 'category'] + index.safeguards]
+    shown = f", the first {MAX_DISAGREEMENT_PROMPTS} are listed" if len(rows) > MAX_DISAGREEMENT_PROMPTS else ""
+    return pn.Column(
+        pn.pane.Markdown(f"**{len(rows)}** of {index.count(level)} {harm_level.lower()} prompts match{shown}."),
+        pn.widgets.Tabulator(matches.reset_index(drop=True), show_index=False, disabled=True, pagination='local',
+                             page_size=10, sizing_mode='stretch_width'),
+        pn.Row(
+            pn.Column(pn.pane.Markdown("**Unique catches and misses** (flagged or missed by this safeguard only)"),
+                      pn.widgets.Tabulator(index.summary(level), show_index=False, disabled=True)),
+            pn.Column(pn.pane.Markdown("**Pairwise disagreements** (prompts flagged by one safeguard of the pair)"),
+                      pn.widgets.Tabulator(index.pair_matrix(level), disabled=True)),
+            pn.Column(pn.pane.Markdown("**Agreement levels** (prompts by number of safeguards flagging them)"),
+                      pn.widgets.Tabulator(index.agreement_levels(level).reset_index(), show_index=False,
+                                           disabled=True)),
+        ),
+        sizing_mode='stretch_width'
+    )
+
+def disagreement_panel(harm_level):
+    """Explorer of the prompts on which the safeguards disagree, following the `harm_level` widget"""
+    safeguards = load_index(VERDICTS_DATASET).safeguards
+    filter_name = pn.widgets.Select(name='Disagreement', options={label: name for name, (label, _) in FILTERS.items()},
+                                    value='disagree')
+    safeguard = pn.widgets.Select(name='Safeguard', options=safeguards, visible=False)
+    other = pn.widgets.Select(name='Other Safeguard', options=safeguards[1:], visible=False)
+
+    def update_widgets(event=None):
+        arity = FILTERS[filter_name.value][1]
+        safeguard.visible = arity >= 1
+        other.visible = arity == 2
+        other.options = [name for name in safeguards if name != safeguard.value]
+
+    filter_name.param.watch(update_widgets, 'value')
+    safeguard.param.watch(update_widgets, 'value')
+    update_widgets()
+
+    view = pn.bind(lambda level, name, first, second: disagreement_view(
+        level, name, first, second if FILTERS[name][1] == 2 else None), harm_level, filter_name, safeguard, other)
+    return pn.Card(
+        pn.pane.Markdown(f"""
+        Prompts of `{VERDICTS_DATASET}` on which the safeguards disagree, from the real verdicts of every
+        safeguard (packed into bitsets, so every filter is a few bitwise operations).
+        """),
+        pn.Row(filter_name, safeguard, other),
+        view,
+        title='🔀 Safeguard Disagreements',
+        collapsed=True,
+        sizing_mode='stretch_width'
+    )
+
 def playground_ui():
     # Load all datasets at the start
     all_data = load_datasets()
     datasets = all_data['datasets']
     evaluation_results = all_data['evaluation_results']
+    index = all_data['index']
     
     # Title and introduction
     title = pn.pane.Markdown("""
@@ -210,9 +366,11 @@ def playground_ui():
         button_type='success'
     )
     
+    # Adversarial prompts are only offered when the jailbreak store has been built
+    store_built = has_store()
     content_type = pn.widgets.RadioButtonGroup(
         name='Content Type',
-        options=['Non-Adversarial', 'Adversarial'],
+        options=['Non-Adversarial'] + (['Adversarial'] if store_built else []),
         value='Non-Adversarial',
         button_type='primary'
     )
@@ -245,14 +403,34 @@ def playground_ui():
         - [Harmful Adversarial Dataset](https://github.com/brash6/BELLS_leaderboard_mock_up/blob/main/data/harmful_jailbreaks.csv)
     """, alert_type='warning')
     
+    store_alert = pn.pane.Alert(f"""
+        The adversarial prompts are read from the jailbreak store in `data/jailbreaks/`, which has not
+        been built yet. Build it with:
+
+        ```bash
+        {BUILD_COMMAND}
+        ```
+    """, alert_type='info', visible=not store_built)
+    
     # Dynamic display area
     display_area = pn.Column()
     
     def update(event=None):
+        # The jailbreak store is loaded the first time adversarial prompts are shown
+        current_datasets, current_index, jailbreak_store = datasets, index, None
+        if content_type.value == 'Adversarial':
+            jailbreaks = load_jailbreaks()
+            if jailbreaks is None:
+                store_alert.visible = True
+                display_area[:] = []
+                return
+            current_datasets, current_index = jailbreaks['datasets'], jailbreaks['index']
+            jailbreak_store = jailbreaks['jailbreak_store']
+        
         # Update category options based on current dataset
-        current_dataset = datasets[harm_level.value][content_type.value]
+        current_dataset = current_datasets[harm_level.value][content_type.value]
         if 'Category' in current_dataset.columns:
-            category_filter.options = ['All'] + sorted(current_dataset['Category'].unique().tolist())
+            category_filter.options = ['All'] + current_index[(harm_level.value, content_type.value)]['categories']
         
         # Update jailbreak alert visibility
         jailbreak_alert.visible = content_type.value == 'Adversarial'
@@ -264,8 +442,10 @@ def playground_ui():
             safeguard.value,
             search.value,
             category_filter.value,
-            datasets,
-            evaluation_results
+            current_datasets,
+            evaluation_results,
+            current_index,
+            jailbreak_store
         )]
     
     # Set up event handlers
@@ -293,6 +473,8 @@ def playground_ui():
         controls,
         search,
         jailbreak_alert,
+        store_alert,
+        disagreement_panel(harm_level),
         display_area,
         sizing_mode='stretch_width'
     ) 
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""Serve the Panel app with warm, process-wide shared state.
+
+    python serve.py --port 5006 --num-procs 4 --num-threads 8
+
+Before the server accepts sessions, every dataset is loaded once into
+`pn.state.cache` together with the playground indexes, the roll-ups of the
+breakdown cube, the bootstrap intervals, rank probabilities and pairwise
+tests and the image assets, and one throwaway session is rendered
+so imports and templates are warm.
+New sessions then only build their own widgets.
+
+Settings:
+- `--num-procs N` forks N worker processes sharing the listening socket
+  (Unix only, 0 = one per core). Data is warmed before forking, so workers
+  share the loaded datasets copy-on-write instead of each reading the CSVs.
+  Behind a load balancer spanning several hosts, use sticky sessions: a
+  session lives in the process that created it.
+- `--num-threads N` runs session callbacks on a pool of N threads
+  (`pn.config.nthreads`), so a slow callback in one session does not block
+  the others sharing the process. The shared datasets are read-only, which
+  makes them safe to use from several threads.
+- `--allow-websocket-origin` is required when the app is reached through a
+  host name other than localhost.
+"""
+import argparse
+
+import panel as pn
+
+from BELLS_leaderboard_mock_up.assets import STATIC_DIR, build_assets
+from BELLS_leaderboard_mock_up.bootstrap import load_intervals
+from BELLS_leaderboard_mock_up.cube import load_cube
+from BELLS_leaderboard_mock_up.datastore import load_dataset
+from BELLS_leaderboard_mock_up.ranks import load_ranks
+from BELLS_leaderboard_mock_up.significance import load_tests
+from BELLS_leaderboard_mock_up.similarity import load_similarity
+
+from app import create_leaderboard
+from playground import load_datasets, load_jailbreaks
+
+
+def warm():
+    """Load the shared datasets, indexes and assets into pn.state.cache"""
+    load_datasets()
+    # Skipped while the jailbreak store (data/jailbreaks/) has not been built
+    load_jailbreaks()
+    load_dataset('safeguard_evaluation_results.csv')
+    load_dataset('borderline_non-adversarial.csv')
+    load_cube()
+    load_intervals()
+    load_ranks(results='safeguard_evaluation_results.csv')
+    load_tests()
+    load_similarity()
+    pn.state.as_cached('assets', build_assets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the BELLS Panel leaderboard")
+    parser.add_argument('--port', type=int, default=5006)
+    parser.add_argument('--address', default=None, help='Address to listen on (default: all)')
+    parser.add_argument('--num-procs', type=int, default=1,
+                        help='Number of worker processes, 0 for one per core')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Threads per process used to run session callbacks')
+    parser.add_argument('--allow-websocket-origin', action='append', default=None,
+                        help='Host(s) allowed to open websocket connections')
+    parser.add_argument('--show', action='store_true', help='Open the app in a browser')
+    args = parser.parse_args()
+
+    if args.num_threads:
+        pn.config.nthreads = args.num_threads
+
+    warm()
+
+    pn.serve(
+        {'/': create_leaderboard},
+        port=args.port,
+        address=args.address,
+        num_procs=args.num_procs,
+        websocket_origin=args.allow_websocket_origin,
+        static_dirs={'assets': str(STATIC_DIR)},
+        title='BELLS Leaderboard',
+        warm=True,
+        show=args.show
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Latency, throughput and cost of each safeguard, as leaderboard columns.
+
+Prompts of a corpus are replayed against one safeguard at a time by a
+closed loop of `concurrency` clients, each sending its next batch as soon as
+the previous one is answered, for `duration` seconds and at least
+`min_calls` calls. The concurrency doubles until throughput stops
+growing (less than 10% gain): the safeguard is saturated. Recorded, per
+safeguard:
+
+- `latency_p50_ms`, `latency_p95_ms`, `latency_p99_ms`: call latency without
+  load (one client)
+- `throughput_saturation`: prompts per second at saturation
+- `cost_per_1k_prompts`: dollars, from the safeguard's `cost`
+- `performance_score`: geometric mean of the throughput relative to the best
+  safeguard and of the fastest p95 latency relative to the safeguard's, in
+  [0, 1]; used by the recommenders to weigh the expected request volume
+
+The columns are merged into the results table by safeguard name.
+
+    python -m BELLS_leaderboard_mock_up.performance --results data/safeguard_evaluation_results.csv
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR
+from BELLS_leaderboard_mock_up.evaluation import load_prompts
+from BELLS_leaderboard_mock_up.safeguards import stub_safeguards
+
+PERFORMANCE_COLUMNS = ['latency_p50_ms', 'latency_p95_ms', 'latency_p99_ms', 'throughput_saturation',
+                       'cost_per_1k_prompts', 'performance_score']
+
+# Relative throughput gain below which the safeguard is considered saturated
+SATURATION_GAIN = 0.1
+
+
+async def measure_level(safeguard, texts, concurrency, duration, batch_size, min_calls):
+    """Latencies, prompts answered and cost of `concurrency` clients over `duration` seconds"""
+    batches = itertools.cycle(range(0, len(texts), batch_size))
+    latencies = []
+    answered = 0
+    cost = 0.0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal answered, cost
+        while time.perf_counter() < deadline or len(latencies) < min_calls:
+            start = next(batches)
+            batch = texts[start:start + batch_size]
+            sent = time.perf_counter()
+            await safeguard.classify(batch)
+            latencies.append(time.perf_counter() - sent)
+            answered += len(batch)
+            cost += safeguard.cost(batch)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {'concurrency': concurrency, 'latencies': np.array(latencies), 'throughput': answered / elapsed,
+            'cost_per_1k_prompts': 1000 * cost / max(answered, 1)}
+
+
+async def measure_safeguard(safeguard, texts, duration=1.0, batch_size=1, min_calls=20, max_concurrency=256):
+    """Measurements at doubling concurrency, until saturation"""
+    levels = []
+    concurrency = 1
+    while concurrency <= max_concurrency:
+        level = await measure_level(safeguard, texts, concurrency, duration, batch_size, min_calls)
+        levels.append(level)
+        if len(levels) > 1 and level['throughput'] < levels[-2]['throughput'] * (1 + SATURATION_GAIN):
+            break
+        concurrency *= 2
+    return levels
+
+
+def summarize(levels):
+    """Leaderboard columns (but the score) of one safeguard's measurements"""
+    unloaded = levels[0]['latencies'] * 1e3
+    return {
+        'latency_p50_ms': np.percentile(unloaded, 50),
+        'latency_p95_ms': np.percentile(unloaded, 95),
+        'latency_p99_ms': np.percentile(unloaded, 99),
+        'throughput_saturation': max(level['throughput'] for level in levels),
+        'cost_per_1k_prompts': levels[0]['cost_per_1k_prompts'],
+    }
+
+
+def performance_table(measurements):
+    """Performance columns of every safeguard, from {name: levels}"""
+    table = pd.DataFrame({name: summarize(levels) for name, levels in measurements.items()}).T
+    table['performance_score'] = np.sqrt(
+        table['throughput_saturation'] / table['throughput_saturation'].max()
+        * table['latency_p95_ms'].min() / table['latency_p95_ms'])
+    table.index.name = 'safeguard'
+    return table
+
+
+def merge_results(results, performance):
+    """Results table with the performance columns replaced by (or added from) `performance`"""
+    results = results.drop(columns=[c for c in PERFORMANCE_COLUMNS if c in results.columns])
+    return results.merge(performance.reset_index(), on='safeguard', how='left')
+
+
+async def measure_all(safeguards, texts, report=print, **options):
+    measurements = {}
+    for safeguard in safeguards:
+        measurements[safeguard.name] = levels = await measure_safeguard(safeguard, texts, **options)
+        if report:
+            curve = ', '.join(f"{level['concurrency']}: {level['throughput']:.0f}/s" for level in levels)
+            report(f"{safeguard.name:>14}: p50 {np.percentile(levels[0]['latencies'], 50) * 1e3:.1f} ms, "
+                   f"throughput by concurrency {curve}")
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the latency, throughput and cost of the (stub) safeguards")
+    parser.add_argument('--prompts', default=None,
+                        help='Verdict corpus (.parquet) or prompt CSV, default: data/non_adversarial_prompts.csv')
+    parser.add_argument('--duration', type=float, default=1.0, help='Seconds per concurrency level')
+    parser.add_argument('--min-calls', type=int, default=20, help='Minimum calls per concurrency level')
+    parser.add_argument('--batch-size', type=int, default=1, help='Prompts per call')
+    parser.add_argument('--max-concurrency', type=int, default=256, help='Highest concurrency tried')
+    parser.add_argument('--results', default=str(DATA_DIR / 'safeguard_evaluation_results.csv'),
+                        help='Results table to add the performance columns to')
+    parser.add_argument('--output', default=None, help='Also write the measurements per level (JSON)')
+    args = parser.parse_args()
+
+    texts = load_prompts(args.prompts).column('question').to_pylist()
+    safeguards = stub_safeguards(profiles=True)
+    measurements = asyncio.run(measure_all(safeguards, texts, duration=args.duration, batch_size=args.batch_size,
+                                           min_calls=args.min_calls, max_concurrency=args.max_concurrency))
+    performance = performance_table(measurements)
+    print(performance.round(3).to_string())
+
+    # round_trip: the other columns are written back unchanged
+    results = pd.read_csv(args.results, float_precision='round_trip')
+    missing = set(results['safeguard']) - set(performance.index)
+    if missing:
+        print(f"No measurements for {sorted(missing)}, their performance columns are left empty")
+    merge_results(results, performance.round(4)).to_csv(args.results, index=False)
+    print(f"Performance columns written to {args.results}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({name: [{'concurrency': level['concurrency'], 'throughput': level['throughput'],
+                               'latency_p50_ms': np.percentile(level['latencies'], 50) * 1e3,
+                               'latency_p95_ms': np.percentile(level['latencies'], 95) * 1e3}
+                              for level in levels]
+                       for name, levels in measurements.items()}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Rank stability of the leaderboard under resampling of the prompts.
+
+The leaderboards order the safeguards by their BELLS score, but close scores
+can swap places with a slightly different set of prompts. Using the
+bootstrap replicates of `bootstrap.Bootstrap` (every safeguard scored on the
+same resampled prompts), each replicate is re-ranked and
+`rank_stability` gives:
+
+- the rank distribution: P(rank = k) of every safeguard, `rank_1` being
+  the probability of being #1
+- the win probabilities: P(row safeguard scores above column safeguard),
+  ties counting half
+
+Ranks are competition ranks (1 + the number of safeguards scoring strictly
+higher), so tied safeguards share a rank. Both follow from one
+(replicates x safeguards x safeguards) comparison, chunked over the
+replicates; the replicates themselves are drawn in the bootstrap's process
+pool.
+
+The leaderboards rank by the scores of the results table, which the
+committed patterns only stand in for. Given a results table, the replicates
+are shifted to be centered on its scores: the ranking keeps the table's
+point estimates and takes the sampling spread of the patterns
+(`data/rank_probabilities.csv`, read by the HTML leaderboard). That spread is
+the one of a synthetic corpus sized like the real datasets (see
+`bootstrap`), so the probabilities are simulated, and labelled so by the apps. Results are
+cached per patterns and results digest next to the bootstrap intervals, in
+`data/bootstrap/`.
+
+    python -m BELLS_leaderboard_mock_up.ranks --results data/safeguard_evaluation_results.csv \
+        --output data/rank_probabilities.csv
+"""
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from BELLS_leaderboard_mock_up.bootstrap import Bootstrap
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR, dataset_digest, load_dataset
+
+CHUNK_SIZE = 1024
+
+
+def rank_counts(scores):
+    """Counts of every rank per safeguard (safeguards, ranks) and of wins per pair (safeguards, safeguards).
+
+    `scores` is (replicates, safeguards), higher is better; NaN scores rank last.
+    """
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    size = scores.shape[1]
+    ranks = np.zeros((size, size), dtype='int64')
+    wins = np.zeros((size, size), dtype='float64')
+    for start in range(0, len(scores), CHUNK_SIZE):
+        chunk = scores[start:start + CHUNK_SIZE]
+        # above[r, i, j]: safeguard i scores above safeguard j in replicate r
+        above = chunk[:, :, None] > chunk[:, None, :]
+        ties = chunk[:, :, None] == chunk[:, None, :]
+        wins += above.sum(axis=0) + 0.5 * (ties.sum(axis=0) - np.eye(size))
+        rank = above.sum(axis=1)  # safeguards above each one, i.e. its rank - 1
+        ranks += np.stack([np.bincount(column, minlength=size) for column in rank.T])
+    return ranks, wins
+
+
+def rank_stability(bootstrap, metric='BELLS_score', replicates=10000, centers=None, seed=0, workers=None):
+    """Rank distribution and win probabilities of `bootstrap`'s safeguards on `metric`.
+
+    `centers` ({safeguard: score}, e.g. a results table column) shifts the
+    replicates of the safeguards it has to be centered on their score. The
+    rank distribution is ordered by estimated score and has the `estimate`
+    and `expected_rank` of every safeguard as first columns.
+    """
+    column = bootstrap.metrics.index(metric)
+    estimates = bootstrap.estimates()[:, column]
+    samples = bootstrap.replicates(replicates, seed, workers)[:, :, column]
+    if centers is not None:
+        centers = pd.Series(centers, dtype='float64').reindex(bootstrap.safeguards).fillna(
+            pd.Series(estimates, index=bootstrap.safeguards)).to_numpy()
+        samples, estimates = samples + (centers - estimates), centers
+    ranks, wins = rank_counts(samples)
+    index = pd.Index(bootstrap.safeguards, name='safeguard')
+    distribution = pd.DataFrame(ranks / max(replicates, 1), index=index,
+                                columns=[f'rank_{k}' for k in range(1, len(index) + 1)])
+    distribution.insert(0, 'expected_rank', distribution.to_numpy() @ np.arange(1, len(index) + 1))
+    distribution.insert(0, 'estimate', estimates)
+    order = distribution.sort_values(['estimate', 'expected_rank'], ascending=[False, True]).index
+    wins = pd.DataFrame(wins / max(replicates, 1), index=index, columns=index).loc[order, order]
+    wins.columns.name = 'opponent'
+    return distribution.loc[order].reset_index(), wins
+
+
+_ranks = {}
+_lock = threading.Lock()
+
+
+def load_ranks(name='verdict_patterns.csv', metric='BELLS_score', replicates=10000, results=None,
+               data_dir=DATA_DIR, cache_dir=None, workers=1):
+    """`rank_stability` of the verdict patterns `data/<name>`, centered on the `metric` column of
+    `data/<results>` if given, cached in memory and on disk per content digest; in process by default,
+    as `bootstrap.load_intervals`"""
+    digests = [dataset_digest(name, data_dir)[:16]]
+    if results is not None:
+        digests.append(dataset_digest(results, data_dir)[:16])
+    cache_dir = Path(cache_dir or Path(data_dir) / 'bootstrap')
+    stem = f"{Path(name).stem}-{'-'.join(digests)}-{metric}-{replicates}"
+    paths = cache_dir / f"{stem}-ranks.csv", cache_dir / f"{stem}-wins.csv"
+    with _lock:
+        if paths not in _ranks:
+            if all(path.exists() for path in paths):
+                _ranks[paths] = pd.read_csv(paths[0]), pd.read_csv(paths[1], index_col='safeguard')
+            else:
+                centers = None
+                if results is not None:
+                    table = load_dataset(results, data_dir)
+                    centers = dict(zip(table['safeguard'], table[metric].astype('float64')))
+                distribution, wins = rank_stability(Bootstrap(load_dataset(name, data_dir)), metric, replicates,
+                                                    centers, workers=workers)
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                distribution.to_csv(paths[0], index=False)
+                wins.to_csv(paths[1])
+                _ranks[paths] = distribution, wins
+        return _ranks[paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank distribution of the safeguards under bootstrap resampling")
+    parser.add_argument('--patterns', default=str(DATA_DIR / 'verdict_patterns.csv'),
+                        help='Verdict patterns CSV (see BELLS_leaderboard_mock_up.bootstrap)')
+    parser.add_argument('--metric', default='BELLS_score', help='Metric the safeguards are ranked by')
+    parser.add_argument('--results', default=None,
+                        help='Results table CSV whose metric column the replicates are centered on')
+    parser.add_argument('--replicates', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='CSV of the rank distribution')
+    parser.add_argument('--wins-output', default=None, help='CSV of the pairwise win probabilities')
+    args = parser.parse_args()
+
+    bootstrap = Bootstrap(pd.read_csv(args.patterns))
+    centers = None
+    if args.results:
+        table = pd.read_csv(args.results)
+        centers = dict(zip(table['safeguard'], table[args.metric]))
+    start = time.perf_counter()
+    distribution, wins = rank_stability(bootstrap, args.metric, args.replicates, centers, args.seed, args.workers)
+    print(f"{args.replicates} replicates x {len(bootstrap.safeguards)} safeguards ranked "
+          f"in {time.perf_counter() - start:.1f}s")
+    if args.output:
+        distribution.to_csv(args.output, index=False)
+    if args.wins_output:
+        wins.to_csv(args.wins_output)
+    print(distribution.round(3).to_string(index=False))
+    print()
+    print(wins.round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
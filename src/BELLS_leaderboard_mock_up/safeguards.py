@@ -0,0 +1,191 @@
+"""Safeguards the evaluation runner can query.
+
+A safeguard classifies a batch of texts at once: `classify(texts)` returns
+one verdict (bool) or score (float in [0, 1]) per text, a text is flagged
+when its score reaches the safeguard's `threshold`. The scheduling
+attributes tell the runner how the safeguard may be called:
+
+- `batch_size`: texts per `classify` call
+- `max_concurrency`: calls in flight at once
+- `rate_limit`: calls per second (None: unlimited), `burst` calls at once
+
+A call that fails transiently (timeout, rate limit, server error) raises
+`SafeguardError` or `TimeoutError` and is retried by the runner. `cost(texts)`
+is the price of a call, in dollars.
+
+The stub safeguards below run offline, so the whole evaluation pipeline can
+be exercised without API keys: `latency` simulates the round trip of a
+remote API (with log-normal `jitter`), `capacity` the calls its server
+handles at once, `failure_rate` the share of calls failing transiently.
+`STUB_PROFILES` gives each stub the latency, capacity and price of the kind
+of safeguard it stands for.
+"""
+import asyncio
+import hashlib
+import random
+import re
+
+import numpy as np
+
+
+class SafeguardError(Exception):
+    """Transient failure of a safeguard call, the call is retried"""
+
+
+class Safeguard:
+    name = None
+    version = '1'
+    threshold = 0.5
+    batch_size = 32
+    max_concurrency = 4
+    rate_limit = None
+    burst = 1
+
+    def config(self):
+        """Settings that change the verdicts, along with `name` and `version`"""
+        return {'threshold': self.threshold}
+
+    async def classify(self, texts):
+        raise NotImplementedError
+
+    def cost(self, texts):
+        return 0.0
+
+
+class StubSafeguard(Safeguard):
+    """Offline safeguard: `predict` runs after a simulated API round trip"""
+
+    def __init__(self, name, latency=0.0, jitter=0.0, capacity=None, price_per_1k_prompts=0.0,
+                 failure_rate=0.0, batch_size=32, max_concurrency=4, rate_limit=None, burst=1, seed=0):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.capacity = capacity
+        self.price_per_1k_prompts = price_per_1k_prompts
+        self.failure_rate = failure_rate
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self._random = random.Random(f"{name}/{seed}")
+        self._server = None
+
+    def config(self):
+        return {**super().config(), **self._config()}
+
+    def _config(self):
+        return {}
+
+    def predict(self, texts):
+        raise NotImplementedError
+
+    def cost(self, texts):
+        return len(texts) * self.price_per_1k_prompts / 1000
+
+    async def _round_trip(self):
+        latency = self.latency * (self._random.lognormvariate(0, self.jitter) if self.jitter else 1)
+        await asyncio.sleep(latency)
+
+    async def classify(self, texts):
+        if self.capacity:
+            # Calls beyond the capacity queue, as on a saturated server
+            if self._server is None or self._server[0] is not asyncio.get_running_loop():
+                self._server = (asyncio.get_running_loop(), asyncio.Semaphore(self.capacity))
+            async with self._server[1]:
+                await self._round_trip()
+        elif self.latency:
+            await self._round_trip()
+        if self._random.random() < self.failure_rate:
+            raise SafeguardError(f"{self.name}: simulated transient failure")
+        return self.predict(texts)
+
+
+class RegexSafeguard(StubSafeguard):
+    """Flags texts matching any of `patterns` (case-insensitive)"""
+
+    def __init__(self, name, patterns, **options):
+        super().__init__(name, **options)
+        self.patterns = list(patterns)
+        self._pattern = re.compile('|'.join(f"(?:{p})" for p in self.patterns), re.IGNORECASE)
+
+    def _config(self):
+        return {'patterns': self.patterns}
+
+    def predict(self, texts):
+        return [self._pattern.search(text) is not None for text in texts]
+
+
+class KeywordSafeguard(RegexSafeguard):
+    """Flags texts containing any of `keywords` as a whole word"""
+
+    def __init__(self, name, keywords, **options):
+        super().__init__(name, [rf"\b{re.escape(keyword)}\b" for keyword in keywords], **options)
+
+
+class RandomSafeguard(StubSafeguard):
+    """Flags each text with probability `rate`.
+
+    The draw is a hash of the text, so a text always gets the same verdict
+    from a given safeguard and seed, whatever the batch or call order.
+    """
+
+    def __init__(self, name, rate, seed=0, **options):
+        super().__init__(name, seed=seed, **options)
+        self.rate = rate
+        self.seed = seed
+
+    def _config(self):
+        return {'rate': self.rate, 'seed': self.seed}
+
+    def predict(self, texts):
+        salt = f"{self.name}/{self.seed}/".encode()
+        draws = np.array([
+            int.from_bytes(hashlib.blake2b(salt + text.encode(), digest_size=8).digest(), 'little')
+            for text in texts
+        ], dtype='uint64')
+        return (draws / 2.0 ** 64 < self.rate).tolist()
+
+
+HARMFUL_KEYWORDS = [
+    'bomb', 'explosive', 'weapon', 'poison', 'kill', 'murder', 'malware', 'ransomware', 'virus',
+    'hack', 'exploit', 'steal', 'fraud', 'scam', 'launder', 'drug', 'meth', 'heroin', 'suicide',
+]
+JAILBREAK_PATTERNS = [
+    r'ignore (?:all |any )?(?:previous|prior) instructions', r'\bDAN\b', r'developer mode',
+    r'pretend (?:to be|you are)', r'role-?play', r'hypothetical(?:ly)?', r'no (?:rules|restrictions)',
+]
+
+
+# Seconds per call, calls served at once and dollars per 1k prompts
+STUB_PROFILES = {
+    # Hosted API
+    'Lakera': dict(latency=0.04, jitter=0.3, capacity=32, price_per_1k_prompts=0.5),
+    # Transformer scanners, self-hosted on one CPU box
+    'LLM Guard': dict(latency=0.08, jitter=0.2, capacity=2),
+    # LLM-backed rails: one LLM call per check
+    'NeMo': dict(latency=0.35, jitter=0.4, capacity=16, price_per_1k_prompts=1.2),
+    # Lightweight local metrics
+    'LangKit': dict(latency=0.005, jitter=0.2, capacity=4),
+    # Small local classifier
+    'Prompt Guard': dict(latency=0.02, jitter=0.2, capacity=4),
+}
+
+
+def stub_safeguards(latency=0.0, failure_rate=0.0, max_concurrency=4, batch_size=32, seed=0, profiles=False):
+    """Offline stand-ins for the safeguards of the results table.
+
+    With `profiles`, each stub simulates the latency, capacity and price of
+    `STUB_PROFILES` instead of a uniform `latency`.
+    """
+    options = dict(failure_rate=failure_rate, max_concurrency=max_concurrency, batch_size=batch_size, seed=seed)
+
+    def settings(name):
+        return {**options, **(STUB_PROFILES[name] if profiles else {'latency': latency})}
+
+    return [
+        RandomSafeguard('Lakera', rate=0.35, **settings('Lakera')),
+        KeywordSafeguard('LLM Guard', HARMFUL_KEYWORDS, **settings('LLM Guard')),
+        RandomSafeguard('NeMo', rate=0.55, **settings('NeMo')),
+        KeywordSafeguard('LangKit', HARMFUL_KEYWORDS[:8], **settings('LangKit')),
+        RegexSafeguard('Prompt Guard', JAILBREAK_PATTERNS, **settings('Prompt Guard')),
+    ]
@@ -0,0 +1,151 @@
+"""Evaluation split into shards run by independent processes or machines.
+
+Prompt `prompt_id` belongs to shard `prompt_id % shards`: the split only
+depends on the corpus and the number of shards, so every worker computes
+its own share without coordination. Shard `i` of `n` writes, in the output
+directory:
+
+- `shard-<i>-of-<n>.parquet`: the verdicts of its prompts
+- `shard-<i>-of-<n>.counts.parquet`: its detection counts per cell (see
+  `metrics.detection_counts`), accumulated while the verdicts are written
+
+A shard is done when its counts file exists, it is written last. Until
+then, its progress is checkpointed in `.shard-<i>-of-<n>.run/` (see
+`checkpoint`): rerunning skips done shards and resumes the others where they
+stopped, so shards can fail and be retried independently. Counts add up associatively, the merge sums the
+counts of all shards into the results table
+(`data/safeguard_evaluation_results.csv` format).
+
+    # All shards in local worker processes, then the merge
+    python -m BELLS_leaderboard_mock_up.sharding --shards 16 --workers 4 --output-dir data/shards
+
+    # One shard per node, then the merge once all are done
+    python -m BELLS_leaderboard_mock_up.sharding --shards 16 --shard 3 --output-dir /shared/shards
+    python -m BELLS_leaderboard_mock_up.sharding --shards 16 --merge-only --output-dir /shared/shards
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from BELLS_leaderboard_mock_up.checkpoint import evaluate_checkpointed
+from BELLS_leaderboard_mock_up.evaluation import load_prompts
+from BELLS_leaderboard_mock_up.metrics import CELL_COLUMNS, merge_counts, results_table
+from BELLS_leaderboard_mock_up.safeguards import stub_safeguards
+from BELLS_leaderboard_mock_up.verdict_cache import VerdictCache
+
+
+def shard_name(index, shards):
+    return f"shard-{index:05d}-of-{shards:05d}"
+
+
+def shard_prompts(prompts, index, shards):
+    """Prompts of shard `index` out of `shards`"""
+    if not 0 <= index < shards:
+        raise ValueError(f"Invalid shard {index} of {shards}")
+    return prompts.filter(pa.array(prompts.column('prompt_id').to_numpy() % shards == index))
+
+
+def run_shard(index, shards, output_dir, prompts=None, stub_options=None, cache=None, **options):
+    """Evaluate shard `index` unless done, returns its number of prompts (None if skipped).
+
+    Arguments are plain values so shards can run in worker processes:
+    `prompts` is a corpus path (see `evaluation.load_prompts`), `stub_options`
+    the arguments of `safeguards.stub_safeguards`, `cache` a verdict cache path.
+    """
+    output_dir = Path(output_dir)
+    name = shard_name(index, shards)
+    counts_path = output_dir / f"{name}.counts.parquet"
+    if counts_path.exists():
+        return None
+
+    part = shard_prompts(load_prompts(prompts), index, shards)
+    safeguards = stub_safeguards(**(stub_options or {}))
+    verdict_cache = VerdictCache(cache) if cache else None
+    try:
+        _, counts = evaluate_checkpointed(
+            part, output_dir / f"{name}.parquet", safeguards, output_dir / f".{name}.run", cache=verdict_cache,
+            report=lambda line: print(f"  {name}: {line}", flush=True), **options)
+    finally:
+        if verdict_cache is not None:
+            verdict_cache.close()
+
+    tmp = output_dir / f".{name}.counts.parquet"
+    counts.reset_index().to_parquet(tmp, index=False)
+    os.replace(tmp, counts_path)
+    return part.num_rows
+
+
+def missing_shards(output_dir, shards):
+    return [i for i in range(shards) if not (Path(output_dir) / f"{shard_name(i, shards)}.counts.parquet").exists()]
+
+
+def merge_shards(output_dir, shards):
+    """Detection counts of the whole corpus, from the counts of all shards"""
+    missing = missing_shards(output_dir, shards)
+    if missing:
+        raise FileNotFoundError(f"Shards not done yet: {missing}")
+    parts = [
+        pd.read_parquet(Path(output_dir) / f"{shard_name(i, shards)}.counts.parquet").set_index(CELL_COLUMNS)
+        for i in range(shards)
+    ]
+    columns = {tuple(part.columns) for part in parts}
+    if len(columns) > 1:
+        raise ValueError(f"Shards were evaluated with different safeguards: {sorted(columns)}")
+    return merge_counts(parts)
+
+
+def run_local(shards, workers, output_dir, **options):
+    """Run the shards not done yet in `workers` processes, returns the prompts evaluated"""
+    pending = missing_shards(output_dir, shards)
+    evaluated = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_shard, index, shards, output_dir, **options): index for index in pending}
+        for future in as_completed(futures):
+            rows = future.result()
+            evaluated += rows or 0
+            print(f"  {shard_name(futures[future], shards)}: {rows} prompts", flush=True)
+    return evaluated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the (stub) safeguards shard by shard")
+    parser.add_argument('--shards', type=int, required=True, help='Number of shards')
+    parser.add_argument('--output-dir', type=Path, required=True, help='Directory of the shard files')
+    parser.add_argument('--shard', type=int, default=None, help='Run only this shard (one per node)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Local worker processes')
+    parser.add_argument('--merge-only', action='store_true', help='Only merge the shards already done')
+    parser.add_argument('--results', type=Path, default=None,
+                        help='Results table to write, default: <output-dir>/safeguard_evaluation_results.csv')
+    parser.add_argument('--prompts', default=None,
+                        help='Verdict corpus (.parquet) or prompt CSV, default: data/non_adversarial_prompts.csv')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated seconds per safeguard call')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Simulated share of safeguard calls failing transiently')
+    parser.add_argument('--concurrency', type=int, default=4, help='Calls in flight per safeguard and shard')
+    parser.add_argument('--cache', default=None, help='Verdict cache file shared by the shards')
+    args = parser.parse_args()
+
+    options = dict(prompts=args.prompts, cache=args.cache, stub_options=dict(
+        latency=args.latency, failure_rate=args.failure_rate, max_concurrency=args.concurrency))
+    start = time.perf_counter()
+    if args.shard is not None:
+        rows = run_shard(args.shard, args.shards, args.output_dir, **options)
+        print(f"{shard_name(args.shard, args.shards)}: " + ('already done' if rows is None else f"{rows} prompts"))
+        return
+    if not args.merge_only:
+        rows = run_local(args.shards, args.workers, args.output_dir, **options)
+        print(f"Evaluated {rows} prompts in {time.perf_counter() - start:.1f}s")
+
+    results = results_table(merge_shards(args.output_dir, args.shards))
+    path = args.results or args.output_dir / 'safeguard_evaluation_results.csv'
+    results.to_csv(path, index=False)
+    print(f"Merged {args.shards} shards into {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""Paired significance tests between every pair of safeguards.
+
+Every safeguard sees the same prompts, so two detection rates are compared
+with McNemar's test on the discordant prompts of the pair: `b` flagged by
+the first safeguard only, `c` by the second only. The tests run on every
+slice of the metrics: `all` prompts, each harm level, then the datasets,
+harm categories, jailbreak types and sources of `bootstrap.groups`.
+
+The discordance counts of every pair in every slice come from the verdict
+patterns (see `bootstrap`) in one pass: with X the (patterns x safeguards)
+0/1 verdicts and w the prompts of each pattern in the slice,
+
+    co-detections N = X' diag(w) X,  b = n_i - N_ij,  c = n_j - N_ij
+
+where n = diag(N) are the detections. The slices overlap but are unions of
+cells (`metrics.CELL_COLUMNS`): N is computed once per cell, by a
+(safeguards x patterns) @ (patterns x safeguards) product over its patterns,
+and added to every slice containing the cell.
+
+p-values are exact binomial when b + c < `EXACT_BELOW`, chi-square with
+continuity correction otherwise, and adjusted for the pairs of each slice
+(Holm by default, or Benjamini-Hochberg).
+
+The committed patterns are synthetic, sized like the real datasets (see
+`bootstrap`): the tests the apps show are simulated, and labelled so.
+
+    python -m BELLS_leaderboard_mock_up.significance --output data/pairwise_significance.csv
+"""
+import argparse
+import math
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from BELLS_leaderboard_mock_up.bootstrap import groups
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR, dataset_digest, load_dataset
+from BELLS_leaderboard_mock_up.metrics import CELL_COLUMNS, HARM_LEVELS
+
+EXACT_BELOW = 25
+METHODS = ['holm', 'bh']
+
+
+def slices(patterns):
+    """{slice: mask over the patterns (or cells)}: all prompts, harm levels, then the groups of the metrics"""
+    harm_level = patterns['harm_level'].astype(str).to_numpy()
+    masks = {'all': np.ones(len(patterns), dtype=bool)}
+    masks.update({level: harm_level == level for level in HARM_LEVELS if (harm_level == level).any()})
+    return {**masks, **groups(patterns)}
+
+
+def discordance(patterns, safeguards):
+    """Slices, their prompts, then detections and co-detections of every pair (slices, safeguards, safeguards).
+
+    The slices are computed on the cells (`metrics.CELL_COLUMNS`) of the
+    patterns; each cell's co-detections are computed once and added to the
+    slices containing it.
+    """
+    codes = patterns.groupby(CELL_COLUMNS, dropna=False, sort=False).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.diff(codes[order], prepend=-1))
+    masks = slices(patterns[CELL_COLUMNS].iloc[order[starts]].reset_index(drop=True))
+    membership = np.stack(list(masks.values()))
+
+    verdicts = patterns[safeguards].to_numpy(dtype='float64')[order]
+    weights = patterns['prompts'].to_numpy(dtype='float64')[order]
+    prompts = membership @ np.add.reduceat(weights, starts) if len(starts) else np.zeros(len(masks))
+    co_detections = np.zeros((len(masks), len(safeguards), len(safeguards)))
+    for cell, (start, stop) in enumerate(zip(starts, np.append(starts[1:], len(order)))):
+        rows = slice(start, stop)
+        co_detections[membership[:, cell]] += (verdicts[rows].T * weights[rows]) @ verdicts[rows]
+    return list(masks), prompts, co_detections
+
+
+def _exact_table(size):
+    """Two-sided exact McNemar p-values, [n, k] for k = min(b, c) discordant prompts out of n"""
+    table = np.ones((size, size))
+    for n in range(1, size):
+        tail = np.cumsum([math.comb(n, k) for k in range(n + 1)]) / 2 ** n
+        table[n, :n + 1] = np.minimum(1, 2 * tail)
+    return table
+
+
+_EXACT = _exact_table(EXACT_BELOW)
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+def mcnemar(b, c):
+    """Two-sided McNemar p-values of the discordant counts `b` and `c`"""
+    b, c = np.broadcast_arrays(np.asarray(b, dtype='int64'), np.asarray(c, dtype='int64'))
+    n = b + c
+    with np.errstate(invalid='ignore', divide='ignore'):
+        statistic = np.where(n > 0, np.maximum(np.abs(b - c) - 1, 0) ** 2 / n, 0.0)
+    p_values = _erfc(np.sqrt(statistic / 2)).astype('float64')
+    exact = n < EXACT_BELOW
+    p_values[exact] = _EXACT[n[exact], np.minimum(b, c)[exact]]
+    return p_values
+
+
+def adjust(p_values, method='holm'):
+    """p-values adjusted for multiple comparisons along the last axis (NaN-free)"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown correction method: {method}, expected one of {METHODS}")
+    size = p_values.shape[-1]
+    order = np.argsort(p_values, axis=-1)
+    ranked = np.take_along_axis(p_values, order, axis=-1)
+    if method == 'holm':
+        ranked = np.maximum.accumulate(ranked * (size - np.arange(size)), axis=-1)
+    else:
+        ranked = np.minimum.accumulate((ranked * size / np.arange(1, size + 1))[..., ::-1], axis=-1)[..., ::-1]
+    adjusted = np.empty_like(ranked)
+    np.put_along_axis(adjusted, order, np.minimum(ranked, 1), axis=-1)
+    return adjusted
+
+
+def pairwise_tests(patterns, safeguards=None, method='holm', alpha=0.05):
+    """McNemar test of every pair of safeguards in every slice, one row per (slice, pair)"""
+    safeguards = list(safeguards or [c for c in patterns.columns if c not in CELL_COLUMNS + ['prompts']])
+    names, prompts, co_detections = discordance(patterns, safeguards)
+    first, second = np.triu_indices(len(safeguards), k=1)
+    detections = np.diagonal(co_detections, axis1=1, axis2=2)
+    shared = co_detections[:, first, second]
+    b = np.rint(detections[:, first] - shared).astype('int64')
+    c = np.rint(detections[:, second] - shared).astype('int64')
+    p_values = mcnemar(b, c)
+    adjusted = adjust(p_values, method) if len(first) else p_values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difference = (b - c) / prompts[:, None]
+    return pd.DataFrame({
+        'slice': np.repeat(names, len(first)),
+        'prompts': np.repeat(prompts.astype('int64'), len(first)),
+        'safeguard': np.tile(np.array(safeguards, dtype=object)[first], len(names)),
+        'opponent': np.tile(np.array(safeguards, dtype=object)[second], len(names)),
+        'only_safeguard': b.ravel(),
+        'only_opponent': c.ravel(),
+        'difference': difference.ravel(),
+        'p_value': p_values.ravel(),
+        'p_adjusted': adjusted.ravel(),
+        'significant': adjusted.ravel() < alpha,
+    })
+
+
+def pair_matrix(tests, slice_name, column):
+    """Safeguards x safeguards of one slice from a column of the tests; `difference` is mirrored with its
+    sign flipped and has a zero diagonal, other columns are mirrored as is with a NaN diagonal"""
+    rows = tests[tests['slice'] == slice_name]
+    names = list(dict.fromkeys(list(rows['safeguard']) + list(rows['opponent'])))
+    position = {name: i for i, name in enumerate(names)}
+    first = rows['safeguard'].map(position).to_numpy(dtype='int64')
+    second = rows['opponent'].map(position).to_numpy(dtype='int64')
+    values = rows[column].to_numpy(dtype='float64')
+    matrix = np.zeros((len(names), len(names))) if column == 'difference' else np.full((len(names), len(names)), np.nan)
+    matrix[first, second] = values
+    matrix[second, first] = -values if column == 'difference' else values
+    return pd.DataFrame(matrix, index=pd.Index(names, name='safeguard'), columns=pd.Index(names, name='opponent'))
+
+
+def significance_matrix(tests, slice_name='all'):
+    """+1 where the row safeguard flags significantly more prompts of the slice than the column one,
+    -1 significantly fewer, 0 otherwise"""
+    signs = tests.assign(difference=np.sign(tests['difference']) * tests['significant'])
+    return pair_matrix(signs, slice_name, 'difference').astype('int64')
+
+
+_tests = {}
+_lock = threading.Lock()
+
+
+def load_tests(name='verdict_patterns.csv', method='holm', alpha=0.05, data_dir=DATA_DIR):
+    """`pairwise_tests` of the verdict patterns `data/<name>`, recomputed when the file changes"""
+    key = (str(data_dir), name, method, alpha)
+    digest = dataset_digest(name, data_dir)
+    with _lock:
+        cached = _tests.get(key)
+        if cached is None or cached[0] != digest:
+            cached = (digest, pairwise_tests(load_dataset(name, data_dir), method=method, alpha=alpha))
+            _tests[key] = cached
+        return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="McNemar tests between every pair of safeguards on every slice")
+    parser.add_argument('--patterns', default=str(DATA_DIR / 'verdict_patterns.csv'),
+                        help='Verdict patterns CSV (see BELLS_leaderboard_mock_up.bootstrap)')
+    parser.add_argument('--method', choices=METHODS, default='holm', help='Multiple-comparison correction')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--output', default=None, help='CSV of the tests')
+    args = parser.parse_args()
+
+    patterns = pd.read_csv(args.patterns)
+    start = time.perf_counter()
+    tests = pairwise_tests(patterns, method=args.method, alpha=args.alpha)
+    print(f"{len(tests)} tests ({tests['slice'].nunique()} slices) in {(time.perf_counter() - start) * 1e3:.1f} ms, "
+          f"{tests['significant'].sum()} significant at {args.alpha} ({args.method})")
+    if args.output:
+        tests.to_csv(args.output, index=False)
+    print(significance_matrix(tests).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""Similar prompts: TF-IDF vectors of character n-grams and top-k cosine search.
+
+The documents are the prompts of the non-adversarial corpus
+(`non_adversarial_prompts.csv`) and the rendered prompts of the jailbreak
+store (`data/jailbreaks/`, when there is one). Each is a sparse vector:
+
+- terms: the character `ngram`-grams of the normalized text, as the 32-bit
+  hashes of `dedup.shingle_hashes`
+- weights: sublinear term frequency (1 + log count) times the smoothed
+  inverse document frequency (log((1 + N) / (1 + df)) + 1), L2-normalized,
+  so the dot product of two vectors is their cosine similarity
+- terms found in more than `max_df` of the documents are dropped: they
+  carry little and would make every query visit most documents
+
+The index keeps the vectors both by document (CSR: the terms of each
+document) and by term (postings: the documents of each term). A query
+accumulates the postings of its `QUERY_TERMS` heaviest terms into candidate
+scores, then rescores the best `RESCORE` candidates exactly with all its
+terms, so a query visits a few postings lists instead of every document.
+
+The index is built once per version of the corpora and persisted in
+`data/similarity/` (NumPy arrays, named after the content digests of the
+corpora), then loaded by the apps.
+
+    python -m BELLS_leaderboard_mock_up.similarity "How do I pick a lock?"
+"""
+import argparse
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR, dataset_digest, load_dataset
+from BELLS_leaderboard_mock_up.dedup import shingle_hashes
+from BELLS_leaderboard_mock_up.jailbreak_store import TABLES, load_store
+
+NON_ADVERSARIAL = 'non_adversarial_prompts.csv'
+JAILBREAKS = 'jailbreaks'
+
+# Heaviest query terms whose postings are visited (while they hold fewer than POSTINGS_BUDGET
+# documents in all), and candidates rescored with every term
+QUERY_TERMS = 48
+POSTINGS_BUDGET = 1 << 17
+RESCORE = 256
+# Documents whose n-grams are counted at once, bounding the memory of a build
+DOCUMENT_CHUNK = 1 << 13
+
+
+def term_counts(texts, ngram):
+    """(document, term hash, count) of every distinct n-gram of every text, sorted by document then hash"""
+    parts = []
+    for start in range(0, len(texts), DOCUMENT_CHUNK):
+        hashes, offsets = shingle_hashes(texts[start:start + DOCUMENT_CHUNK], ngram)
+        documents = np.repeat(np.arange(start, start + len(offsets) - 1, dtype='uint64'), np.diff(offsets))
+        keys, counts = np.unique((documents << np.uint64(32)) | hashes, return_counts=True)
+        parts.append(((keys >> np.uint64(32)).astype('int32'), (keys & np.uint64(0xFFFFFFFF)).astype('uint32'),
+                      counts.astype('int32')))
+    if not parts:
+        return np.zeros(0, dtype='int32'), np.zeros(0, dtype='uint32'), np.zeros(0, dtype='int32')
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def _csr(groups, size):
+    """Offsets of the runs of sorted group ids 0..size-1"""
+    return np.concatenate([[0], np.cumsum(np.bincount(groups, minlength=size))]).astype('int64')
+
+
+def _gather(offsets, groups):
+    """Positions of the entries of `groups` in arrays split by `offsets`, and the length of each group"""
+    starts, lengths = offsets[groups], offsets[groups + 1] - offsets[groups]
+    firsts = np.cumsum(lengths) - lengths
+    return np.repeat(starts - firsts, lengths) + np.arange(lengths.sum()), lengths
+
+
+class SimilarityIndex:
+    """TF-IDF vectors of a set of documents, see the module docstring"""
+
+    ARRAYS = ['vocabulary', 'idf', 'indptr', 'terms', 'weights', 'postings_ptr', 'postings', 'posting_weights',
+              'corpus_offsets']
+
+    def __init__(self, ngram, corpora, **arrays):
+        self.ngram = ngram
+        self.corpora = list(corpora)
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.size = len(self.indptr) - 1
+
+    @classmethod
+    def build(cls, corpora, ngram=3, max_df=0.5):
+        """Index of `corpora`, {corpus: texts}; documents are numbered corpus after corpus"""
+        texts = [str(text) for corpus in corpora.values() for text in corpus]
+        size = len(texts)
+        documents, hashes, counts = term_counts(texts, ngram)
+        vocabulary, terms, frequencies = np.unique(hashes, return_inverse=True, return_counts=True)
+
+        # Drop the most common terms, renumbering the others
+        kept = frequencies <= max(max_df * size, 1)
+        renumber = np.cumsum(kept) - 1
+        selected = kept[terms]
+        documents, terms, counts = documents[selected], renumber[terms[selected]].astype('int32'), counts[selected]
+        vocabulary, frequencies = vocabulary[kept], frequencies[kept]
+
+        idf = np.log((1 + size) / (1 + frequencies)) + 1
+        weights = (1 + np.log(counts)) * idf[terms]
+        norms = np.sqrt(np.bincount(documents, weights ** 2, minlength=size))
+        weights /= np.where(norms > 0, norms, 1)[documents]
+
+        order = np.argsort(terms, kind='stable')
+        return cls(ngram, corpora, vocabulary=vocabulary, idf=idf.astype('float32'),
+                   indptr=_csr(documents, size), terms=terms, weights=weights.astype('float32'),
+                   postings_ptr=_csr(terms, len(vocabulary)), postings=documents[order],
+                   posting_weights=weights[order].astype('float32'),
+                   corpus_offsets=np.cumsum([0] + [len(texts) for texts in corpora.values()]))
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written next to its final name first, so a crash does not leave a partial index
+        partial = path.with_name(path.name + '.partial.npz')
+        np.savez(partial, ngram=self.ngram, corpora=np.array(self.corpora),
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+        partial.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(int(arrays['ngram']), arrays['corpora'].tolist(),
+                       **{name: arrays[name] for name in cls.ARRAYS})
+
+    def document(self, corpus, row):
+        """Document number of row `row` of `corpus`"""
+        return int(self.corpus_offsets[self.corpora.index(corpus)] + row)
+
+    def locate(self, documents):
+        """(corpus, row) of every document"""
+        position = np.searchsorted(self.corpus_offsets, documents, side='right') - 1
+        return [(self.corpora[p], int(d - self.corpus_offsets[p])) for p, d in zip(position, documents)]
+
+    def vectorize(self, text):
+        """Terms and weights of `text`, terms missing from the vocabulary left out"""
+        hashes, counts = np.unique(shingle_hashes([str(text)], self.ngram)[0].astype('uint32'), return_counts=True)
+        positions = np.minimum(np.searchsorted(self.vocabulary, hashes), max(len(self.vocabulary) - 1, 0))
+        known = self.vocabulary[positions] == hashes if len(self.vocabulary) else np.zeros(len(hashes), dtype=bool)
+        terms = positions[known]
+        weights = (1 + np.log(counts[known])) * self.idf[terms]
+        return terms, weights / max(np.sqrt((weights ** 2).sum()), 1e-12)
+
+    def similar(self, text, k=10, exclude=()):
+        """(documents, cosine similarities) of the `k` documents most similar to `text`, best first"""
+        terms, weights = self.vectorize(text)
+        if not len(terms):
+            return np.zeros(0, dtype='int64'), np.zeros(0)
+
+        # Candidates: the postings of the heaviest terms, within the budget
+        heaviest = np.argsort(-weights, kind='stable')[:QUERY_TERMS]
+        visited = np.cumsum(np.diff(self.postings_ptr)[terms[heaviest]])
+        heaviest = heaviest[:max(np.searchsorted(visited, POSTINGS_BUDGET, side='right'), 1)]
+        positions, lengths = _gather(self.postings_ptr, terms[heaviest])
+        scores = np.bincount(self.postings[positions], self.posting_weights[positions] * np.repeat(
+            weights[heaviest], lengths), minlength=self.size)
+        scores[list(exclude)] = 0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > RESCORE:
+            candidates = candidates[np.argpartition(-scores[candidates], RESCORE)[:RESCORE]]
+
+        # Exact cosine of the candidates, with every query term
+        positions, lengths = _gather(self.indptr, candidates)
+        found = np.minimum(np.searchsorted(terms, self.terms[positions]), len(terms) - 1)
+        matches = terms[found] == self.terms[positions]
+        products = np.where(matches, self.weights[positions] * weights[found], 0)
+        exact = np.bincount(np.repeat(np.arange(len(candidates)), lengths), products, minlength=len(candidates))
+        best = np.lexsort((candidates, -exact))[:k]
+        return candidates[best].astype('int64'), exact[best]
+
+
+def load_corpora(data_dir=DATA_DIR):
+    """{corpus: texts} of the prompts: the non-adversarial questions, then the rendered jailbreak
+    prompts of the store if `data/jailbreaks/` exists"""
+    corpora = {'non_adversarial': load_dataset(NON_ADVERSARIAL, data_dir)['question'].astype(str).tolist()}
+    if (Path(data_dir) / JAILBREAKS).is_dir():
+        store = load_store(JAILBREAKS, data_dir)
+        corpora['adversarial'] = store.render(np.arange(len(store)))
+    return corpora
+
+
+def corpora_digest(data_dir=DATA_DIR):
+    """Content digest of the files of the corpora"""
+    digests = [dataset_digest(NON_ADVERSARIAL, data_dir)]
+    if (Path(data_dir) / JAILBREAKS).is_dir():
+        digests += [dataset_digest(f"{JAILBREAKS}/{table}.csv", data_dir) for table in TABLES]
+    return '-'.join(digest[:8] for digest in digests)
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def load_similarity(ngram=3, data_dir=DATA_DIR, cache_dir=None):
+    """`SimilarityIndex` of the corpora of `data_dir`, built on first use and persisted in `cache_dir`
+    (`data/similarity/`), reloaded when a corpus file changes"""
+    cache_dir = Path(cache_dir or Path(data_dir) / 'similarity')
+    path = cache_dir / f"prompts-{corpora_digest(data_dir)}-{ngram}.npz"
+    with _lock:
+        if path not in _indexes:
+            if path.exists():
+                _indexes[path] = SimilarityIndex.load(path)
+            else:
+                index = SimilarityIndex.build(load_corpora(data_dir), ngram)
+                index.save(path)
+                _indexes[path] = index
+        return _indexes[path]
+
+
+def similar_prompts(text, k=10, exclude=None, data_dir=DATA_DIR):
+    """The `k` prompts most similar to `text` with their labels and verdicts, best first.
+
+    `exclude` is a (corpus, row) left out of the results, such as the prompt `text` comes from.
+    """
+    index = load_similarity(data_dir=data_dir)
+    excluded = [index.document(*exclude)] if exclude is not None and exclude[0] in index.corpora else []
+    documents, scores = index.similar(text, k, excluded)
+    frames = {'non_adversarial': load_dataset(NON_ADVERSARIAL, data_dir)}
+    if 'adversarial' in index.corpora:
+        store = load_store(JAILBREAKS, data_dir)
+        frames['adversarial'] = store.view()
+
+    records = []
+    for (corpus, row), score in zip(index.locate(documents), scores):
+        record = frames[corpus].iloc[row].to_dict()
+        prompt = store.render([row])[0] if corpus == 'adversarial' else record['question']
+        records.append({'similarity': float(score), 'corpus': corpus, 'row': row, 'prompt': prompt, **record})
+    return pd.DataFrame(records, columns=list(dict.fromkeys(
+        ['similarity', 'corpus', 'row', 'prompt'] + [c for record in records for c in record])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompts most similar to a text, by TF-IDF cosine similarity")
+    parser.add_argument('text', nargs='?', default=None, help='Text to search, builds the index only if omitted')
+    parser.add_argument('-k', type=int, default=10, help='Prompts returned')
+    parser.add_argument('--ngram', type=int, default=3, help='Characters per n-gram')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_similarity(args.ngram)
+    print(f"{index.size} prompts ({', '.join(index.corpora)}), {len(index.vocabulary)} terms, "
+          f"loaded or built in {time.perf_counter() - start:.2f}s")
+    if args.text is None:
+        return
+    start = time.perf_counter()
+    index.similar(args.text, args.k)
+    print(f"Searched in {(time.perf_counter() - start) * 1e3:.2f} ms\n")
+    results = similar_prompts(args.text, args.k)
+    results['prompt'] = results['prompt'].str.slice(0, 80)
+    print(results.drop(columns=['row', 'question'], errors='ignore').round(3).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,48 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from pathlib import Path
-import base64
 
-from recommender import recommendation_ui
-from playground import playground_ui
+from BELLS_leaderboard_mock_up.assets import build_assets, picture_html
+from BELLS_leaderboard_mock_up.datastore import load_dataset
 
-# Read the CSV file
-@st.cache_data
+# Image variants are written to ./static, which Streamlit serves at app/static/
+STATIC_ASSETS_DIR = Path(__file__).parent / 'static' / 'assets'
+STATIC_ASSETS_URL = 'app/static/assets'
+# Read the CSV file, shared read-only by all sessions of the process
 def load_data():
-    data_dir = Path(__file__).parent.parent.parent.parent / 'data'
-    df = pd.read_csv(data_dir / 'safeguard_evaluation_results.csv')
-    return df
-
-# Get the path for images
-def get_image_path(image_name):
-    return Path(__file__).parent.parent.parent.parent / 'images' / image_name
-
-def get_base64_of_bin_file(bin_file):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
+    return load_dataset('safeguard_evaluation_results.csv')
+
+def live_results():
+    """Results of the verdict corpus, estimated while it is scanned in the background: the fragment
+    reruns every second until the scan is done, then once more with the whole app to stop refreshing"""
+    from BELLS_leaderboard_mock_up.online import live_table, load_online
+
+    aggregation = load_online()
+    snapshot = aggregation.wait(timeout=1)
+    scanning = snapshot is None or not snapshot['done']
+
+    @st.fragment(run_every=1 if scanning else None)
+    def show():
+        snapshot = aggregation.wait(timeout=1)
+        if snapshot is None:
+            st.caption("Scanning the verdict corpus...")
+            return
+        share = snapshot['rows'] / max(snapshot['total_rows'], 1)
+        if snapshot['done']:
+            st.caption(f"Exact: {snapshot['total_rows']:,} verdicts scanned in {snapshot['seconds']:.1f}s")
+        else:
+            st.progress(share, text=f"{snapshot['rows']:,} of {snapshot['total_rows']:,} verdicts scanned "
+                                    f"({snapshot['blocks']} of {snapshot['total_blocks']} blocks)")
+        st.dataframe(live_table(snapshot), hide_index=True, use_container_width=True)
+        if snapshot['done'] and scanning:
+            st.rerun()
+
+    show()
+
+# Build the resized image variants once per process
+@st.cache_resource
+def load_assets():
+    return build_assets(STATIC_ASSETS_DIR)
 
 def main():
     # Add navigation in sidebar
@@ -32,6 +52,16 @@ def main():
     )
     
     if page == "Leaderboard":
+        # Plotly is only needed on this page, import it lazily to keep cold start fast
+        import numpy as np
+        import plotly.express as px
+        import plotly.graph_objects as go
+        from BELLS_leaderboard_mock_up.bootstrap import error_bars, load_intervals
+        from BELLS_leaderboard_mock_up.cube import DIMENSION_LABELS, DIMENSIONS, load_cube
+        from BELLS_leaderboard_mock_up.formulas import FORMULAS, FormulaError, ScoreTable, compile_formula
+        from BELLS_leaderboard_mock_up.ranks import load_ranks
+        from BELLS_leaderboard_mock_up.significance import load_tests, pair_matrix, significance_matrix
+
         st.title("Benchmark for the Evaluation of LLM Safeguards (BELLS) Leaderboard")
 
         st.error("""
@@ -99,18 +129,62 @@ def main():
         - False positive rates on benign content
         
         Scores range from 0 to 1, with higher scores indicating better overall safeguard performance across these dimensions.
+        Error bars are simulated 95% bootstrap intervals, and the label of each bar the simulated probability
+        that the safeguard ranks first when the prompts are resampled.
+        """)
+
+        st.warning("""
+        ⚠️ **Simulated error bars and P(#1)**: the intervals and rank probabilities resample a synthetic verdict
+        corpus with as many prompts per dataset as the real evaluation, not its per-prompt verdicts, which are
+        not published. The rank probabilities are centered on the scores of the results table.
         """)
 
+        # Bootstrap error bars of every metric and rank distribution, computed once per verdict corpus
+        bars = error_bars(load_intervals())
+        ranks, wins = load_ranks(results='safeguard_evaluation_results.csv')
+
         # Sort DataFrame by BELLS_score in descending order
-        df_sorted = df.sort_values('BELLS_score', ascending=False)
+        df_sorted = df.sort_values('BELLS_score', ascending=False).merge(
+            bars[bars['metric'] == 'BELLS_score'].drop(columns='metric'), on='safeguard', how='left').merge(
+            ranks[['safeguard', 'rank_1']], on='safeguard', how='left')
         fig_bells = px.bar(df_sorted,
                           x='safeguard',
                           y='BELLS_score',
-                          title='BELLS Score by Safeguard',
+                          error_y='plus',
+                          error_y_minus='minus',
+                          text=df_sorted['rank_1'].map(lambda p: f'P(#1) {p:.0%}'),
+                          title='BELLS Score by Safeguard (simulated 95% intervals and P(#1))',
                           labels={'BELLS_score': 'BELLS Score', 'safeguard': 'Safeguard'})
-        fig_bells.update_traces(marker_color='rgb(55, 83, 109)')
+        fig_bells.update_traces(marker_color='rgb(55, 83, 109)', textposition='inside')
         st.plotly_chart(fig_bells)
 
+        from BELLS_leaderboard_mock_up.online import VERDICTS
+        if VERDICTS.exists():
+            st.subheader("Live Results")
+            st.markdown("""
+            Results of the full verdict corpus, estimated from the blocks of verdicts scanned so far in random
+            order, each with the half-width of its 95% confidence interval. The estimates refine as the scan goes
+            on and are exact once every block is scanned.
+            """)
+            live_results()
+
+        with st.expander("🎲 Rank Stability (simulated)"):
+            st.markdown("""
+            Probability of each rank, and of each safeguard (rows) scoring above each other (columns),
+            over bootstrap resamples of the prompts. Simulated like the error bars: the resamples are drawn
+            from a synthetic corpus sized like the real datasets.
+            """)
+            rank_columns = [c for c in ranks.columns if c.startswith('rank_')]
+            fig_ranks = px.imshow(ranks.set_index('safeguard')[rank_columns].rename(columns=lambda c: c[len('rank_'):]),
+                                  text_auto='.0%', zmin=0, zmax=1, color_continuous_scale='Blues',
+                                  labels=dict(x='Rank', y='Safeguard', color='Probability'),
+                                  title='Rank Distribution (simulated)')
+            st.plotly_chart(fig_ranks)
+            fig_wins = px.imshow(wins, text_auto='.0%', zmin=0, zmax=1, color_continuous_scale='RdBu',
+                                 labels=dict(x='Opponent', y='Safeguard', color='P(scores above)'),
+                                 title='Pairwise Win Probabilities')
+            st.plotly_chart(fig_wins)
+
         with st.expander("🎯 Analysis: BELLS Score Breakdown"):
             st.markdown("""
             - Lakera leads with highest BELLS score (0.91)
@@ -119,6 +193,33 @@ def main():
             - Clear performance gap between top and bottom performers
             """)
 
+        # Re-rank the safeguards by a user-defined composite score
+        st.subheader("Custom Score")
+
+        st.markdown("""
+        Rank the safeguards by your own combination of the leaderboard columns, for example
+        `0.5 * BELLS_score + 0.3 * (1 - borderline_sensitivity) + 0.2 * performance_score`.
+        Formulas use `+ - * / ^`, parentheses and `min`, `max`, `mean`, `abs`, `sqrt`, `log`, `clip(x, low, high)`;
+        write column names containing other characters than letters, digits and `_` between backticks.
+        The `latency_*`, `throughput_saturation`, `cost_per_1k_prompts` and `performance_score` columns are
+        simulated (see Serving Performance).
+        """)
+
+        col1, col2 = st.columns([1, 3])
+        preset = col1.selectbox("Start from", list(FORMULAS))
+        expression = col2.text_input("Formula", FORMULAS[preset], key=f'formula_{preset}')
+        try:
+            formula = compile_formula(expression)
+            scores = ScoreTable(df)
+            order = scores.order(expression)
+            custom = df.iloc[order][['safeguard'] + formula.columns].assign(score=scores.scores(expression)[order])
+            st.dataframe(custom.set_index('safeguard'), use_container_width=True)
+        except FormulaError as error:
+            st.error(f"Invalid formula: {error}")
+
+        with st.expander("Available columns"):
+            st.write(", ".join(f"`{column}`" for column in df.columns if column != 'safeguard'))
+
         st.markdown("More a more comprehensive analysis of the performance metrics, please refer to the **Metrics Description section**.")
 
         st.markdown("""
@@ -174,6 +275,7 @@ def main():
         **Prevention Score** = (<span style='color:#e03131'>TPR Adversarial Harmful</span> + <span style='color:#ff8787'>TPR Non-Adversarial Harmful</span>) / 2
         
         This metric combines detection rates for both adversarial and non-adversarial harmful prompts to give a balanced view of prevention effectiveness.
+        Error bars are simulated 95% bootstrap intervals (see BELLS Score Comparison).
         """, unsafe_allow_html=True)
         
         harm_columns = ['Harassment/Discrimination', 'Malware/Hacking', 'Physical_harm',
@@ -184,13 +286,16 @@ def main():
                           value_vars=harm_columns,
                           var_name='Harm Type',
                           value_name='Prevention Score')
+        harm_df = harm_df.merge(bars.rename(columns={'metric': 'Harm Type'}), on=['safeguard', 'Harm Type'], how='left')
         
         fig_harm = px.bar(harm_df,
                           x='Harm Type',
                           y='Prevention Score',
+                          error_y='plus',
+                          error_y_minus='minus',
                           color='safeguard',
                           barmode='group',
-                          title='Harm Prevention Scores by Category')
+                          title='Harm Prevention Scores by Category (simulated 95% intervals)')
         fig_harm.update_layout(xaxis_tickangle=-45)
         st.plotly_chart(fig_harm)
 
@@ -201,7 +306,77 @@ def main():
             - Expert advice: consistently lowest scores (<51%)
             - Privacy: challenging for all models (51-61%)
             """)
-        
+
+        # Drill-down breakdown, rolled up from the detection count cube
+        st.header("Drill-down Breakdown")
+
+        st.markdown("""
+        Detection rates of one safeguard along any two dimensions of the evaluation, for example
+        harm category x jailbreak source, optionally restricted to some harm levels or to
+        adversarial / non-adversarial prompts.
+        """)
+
+        cube = load_cube()
+        col1, col2, col3 = st.columns(3)
+        safeguard = col1.selectbox("Safeguard", cube.safeguards)
+        rows = col2.selectbox("Rows", DIMENSIONS, index=DIMENSIONS.index('category'),
+                              format_func=DIMENSION_LABELS.get)
+        other_dimensions = [d for d in DIMENSIONS if d != rows]
+        columns = col3.selectbox("Columns", other_dimensions,
+                                 index=other_dimensions.index('jailbreak_source') if rows != 'jailbreak_source' else 0,
+                                 format_func=DIMENSION_LABELS.get)
+        col1, col2 = st.columns(2)
+        harm_levels = col1.multiselect("Harm levels", list(cube.levels['harm_level']),
+                                       default=list(cube.levels['harm_level']))
+        prompts = col2.radio("Prompts", ["All", "Adversarial", "Non-adversarial"], horizontal=True)
+
+        selection = {'harm_level': harm_levels}
+        if prompts != "All":
+            selection['adversarial'] = prompts == "Adversarial"
+        breakdown = cube.slice(**selection).breakdown(rows, columns, safeguard) if harm_levels else None
+        if breakdown is None or breakdown.empty:
+            st.info("No prompts in this selection.")
+        else:
+            fig_breakdown = px.imshow(breakdown, text_auto='.2f', aspect='auto', zmin=0, zmax=1,
+                                      color_continuous_scale='RdYlGn',
+                                      labels=dict(x=DIMENSION_LABELS[columns], y=DIMENSION_LABELS[rows],
+                                                  color='Detection rate'),
+                                      title=f'{safeguard} Detection Rate by {DIMENSION_LABELS[rows]} '
+                                            f'and {DIMENSION_LABELS[columns]}')
+            st.plotly_chart(fig_breakdown)
+
+        # Paired McNemar tests between every pair of safeguards
+        st.header("Pairwise Significance (simulated)")
+
+        st.markdown("""
+        Every safeguard is evaluated on the same prompts, so each pair is compared with McNemar's test on the
+        prompts only one of the two flags. A cell is green when the row safeguard flags significantly more
+        prompts of the slice than the column one, red when it flags significantly fewer (5% level, Holm
+        correction over the pairs of the slice). Labels give the difference in detection rate.
+        """)
+
+        st.warning("""
+        ⚠️ **Simulated**: the tests run on a synthetic verdict corpus with as many prompts per dataset as the real
+        evaluation, not on its per-prompt verdicts, which are not published. They do not compare the real
+        safeguards.
+        """)
+
+        tests = load_tests()
+        slice_name = st.selectbox("Slice", list(dict.fromkeys(tests['slice'])))
+        differences = pair_matrix(tests, slice_name, 'difference')
+        p_adjusted = pair_matrix(tests, slice_name, 'p_adjusted')
+        fig_significance = go.Figure(go.Heatmap(
+            z=significance_matrix(tests, slice_name).to_numpy(),
+            x=differences.columns, y=differences.index, zmin=-1, zmax=1,
+            colorscale=[[0, '#e03131'], [0.5, '#f1f3f5'], [1, '#2f9e44']], showscale=False,
+            text=np.where(np.eye(len(differences), dtype=bool), '',
+                      differences.map(lambda d: f'{d:+.1%}').to_numpy()), texttemplate='%{text}',
+            customdata=p_adjusted.to_numpy(),
+            hovertemplate='%{y} vs %{x}<br>Difference: %{text}<br>Adjusted p-value: %{customdata:.2g}<extra></extra>'))
+        fig_significance.update_layout(title=f'Pairwise McNemar Tests ({slice_name}, simulated)',
+                                       xaxis_title='Opponent', yaxis_title='Safeguard')
+        st.plotly_chart(fig_significance)
+
         # False Positive Analysis Section
         st.header("False Positive Analysis")
         
@@ -276,6 +451,37 @@ def main():
             - Most safeguards maintain low Adversarial Sensitivity (<15%)
             - Significant variation in Borderline Sensitivity across safeguards (35-70%)
             """)
+
+        # Latency, throughput and cost measured by performance.py on the stub safeguards
+        st.header("Serving Performance")
+
+        st.warning("""
+        ⚠️ **Simulated**: latency, throughput and cost are measured on offline stubs with the latency, capacity
+        and price profiles of `safeguards.STUB_PROFILES`, not on the real services.
+        """)
+
+        # Free safeguards keep a visible marker
+        performance_df = df.assign(marker_size=df['cost_per_1k_prompts'] + 0.1)
+        fig_performance = px.scatter(performance_df,
+                                     x='latency_p95_ms',
+                                     y='throughput_saturation',
+                                     size='marker_size',
+                                     color='performance_score',
+                                     text='safeguard',
+                                     log_x=True,
+                                     log_y=True,
+                                     range_color=[0, 1],
+                                     hover_data={'marker_size': False, 'cost_per_1k_prompts': ':.2f'},
+                                     title='Serving Performance (simulated)',
+                                     labels={
+                                         'latency_p95_ms': 'p95 Latency (ms)',
+                                         'throughput_saturation': 'Throughput at Saturation (prompts/s)',
+                                         'cost_per_1k_prompts': 'Cost per 1k Prompts ($)',
+                                         'performance_score': 'Performance Score'
+                                     })
+        fig_performance.update_traces(textposition='top center')
+        st.plotly_chart(fig_performance)
+
         # Display raw data
         st.header("Raw Data")
         
@@ -303,6 +509,12 @@ def main():
                             'Disinformation', 'Sexual/Adult_content', 'Privacy', 
                             'Expert_advice', 'Government_decision_making', 'CBRN']
             st.dataframe(df[harm_columns], use_container_width=True)
+
+            # Fourth table: serving performance
+            st.subheader("Serving Performance (simulated)")
+            performance_columns = ['safeguard', 'latency_p50_ms', 'latency_p95_ms', 'latency_p99_ms',
+                                   'throughput_saturation', 'cost_per_1k_prompts', 'performance_score']
+            st.dataframe(df[performance_columns], use_container_width=True)
             
         except KeyError as e:
             st.error(f"Error accessing data: {str(e)}")
@@ -312,9 +524,13 @@ def main():
 
         st.header("Overall Performance Metrics")
             
-        # Add evaluation matrix explanation with correct path
-        image_path = get_image_path("adv_harm_color_matrix.png")
-        st.image(str(image_path), caption="Evaluation Matrix: Adversariality vs. Harmfulness")
+        # Add evaluation matrix explanation, served as a static resized variant
+        st.markdown(
+            picture_html(load_assets(), "adv_harm_color_matrix.png", STATIC_ASSETS_URL,
+                         alt="Evaluation Matrix", attrs='style="max-width: 100%; height: auto;"'),
+            unsafe_allow_html=True
+        )
+        st.caption("Evaluation Matrix: Adversariality vs. Harmfulness")
         
         st.markdown(f"""
         ### Evaluation Framework
@@ -359,17 +575,19 @@ def main():
         """, unsafe_allow_html=True)
 
     elif page == "Recommendation":
+        # Page modules are imported on first visit so their dependencies
+        # (LLM clients, dotenv) are not loaded at startup
+        from recommender import recommendation_ui
         recommendation_ui()
         
     else:  # page == "Playground"
+        from playground import playground_ui
         playground_ui()
 
 def add_footer():
-    # Get the logo path using the existing function
-    logo_path = get_image_path("logo_cesia_full.png")
-    
-    # Convert image to base64
-    logo_base64 = get_base64_of_bin_file(logo_path)
+    # Logo is served as a static file instead of being inlined on every run
+    logo_html = picture_html(load_assets(), "logo_cesia_full.png", STATIC_ASSETS_URL,
+                             alt="CSIA Logo", attrs='class="footer-logo"')
     
     footer_html = f"""
     <style>
@@ -428,7 +646,7 @@ def add_footer():
         <div class="footer-content">
             <span class="footer-text">Made by Hadrien Mariaccia from the</span>
             <a class="footer-link" href="https://www.securite-ia.fr/" target="_blank" rel="noopener noreferrer">
-                <img src="data:image/png;base64,{logo_base64}" class="footer-logo" alt="CSIA Logo">
+                {logo_html}
             </a>
         </div>
     </div>
@@ -1,16 +1,23 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import random
 import os
 from pathlib import Path
 
-@st.cache_data
+from BELLS_leaderboard_mock_up.datastore import load_dataset
+from BELLS_leaderboard_mock_up.disagreement import FILTERS, load_index, store_index
+from BELLS_leaderboard_mock_up.jailbreak_store import BUILD_COMMAND, has_store, load_store
+from BELLS_leaderboard_mock_up.similarity import similar_prompts
+
+# Adversarial prompts rendered per page
+MAX_ADVERSARIAL_PROMPTS = 40
+# Prompts listed by "More like this"
+SIMILAR_PROMPTS = 10
+
 def load_data():
-    """Cache the data loading"""
-    data_dir = Path(__file__).parent.parent.parent.parent / 'data'
-    non_adversarial = pd.read_csv(data_dir / 'non_adversarial_prompts.csv')
-    adversarial = pd.read_csv(data_dir / 'adversarial_prompts.csv')
-    return non_adversarial, adversarial
+    """Shared read-only non-adversarial prompts, loaded once per process"""
+    return load_dataset('non_adversarial_prompts.csv')
 
 def playground_ui():
     st.title("Data Playground")
@@ -36,7 +43,7 @@ def playground_ui():
     st.markdown("---")
     
     # Load data
-    non_adversarial_df, adversarial_df = load_data()
+    non_adversarial_df = load_data()
     
     # Create columns for filters
     col1, col2, col3, col4 = st.columns(4)
@@ -56,6 +63,16 @@ def playground_ui():
             help="Non-Adversarial: Direct prompts | Adversarial: Jailbreak attempts"
         )
     
+    # Factorized templates x goals, loaded on first use and rendered only for the displayed prompts
+    jailbreak_store = None
+    if content_type == "Adversarial":
+        if not has_store():
+            st.info("The adversarial prompts are read from the jailbreak store in `data/jailbreaks/`, "
+                    "which has not been built yet. Build it with:")
+            st.code(BUILD_COMMAND, language='bash')
+            return
+        jailbreak_store = load_store()
+
     # Add warning for adversarial content
     if content_type == "Adversarial":
         st.warning("""
@@ -73,7 +90,7 @@ def playground_ui():
         )
     
     # Get current dataset based on selection
-    current_df = adversarial_df if content_type == "Adversarial" else non_adversarial_df
+    current_df = jailbreak_store.view() if content_type == "Adversarial" else non_adversarial_df
     current_df = current_df[current_df['harm_level'] == harm_level.lower()]
     
     # Category filter
@@ -84,6 +101,41 @@ def playground_ui():
         if selected_category != 'All':
             current_df = current_df[current_df['category'] == selected_category]
     
+    # Disagreement filter, on the packed verdicts of the whole dataset (rows are positions in it)
+    index = store_index(jailbreak_store) if content_type == "Adversarial" else load_index('non_adversarial_prompts.csv')
+    shown = np.zeros(index.size, dtype=bool)
+    shown[current_df.index] = True
+    shown_bits = index.pack(shown)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        disagreement = st.selectbox(
+            "Disagreement",
+            list(FILTERS),
+            format_func=lambda name: FILTERS[name][0],
+            help="Prompts on which the safeguards do not all agree"
+        )
+    arity = FILTERS[disagreement][1]
+    first = second = None
+    if arity >= 1:
+        with col2:
+            first = st.selectbox("Safeguard", index.safeguards, format_func=lambda x: x.replace("_", " ").title())
+    if arity == 2:
+        with col3:
+            second = st.selectbox("Other Safeguard", [name for name in index.safeguards if name != first],
+                                  format_func=lambda x: x.replace("_", " ").title())
+    if disagreement != 'all':
+        current_df = current_df[index.mask(index.query(disagreement, first, second))[current_df.index]]
+
+    with st.expander("Disagreement index"):
+        st.caption("Over the prompts of the selected harm level and category.")
+        st.markdown("**Unique catches and misses:** prompts flagged or missed by this safeguard only")
+        st.dataframe(index.summary(shown_bits), hide_index=True)
+        st.markdown("**Pairwise disagreements:** prompts flagged by one safeguard of the pair only")
+        st.dataframe(index.pair_matrix(shown_bits))
+        st.markdown("**Agreement levels:** prompts by number of safeguards flagging them")
+        st.bar_chart(index.agreement_levels(shown_bits))
+
     # Add search functionality
     search_query = st.text_input(
         "🔍 Search prompts...", 
@@ -95,7 +147,7 @@ def playground_ui():
     if search_query:
         if content_type == "Adversarial":
             mask = (current_df['question'].str.contains(search_query, case=False, na=False) |
-                   current_df['jailbreak_prompt'].str.contains(search_query, case=False, na=False))
+                   jailbreak_store.search(search_query)[current_df.index])
         else:
             mask = current_df['question'].str.contains(search_query, case=False, na=False)
         current_df = current_df[mask]
@@ -112,7 +164,7 @@ def playground_ui():
             detected = current_df[sg].sum()
             cols[i].metric(
                 label=sg.replace("_", " ").title(),
-                value=f"{(detected/total_count*100):.1f}%",
+                value=f"{(detected/max(total_count, 1)*100):.1f}%",
                 help=f"{detected}/{total_count}"
             )
     else:
@@ -120,12 +172,20 @@ def playground_ui():
         detected = current_df[safeguard].sum()
         col1.metric("Total Prompts", total_count)
         col2.metric("Detected", detected)
-        col3.metric("Detection Rate", f"{(detected/total_count*100):.1f}%")
+        col3.metric("Detection Rate", f"{(detected/max(total_count, 1)*100):.1f}%")
     
     st.markdown("---")
     
     # Display prompts
-    for _, row in current_df.iterrows():
+    jailbreak_prompts = {}
+    if content_type == "Adversarial":
+        if total_count > MAX_ADVERSARIAL_PROMPTS:
+            st.caption(f"Showing the first {MAX_ADVERSARIAL_PROMPTS} of {total_count} prompts, "
+                       "refine the filters or search to see others.")
+        current_df = current_df.head(MAX_ADVERSARIAL_PROMPTS)
+        jailbreak_prompts = dict(zip(current_df.index, jailbreak_store.render(current_df.index)))
+
+    for position, row in current_df.iterrows():
         cols = st.columns([3, 1])
         with cols[0]:
             st.markdown(f"### {row['question']}")
@@ -148,13 +208,23 @@ def playground_ui():
         if content_type == "Adversarial":
             st.markdown("**Jailbreak Attempt:**")
             with st.expander("Show jailbreak prompt"):
-                st.markdown(f"_{row['jailbreak_prompt']}_")
+                st.markdown(f"_{jailbreak_prompts[position]}_")
                 st.markdown(f"**Type:** `{row['jailbreak_type']}`")
                 st.markdown(f"**Source:** `{row['jailbreak_source']}`")
         
         # Display metadata
         st.markdown(f"**Category:** `{row['category']}`")
         st.markdown(f"**Source:** `{row['source']}`")
+
+        # Most similar prompts of both corpora and their verdicts
+        corpus = 'adversarial' if content_type == "Adversarial" else 'non_adversarial'
+        if st.button("🔎 More like this", key=f"more_like_this_{corpus}_{position}"):
+            st.session_state['more_like_this'] = (corpus, position)
+        if st.session_state.get('more_like_this') == (corpus, position):
+            text = jailbreak_prompts[position] if content_type == "Adversarial" else row['question']
+            similar = similar_prompts(text, k=SIMILAR_PROMPTS, exclude=(corpus, position))
+            columns = ['similarity', 'corpus', 'prompt', 'harm_level', 'category'] + safeguards[1:]
+            st.dataframe(similar[[c for c in columns if c in similar.columns]], hide_index=True)
         
         st.markdown("---")
 
@@ -1,24 +1,14 @@
-from anthropic import Anthropic
 import streamlit as st
 import pandas as pd
-from openai import OpenAI
 from pathlib import Path
-from dotenv import load_dotenv
-from BELLS_leaderboard_mock_up.config import load_config
 
-
-# Load environment variables from .env file
-load_dotenv()
+from BELLS_leaderboard_mock_up.datastore import load_dataset
 
 def load_evaluation_data():
-    data_dir = Path(__file__).parent.parent.parent.parent / 'data'
-    return pd.read_csv(data_dir / 'safeguard_evaluation_results.csv')
+    return load_dataset('safeguard_evaluation_results.csv')
 
-def generate_recommendation(user_preferences, evaluation_data):
-    # Load config to get API key
-    config = load_config()
-    client = Anthropic(api_key=config['anthropic_api_key'])
-    
+def build_prompt(user_preferences, evaluation_data):
+    """Recommendation request sent to the LLM"""
     # Convert evaluation data to a string format
     data_context = evaluation_data.to_string()
     
@@ -38,6 +28,12 @@ def generate_recommendation(user_preferences, evaluation_data):
     - Expected Risk Level: {user_preferences['jailbreak_proportion']}
     - False Positive Tolerance: {user_preferences['fpr_tolerance']}
 
+    The latency_*_ms, throughput_saturation (prompts per second), cost_per_1k_prompts (dollars) and
+    performance_score (0 to 1, higher is faster) columns describe each safeguard's serving performance:
+    weigh them against the Expected Request Volume. These serving columns are SIMULATED on offline stubs
+    with assumed latency, capacity and price profiles, not measured on the real services: treat them as
+    indicative only and say so if they influence your recommendation.
+
     Please provide:
     1. Top recommended safeguard(s)
     2. Justification based on the evaluation metrics
@@ -45,6 +41,23 @@ def generate_recommendation(user_preferences, evaluation_data):
     4. Alternative options if applicable
 
     Format your response in markdown."""
+    return prompt
+
+def generate_recommendation(user_preferences, evaluation_data):
+    # The API client and dotenv are imported on demand, only when a
+    # recommendation is actually requested
+    from anthropic import Anthropic
+    from dotenv import load_dotenv
+    from BELLS_leaderboard_mock_up.config import load_config
+
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Load config to get API key
+    config = load_config()
+    client = Anthropic(api_key=config['anthropic_api_key'])
+    
+    prompt = build_prompt(user_preferences, evaluation_data)
 
     response = client.messages.create(
         model="claude-3-5-sonnet-20241022",
@@ -68,8 +81,7 @@ def generate_recommendation(user_preferences, evaluation_data):
 @st.cache_data
 def get_example_prompts():
     """Cache the random examples so they don't change on slider interaction"""
-    data_dir = Path(__file__).parent.parent.parent.parent / 'data'
-    borderline_prompts = pd.read_csv(data_dir / 'borderline_non-adversarial.csv')
+    borderline_prompts = load_dataset('borderline_non-adversarial.csv')
     return borderline_prompts.sample(n=3)
 
 def recommendation_ui():
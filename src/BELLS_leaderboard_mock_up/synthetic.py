@@ -0,0 +1,316 @@
+"""Synthetic per-prompt verdict corpora of arbitrary size.
+
+Prompts are drawn from `data/non_adversarial_prompts.csv` following the
+requested harm-level, category, adversarial and jailbreak-source
+distributions. Each safeguard then flags each prompt with a probability
+built from its rates in `data/safeguard_evaluation_results.csv`:
+
+- an intercept per dataset (harm level x adversarial),
+- shifted, on the logit scale, by how the safeguard does on the prompt's
+  harm category relative to its other categories (harmful prompts only),
+- and by an offset per jailbreak source (adversarial prompts only).
+
+Intercepts and source offsets are fitted in turn so that, aggregated back,
+the corpus reproduces the per-dataset rates of the results table exactly and
+its per-source rates as closely as the jailbreak-source mix allows; the
+per-category rates are only approximate. The per-source rates of a
+safeguard, weighted by the mix, have to average to its rate on jailbreak
+prompts. The table does not give the number of prompts per source, so the
+default mix is the one closest to uniform for which they do
+(`implied_sources`): the per-source rates of the committed table are then
+reproduced to within 0.03. Safeguards beyond those of the table are copies of the real ones with a
+random offset, so they are not identical.
+
+Generation is vectorized and chunked: each chunk is drawn from its own seed,
+written as one row group, then dropped, so memory stays bounded.
+
+    python -m BELLS_leaderboard_mock_up.synthetic --prompts 10000000 --safeguards 100 \
+        --output data/synthetic_verdicts.parquet
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from BELLS_leaderboard_mock_up.datastore import DATA_DIR
+from BELLS_leaderboard_mock_up.metrics import (
+    HARM_LEVELS, JAILBREAK_SOURCE_PREFIX, category_column, dataset_column,
+)
+from BELLS_leaderboard_mock_up.verdicts import VerdictWriter, verdict_schema
+
+# Rates are clipped away from 0 and 1 before going to logits
+EPSILON = 1e-4
+# Alternating fits of the dataset intercepts and source offsets
+CALIBRATION_ROUNDS = 100
+
+
+def _logit(p):
+    p = np.clip(p, EPSILON, 1 - EPSILON)
+    return np.log(p / (1 - p))
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def _solve(rate, targets):
+    """`x` such that `rate(x) == targets` elementwise, for `rate` increasing in `x`, by bisection"""
+    low = np.full(targets.shape, -30.0)
+    high = np.full(targets.shape, 30.0)
+    for _ in range(50):
+        middle = (low + high) / 2
+        below = rate(middle) < targets
+        low = np.where(below, middle, low)
+        high = np.where(below, high, middle)
+    return (low + high) / 2
+
+
+def implied_sources(results, harm_levels=None, iterations=20000):
+    """Jailbreak-source mix under which the per-source rates of `results` give its jailbreak rates.
+
+    For every safeguard, the per-source rates weighted by the mix should
+    average to its rate on jailbreak prompts (the `*_jailbreaks` columns
+    weighted by `harm_levels`, uniform by default). Exponentiated gradient
+    descent from the uniform mix converges to the consistent mix closest
+    to uniform.
+    """
+    columns = [c for c in results.columns if c.startswith(JAILBREAK_SOURCE_PREFIX)]
+    harm_levels = _normalize(harm_levels or {level: 1 for level in HARM_LEVELS})
+    rates = results[columns].to_numpy(dtype='float64')
+    targets = results[[dataset_column(level, True) for level in harm_levels.index]].to_numpy(
+        dtype='float64') @ harm_levels.to_numpy()
+    weights = np.full(len(columns), 1 / len(columns))
+    for _ in range(iterations):
+        weights *= np.exp(-2 * rates.T @ (rates @ weights - targets))
+        weights /= weights.sum()
+    return pd.Series(weights, index=[c[len(JAILBREAK_SOURCE_PREFIX):] for c in columns])
+
+
+def _normalize(weights):
+    weights = pd.Series(weights, dtype='float64')
+    if (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError(f"Invalid distribution: {dict(weights)}")
+    return weights / weights.sum()
+
+
+class CorpusSpec:
+    """Distributions and per-cell detection probabilities of a synthetic corpus.
+
+    Every prompt falls in a cell (harm level, adversarial, category, jailbreak
+    source); `probabilities[s, cell]` is the chance that safeguard `s` flags a
+    prompt of that cell.
+    """
+
+    def __init__(self, safeguards=None, harm_levels=None, categories=None, adversarial=0.5,
+                 jailbreak_sources=None, results=None, prompts=None, seed=0):
+        results = pd.read_csv(DATA_DIR / 'safeguard_evaluation_results.csv') if results is None else results
+        prompts = pd.read_csv(DATA_DIR / 'non_adversarial_prompts.csv') if prompts is None else prompts
+        prompts = prompts.assign(category=prompts['category'].str.strip())
+
+        # Distributions, by default those of the real prompts
+        self.harm_levels = _normalize(harm_levels or {level: 1 for level in HARM_LEVELS})
+        self.categories = _normalize(categories or prompts['category'].value_counts().to_dict())
+        self.adversarial = float(adversarial)
+        if not 0 <= self.adversarial <= 1:
+            raise ValueError(f"Invalid adversarial proportion: {adversarial}")
+        sources = [c[len(JAILBREAK_SOURCE_PREFIX):] for c in results.columns if c.startswith(JAILBREAK_SOURCE_PREFIX)]
+        self.jailbreak_sources = _normalize(jailbreak_sources or implied_sources(results, harm_levels).to_dict())
+
+        unknown = set(self.harm_levels.index) - set(HARM_LEVELS)
+        unknown |= {c for c in self.categories.index if category_column(c) not in results.columns}
+        unknown |= set(self.jailbreak_sources.index) - set(sources)
+        if unknown:
+            raise ValueError(f"Unknown harm levels, categories or jailbreak sources: {sorted(unknown)}")
+
+        self.safeguards, rates = self._safeguard_rates(results, safeguards, seed)
+        self._build_cells(rates)
+        self._build_questions(prompts)
+
+    def _safeguard_rates(self, results, count, seed):
+        """Safeguard names and their logit rates, real safeguards first then jittered copies"""
+        count = len(results) if count is None else count
+        rows = np.arange(count) % len(results)
+        names = [name if i < len(results) else f"{name} #{i}"
+                 for i, name in enumerate(results['safeguard'].to_numpy()[rows])]
+        rates = _logit(results.drop(columns='safeguard').to_numpy(dtype='float64')[rows])
+        offsets = np.random.default_rng(seed).normal(0, 0.25, size=(count, 1))
+        offsets[:len(results)] = 0
+        return names, pd.DataFrame(rates + offsets, columns=results.columns.drop('safeguard'))
+
+    def _build_cells(self, rates):
+        harm_levels = list(self.harm_levels.index)
+        categories = list(self.categories.index)
+        sources = list(self.jailbreak_sources.index)
+
+        category_shift = rates[[category_column(c) for c in categories]].to_numpy(copy=True)
+        category_shift -= category_shift.mean(axis=1, keepdims=True)
+
+        # Cells in (harm level, adversarial, category, source) order; source
+        # index len(sources) stands for "no jailbreak"
+        shape = (len(harm_levels), 2, len(categories), len(sources) + 1)
+        shifts = np.zeros((len(rates),) + shape)
+        targets = np.empty((len(rates), len(harm_levels), 2))
+        for h, harm_level in enumerate(harm_levels):
+            for adversarial in (0, 1):
+                targets[:, h, adversarial] = rates[dataset_column(harm_level, adversarial)]
+                if harm_level == 'harmful':
+                    shifts[:, h, adversarial] += category_shift[:, :, None]
+        targets = _sigmoid(targets)
+        source_targets = _sigmoid(rates[[JAILBREAK_SOURCE_PREFIX + s for s in sources]].to_numpy())
+
+        # Share of each (category, source) within a dataset, and of each
+        # (harm level, category) within the jailbreaks of a source
+        weights = np.zeros((2,) + shape[2:])
+        weights[0, :, -1] = self.categories.to_numpy()
+        weights[1, :, :-1] = np.outer(self.categories.to_numpy(), self.jailbreak_sources.to_numpy())
+        source_weights = np.outer(self.harm_levels.to_numpy(), self.categories.to_numpy())
+
+        # Intercept of each dataset and offset of each source such that the
+        # expected detection rates of the datasets and sources are those of the
+        # results table, fitted in turn; rates increase with both
+        offsets = np.zeros((len(rates), len(sources)))
+        for _ in range(CALIBRATION_ROUNDS):
+            cells = shifts.copy()
+            cells[:, :, 1, :, :-1] += offsets[:, None, None, :]
+            intercepts = _solve(
+                lambda x: (weights * _sigmoid(x[..., None, None] + cells)).sum(axis=(-2, -1)), targets)
+            jailbreaks = intercepts[:, :, 1, None, None] + shifts[:, :, 1, :, :-1]
+            previous, offsets = offsets, _solve(
+                lambda x: np.einsum('hc,shcj->sj', source_weights, _sigmoid(jailbreaks + x[:, None, None, :])),
+                source_targets)
+            # Only intercept + offset matters: keep the offsets centered so neither drifts
+            offsets -= (offsets @ self.jailbreak_sources.to_numpy())[:, None]
+            if np.abs(offsets - previous).max() < 1e-4:
+                break
+        cells = shifts.copy()
+        cells[:, :, 1, :, :-1] += offsets[:, None, None, :]
+        intercepts = _solve(lambda x: (weights * _sigmoid(x[..., None, None] + cells)).sum(axis=(-2, -1)), targets)
+        logits = intercepts[..., None, None] + cells
+
+        self.cell_shape = shape
+        self.probabilities = _sigmoid(logits).reshape(len(rates), -1).astype('float32')
+
+    def _build_questions(self, prompts):
+        """Prompt texts sorted by (harm level, category), with the harm level as fallback"""
+        harm_levels = list(self.harm_levels.index)
+        categories = {c: i for i, c in enumerate(self.categories.index)}
+        stride = len(categories) + 1  # categories outside the distribution sort last
+
+        prompts = prompts[prompts['harm_level'].isin(harm_levels)]
+        keys = (prompts['harm_level'].map(harm_levels.index).to_numpy() * stride
+                + prompts['category'].map(categories).fillna(len(categories)).to_numpy(dtype='int64'))
+        order = np.argsort(keys, kind='stable')
+        self.questions = prompts['question'].to_numpy()[order]
+        keys = keys[order]
+
+        self.question_start = np.zeros((len(harm_levels), len(categories)), dtype='int64')
+        self.question_count = np.zeros((len(harm_levels), len(categories)), dtype='int64')
+        for h, harm_level in enumerate(harm_levels):
+            level_start, level_end = np.searchsorted(keys, [h * stride, (h + 1) * stride])
+            if level_start == level_end:
+                raise ValueError(f"No prompts for harm level {harm_level}")
+            for c in range(len(categories)):
+                start, end = np.searchsorted(keys, [h * stride + c, h * stride + c + 1])
+                self.question_start[h, c], self.question_count[h, c] = \
+                    (start, end - start) if end > start else (level_start, level_end - level_start)
+
+    def sample(self, rng, size, prompt_offset=0):
+        """One chunk of `size` prompts with their verdicts, as an Arrow record batch"""
+        harm_level = rng.choice(len(self.harm_levels), size=size, p=self.harm_levels.to_numpy())
+        category = rng.choice(len(self.categories), size=size, p=self.categories.to_numpy())
+        adversarial = rng.random(size) < self.adversarial
+        source = rng.choice(len(self.jailbreak_sources), size=size, p=self.jailbreak_sources.to_numpy())
+        source = np.where(adversarial, source, len(self.jailbreak_sources))
+
+        question = self.question_start[harm_level, category] + \
+            (rng.random(size) * self.question_count[harm_level, category]).astype('int64')
+        cell = np.ravel_multi_index((harm_level, adversarial.astype('int64'), category, source), self.cell_shape)
+
+        columns = [
+            pa.array(np.arange(prompt_offset, prompt_offset + size, dtype='int64')),
+            pa.DictionaryArray.from_arrays(pa.array(question.astype('int32')), pa.array(self.questions)),
+            pa.DictionaryArray.from_arrays(pa.array(harm_level.astype('int8')), pa.array(self.harm_levels.index)),
+            pa.DictionaryArray.from_arrays(pa.array(category.astype('int8')), pa.array(self.categories.index)),
+            pa.array(adversarial),
+            pa.DictionaryArray.from_arrays(
+                pa.array(source.astype('int8'), mask=~adversarial), pa.array(self.jailbreak_sources.index)),
+        ]
+        # One safeguard at a time keeps the working set at one float per prompt
+        for probabilities in self.probabilities:
+            columns.append(pa.array(rng.random(size, dtype='float32') < probabilities[cell]))
+        return pa.RecordBatch.from_arrays(columns, schema=verdict_schema(self.safeguards))
+
+
+def generate(spec, prompts, chunk_size=1 << 18, seed=0):
+    """Record batches of a corpus of `prompts` prompts, chunk by chunk.
+
+    Chunk `i` is drawn from seed (seed, i): the corpus does not depend on the
+    order in which chunks are generated.
+    """
+    for index, offset in enumerate(range(0, prompts, chunk_size)):
+        rng = np.random.default_rng([seed, index])
+        yield spec.sample(rng, min(chunk_size, prompts - offset), prompt_offset=offset)
+
+
+def generate_datasets(sizes, safeguards=None, seed=0, **distributions):
+    """Record batches of a corpus with exactly `sizes[(harm_level, adversarial)]` prompts in each dataset,
+    one batch per dataset, each from its own `CorpusSpec`; returns the safeguards and the batches"""
+    specs = [(CorpusSpec(safeguards=safeguards, harm_levels={harm_level: 1}, adversarial=float(adversarial),
+                         seed=seed, **distributions), size)
+             for (harm_level, adversarial), size in sizes.items()]
+    offsets = np.cumsum([0] + [size for _, size in specs])
+    batches = (spec.sample(np.random.default_rng([seed, index]), size, prompt_offset=offset)
+               for index, ((spec, size), offset) in enumerate(zip(specs, offsets)))
+    return (specs[0][0].safeguards if specs else []), batches
+
+
+def write_corpus(path, spec, prompts, chunk_size=1 << 18, seed=0):
+    """Generate a corpus straight to a Parquet file, returns the number of rows written"""
+    with VerdictWriter(path, spec.safeguards) as writer:
+        for batch in generate(spec, prompts, chunk_size, seed):
+            writer.write(batch)
+    return writer.rows
+
+
+def generate_frame(prompts, safeguards=None, seed=0, **distributions):
+    """Small corpora as a DataFrame, for benchmarks and tests"""
+    spec = CorpusSpec(safeguards=safeguards, seed=seed, **distributions)
+    return pa.Table.from_batches(list(generate(spec, prompts, seed=seed))).to_pandas(), spec
+
+
+def _distribution(text):
+    """'harmful=2,benign=1' -> {'harmful': 2.0, 'benign': 1.0}"""
+    pairs = (item.rsplit('=', 1) for item in text.split(',') if item)
+    return {key.strip(): float(value) for key, value in pairs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic per-prompt verdict corpus")
+    parser.add_argument('--prompts', type=int, required=True, help='Number of prompts (rows)')
+    parser.add_argument('--safeguards', type=int, default=None,
+                        help='Number of safeguards, default: those of the results table')
+    parser.add_argument('--output', required=True, help='Parquet file to write')
+    parser.add_argument('--harm-levels', type=_distribution, default=None,
+                        help="Harm-level weights, e.g. 'harmful=1,borderline=1,benign=1'")
+    parser.add_argument('--categories', type=_distribution, default=None,
+                        help="Category weights, e.g. 'Privacy=2,CBRN=1' (default: as in the real prompts)")
+    parser.add_argument('--adversarial', type=float, default=0.5, help='Proportion of jailbreak prompts')
+    parser.add_argument('--jailbreak-sources', type=_distribution, default=None,
+                        help="Jailbreak-source weights, e.g. 'PAIR=1,base64=1' "
+                             "(default: the mix implied by the results table)")
+    parser.add_argument('--chunk-size', type=int, default=1 << 18, help='Prompts per chunk / row group')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    spec = CorpusSpec(safeguards=args.safeguards, harm_levels=args.harm_levels, categories=args.categories,
+                      adversarial=args.adversarial, jailbreak_sources=args.jailbreak_sources, seed=args.seed)
+    start = time.perf_counter()
+    rows = write_corpus(args.output, spec, args.prompts, args.chunk_size, args.seed)
+    print(f"Wrote {rows} prompts x {len(spec.safeguards)} safeguards to {args.output} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
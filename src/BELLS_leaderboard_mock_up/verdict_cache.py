@@ -0,0 +1,129 @@
+"""Content-addressed cache of safeguard scores, shared by evaluation runs.
+
+An entry is keyed by a hash of the prompt text and of the safeguard's name,
+version and `config()`, so rerunning an evaluation after adding prompts or
+a jailbreak transform only queries the safeguards on the new texts, and
+changing a safeguard's settings invalidates only its own entries.
+
+Entries are 16-byte keys and float scores in a SQLite table (no extra
+dependency, safe across processes). Once the live data exceeds `max_bytes`,
+the least recently used entries are evicted and their pages returned to the
+file system.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+# Entries evicted in one go: down to this share of `max_bytes`
+EVICT_TO = 0.9
+# Inserted entries between two size checks
+CHECK_EVERY = 4096
+
+
+def safeguard_digest(safeguard):
+    """Hash of what determines a safeguard's scores"""
+    identity = json.dumps([safeguard.name, safeguard.version, safeguard.config()], sort_keys=True, default=str)
+    return hashlib.blake2b(identity.encode(), digest_size=16).digest()
+
+
+class VerdictCache:
+    """Scores by (safeguard, text), see the module docstring.
+
+        with VerdictCache(path) as cache:
+            keys = cache.keys(safeguard, texts)
+            cached = cache.get_many(keys)
+            # ... score the texts whose key is not in `cached` ...
+            cache.put_many(zip(new_keys, new_scores))
+    """
+
+    def __init__(self, path, max_bytes=256 << 20):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._inserted = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        # auto_vacuum only applies to a new database, before its first table
+        self._db.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS scores '
+                         '(key BLOB PRIMARY KEY, score REAL NOT NULL, used REAL NOT NULL) WITHOUT ROWID')
+        self._db.execute('CREATE INDEX IF NOT EXISTS scores_used ON scores (used)')
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.evict()
+        self._db.close()
+
+    @staticmethod
+    def keys(safeguard, texts):
+        prefix = safeguard_digest(safeguard)
+        return [hashlib.blake2b(prefix + text.encode(), digest_size=16).digest() for text in texts]
+
+    def get_many(self, keys):
+        """Cached scores of `keys`, as {key: score}; marks them as recently used"""
+        found = {}
+        # SQLite limits the number of query parameters
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            found.update(self._db.execute(
+                f"SELECT key, score FROM scores WHERE key IN ({','.join('?' * len(part))})", part))
+        if found:
+            now = time.time()
+            self._db.executemany('UPDATE scores SET used = ? WHERE key = ?', ((now, key) for key in found))
+            self._db.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, score) pairs"""
+        now = time.time()
+        rows = [(key, float(score), now) for key, score in items]
+        self._db.executemany('INSERT OR REPLACE INTO scores VALUES (?, ?, ?)', rows)
+        self._db.commit()
+        self._inserted += len(rows)
+        if self._inserted >= CHECK_EVERY:
+            self.evict()
+
+    def size(self):
+        """Bytes of live data (pages in use)"""
+        page_size, = self._db.execute('PRAGMA page_size').fetchone()
+        pages, = self._db.execute('PRAGMA page_count').fetchone()
+        free, = self._db.execute('PRAGMA freelist_count').fetchone()
+        return (pages - free) * page_size
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the cache is under `max_bytes`"""
+        self._inserted = 0
+        size = self.size()
+        if size <= self.max_bytes:
+            return
+        entries = len(self)
+        excess = entries - int(entries * EVICT_TO * self.max_bytes / size)
+        self._db.execute('DELETE FROM scores WHERE key IN '
+                         '(SELECT key FROM scores ORDER BY used LIMIT ?)', (excess,))
+        self._db.commit()
+        # execute() steps the pragma once (one page), executescript() to completion
+        self._db.executescript('PRAGMA incremental_vacuum')
+        self._db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.evictions += excess
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions, 'entries': len(self), 'bytes': self.size()}
@@ -0,0 +1,83 @@
+"""Per-prompt verdict corpora, stored as Parquet.
+
+A corpus has one row per evaluated prompt:
+
+- `prompt_id`: position of the prompt in the corpus
+- `question`, `harm_level`, `category`: the prompt and its labels
+- `adversarial`: whether the prompt is wrapped in a jailbreak
+- `jailbreak_source`: the jailbreak used (null for non-adversarial prompts)
+- one boolean column per safeguard, True when the safeguard flagged the prompt
+
+Text columns are dictionary-encoded, so a corpus of millions of prompts
+drawn from a few thousand distinct ones stays small on disk and in memory.
+Files are written and read in record batches (one row group each), which
+keeps memory bounded whatever the corpus size.
+"""
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PROMPT_FIELDS = [
+    pa.field('prompt_id', pa.int64()),
+    pa.field('question', pa.dictionary(pa.int32(), pa.string())),
+    pa.field('harm_level', pa.dictionary(pa.int8(), pa.string())),
+    pa.field('category', pa.dictionary(pa.int8(), pa.string())),
+    pa.field('adversarial', pa.bool_()),
+    pa.field('jailbreak_source', pa.dictionary(pa.int8(), pa.string())),
+]
+PROMPT_COLUMNS = [field.name for field in PROMPT_FIELDS]
+
+
+def verdict_schema(safeguards):
+    """Arrow schema of a corpus evaluated by `safeguards`"""
+    return pa.schema(PROMPT_FIELDS + [pa.field(name, pa.bool_()) for name in safeguards])
+
+
+def safeguard_names(schema):
+    """Safeguards of a corpus schema, in column order"""
+    return [name for name in schema.names if name not in PROMPT_COLUMNS]
+
+
+class VerdictWriter:
+    """Writes a corpus batch by batch, one Parquet row group per batch.
+
+        with VerdictWriter(path, safeguards) as writer:
+            for batch in batches:
+                writer.write(batch)
+    """
+
+    def __init__(self, path, safeguards, compression='zstd'):
+        self.path = Path(path)
+        self.schema = verdict_schema(safeguards)
+        self.compression = compression
+        self.rows = 0
+        self._writer = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+        return self
+
+    def write(self, batch):
+        self._writer.write_batch(batch, row_group_size=batch.num_rows)
+        self.rows += batch.num_rows
+
+    def __exit__(self, *exc):
+        self._writer.close()
+
+
+def read_schema(path):
+    return pq.read_schema(path)
+
+
+def iter_batches(path, columns=None, batch_size=1 << 18):
+    """Record batches of a corpus, optionally only some columns"""
+    with pq.ParquetFile(path) as f:
+        yield from f.iter_batches(batch_size=batch_size, columns=columns)
+
+
+def read_verdicts(path, columns=None):
+    """Whole corpus (or some columns) as an Arrow-backed DataFrame"""
+    import pandas as pd
+    return pq.read_table(path, columns=columns).to_pandas(types_mapper=pd.ArrowDtype)
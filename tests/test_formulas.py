@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from BELLS_leaderboard_mock_up.formulas import FORMULAS, FormulaError, ScoreTable, compile_formula, parse
+
+TABLE = pd.DataFrame({
+    'safeguard': ['Lakera', 'Nemo', 'LLM Guard'],
+    'harmful_jailbreaks': [0.9, 0.5, 0.7],
+    'harmful_non-adversarial': [0.8, 0.6, 0.4],
+    'benign_non-adversarial': [0.1, 0.3, 0.2],
+    'BELLS_score': [0.87, 0.6, 0.63],
+})
+
+
+def test_preset_scores():
+    scores = ScoreTable(TABLE).scores(FORMULAS['BELLS score'])
+    expected = (TABLE['harmful_jailbreaks'] + TABLE['harmful_non-adversarial'] + 1 - TABLE['benign_non-adversarial']) / 3
+    np.testing.assert_allclose(scores, expected)
+    assert ScoreTable(TABLE).order('BELLS_score').tolist() == [0, 2, 1]
+
+
+@pytest.mark.parametrize('expression', ['safeguard', 'BELLS_score + safeguard', 'max(BELLS_score, safeguard)'])
+def test_non_numeric_column(expression):
+    with pytest.raises(FormulaError, match='Column is not numeric: safeguard'):
+        ScoreTable(TABLE).scores(expression)
+    with pytest.raises(FormulaError, match='Column is not numeric: safeguard'):
+        compile_formula(expression)(TABLE)
+
+
+def test_unknown_column():
+    with pytest.raises(FormulaError, match='Unknown column'):
+        ScoreTable(TABLE).scores('BELLS_score + missing')
+
+
+@pytest.mark.parametrize('expression', ['-' * 3000 + '1', '(' * 3000 + '1' + ')' * 3000, '^'.join(['1'] * 3000),
+                                        '+'.join(['1'] * 3000)])
+def test_too_deeply_nested(expression):
+    with pytest.raises(FormulaError, match='too deeply nested'):
+        parse(expression)